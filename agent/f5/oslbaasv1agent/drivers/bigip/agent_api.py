@@ -36,6 +36,23 @@ import logging
 
 LOG = logging.getLogger(__name__)
 
+# plugin RPC API version adding the calls which handle many objects
+# at once. Older plugins answer them with one of UNSUPPORTED_ERRORS,
+# and the agent falls back to the calls for one object at a time.
+BULK_API_VERSION = '1.1'
+UNSUPPORTED_ERRORS = ('NoSuchMethod', 'UnsupportedVersion',
+                      'UnsupportedRpcVersion')
+# returned by _call_bulk for a method the plugin does not have
+UNSUPPORTED = object()
+
+
+def is_unsupported(exc):
+    """ Whether exc is the plugin refusing a method it does not have """
+    exc_type = getattr(exc, 'exc_type', None) or exc.__class__.__name__
+    if exc_type.endswith('_Remote'):
+        exc_type = exc_type[:-len('_Remote')]
+    return exc_type in UNSUPPORTED_ERRORS
+
 
 class CoreAgentApi(agent_rpc.PluginApi):
     pass
@@ -56,6 +73,28 @@ class LbaasAgentApi(RpcProxy):
         self.env = env
         self.group = group
         self.host = host
+        # bulk methods the plugin does not have
+        self.unsupported_methods = set()
+
+    def _call_bulk(self, method, **kwargs):
+        """ Call a method of BULK_API_VERSION. Returns UNSUPPORTED,
+            without calling it again, once the plugin refused it. """
+        if method in self.unsupported_methods:
+            return UNSUPPORTED
+        try:
+            return self.call(
+                self.context,
+                self.make_msg(method, host=self.host, **kwargs),
+                topic=self.topic,
+                version=BULK_API_VERSION
+            )
+        except Exception as exc:
+            if not is_unsupported(exc):
+                raise
+            LOG.info('plugin does not support %s, using the calls for'
+                     ' one object at a time: %s' % (method, exc))
+            self.unsupported_methods.add(method)
+            return UNSUPPORTED
 
     @log.log
     def get_all_pools(self):
@@ -96,6 +135,15 @@ class LbaasAgentApi(RpcProxy):
             topic=self.topic
         )
 
+    @log.log
+    def get_pool_sync_snapshot(self):
+        result = self._call_bulk('get_pool_sync_snapshot',
+                                 env=self.env, group=self.group)
+        if result is UNSUPPORTED:
+            result = {'active_pools': self.get_active_pools(),
+                      'pending_pools': self.get_pending_pools()}
+        return result
+
     @log.log
     def get_service_by_pool_id(self, pool_id, global_routed_mode=False):
         return self.call(
@@ -109,6 +157,23 @@ class LbaasAgentApi(RpcProxy):
             topic=self.topic
         )
 
+    @log.log
+    def get_services_by_pool_ids(self, pool_ids, global_routed_mode=False):
+        result = self._call_bulk('get_services_by_pool_ids',
+                                 pool_ids=pool_ids,
+                                 global_routed_mode=global_routed_mode)
+        if result is UNSUPPORTED:
+            # pools whose service could not be read are left out
+            result = {}
+            for pool_id in pool_ids:
+                try:
+                    result[pool_id] = self.get_service_by_pool_id(
+                        pool_id, global_routed_mode)
+                except Exception as exc:
+                    LOG.error("Unable to get service for pool %s: %s"
+                              % (pool_id, exc))
+        return result
+
     @log.log
     def create_port_on_subnet(self, subnet_id=None,
                               mac_address=None, name=None,
@@ -363,6 +428,57 @@ class LbaasAgentApi(RpcProxy):
             topic=self.topic
         )
 
+    @log.log
+    def update_service_statuses(self, statuses):
+        result = self._call_bulk('update_service_statuses',
+                                 statuses=statuses)
+        if result is UNSUPPORTED:
+            return self._update_each_status(statuses)
+        if result:
+            # the plugin returns the status changes which failed, so
+            # send only those again
+            LOG.info('sending failed status changes one by one: %s'
+                     % result)
+            self._update_each_status(result)
+        return None
+
+    def _update_each_status(self, statuses):
+        """ Send the statuses of update_service_statuses one by one """
+        for member_status in statuses.get('members', []):
+            self.update_member_status(**member_status)
+        for member_id in statuses.get('members_destroyed', []):
+            try:
+                self.member_destroyed(member_id)
+            except Exception as exc:
+                LOG.error("Plugin delete member %s error: %s"
+                          % (member_id, exc))
+        if statuses.get('pool'):
+            self.update_pool_status(**statuses['pool'])
+        if statuses.get('pool_destroyed'):
+            try:
+                self.pool_destroyed(statuses['pool_destroyed'])
+            except Exception as exc:
+                LOG.error("Plugin destroy pool %s error: %s"
+                          % (statuses['pool_destroyed'], exc))
+        for monitor in statuses.get('health_monitors_destroyed', []):
+            self.health_monitor_destroyed(**monitor)
+        for monitor_status in statuses.get('health_monitors', []):
+            try:
+                self.update_health_monitor_status(**monitor_status)
+            except Exception as exc:
+                if 'PENDING_DELETE' in str(exc):
+                    LOG.debug("Attempted to update monitor being deleted!")
+                else:
+                    raise
+        if statuses.get('vip'):
+            self.update_vip_status(**statuses['vip'])
+        if statuses.get('vip_destroyed'):
+            try:
+                self.vip_destroyed(statuses['vip_destroyed'])
+            except Exception as exc:
+                LOG.error("Plugin delete vip %s error: %s"
+                          % (statuses['vip_destroyed'], exc))
+
     @log.log
     def update_pool_stats(self, pool_id, stats):
         return self.call(
@@ -375,3 +491,17 @@ class LbaasAgentApi(RpcProxy):
             ),
             topic=self.topic
         )
+
+    @log.log
+    def update_pools_stats(self, pools_stats):
+        result = self._call_bulk('update_pools_stats',
+                                 pools_stats=pools_stats)
+        if result is UNSUPPORTED:
+            result = None
+            for pool_id in pools_stats:
+                try:
+                    self.update_pool_stats(pool_id, pools_stats[pool_id])
+                except Exception as exc:
+                    LOG.error("Unable to update stats of pool %s: %s"
+                              % (pool_id, exc))
+        return result
@@ -14,7 +14,11 @@
 #
 
 import datetime
-import copy
+import json
+import math
+import os
+import tempfile
+from time import time
 
 preLiberty = False
 try:
@@ -43,6 +47,7 @@ except ImportError:
 from f5.oslbaasv1agent.drivers.bigip import agent_api
 from f5.oslbaasv1agent.drivers.bigip import constants
 import f5.oslbaasv1agent.drivers.bigip.constants as lbaasv1constants
+from f5.oslbaasv1agent.drivers.bigip.stats import StatsScheduler
 
 preJuno = False
 preKilo = False
@@ -65,6 +70,9 @@ LOG = logging.getLogger(__name__)
 
 __VERSION__ = "0.1.1"
 
+# version of the saved service cache format
+SERVICE_CACHE_VERSION = 1
+
 # configuration options useful to all drivers
 OPTS = [
     cfg.StrOpt(
@@ -109,6 +117,52 @@ OPTS = [
         default=300,
         help=_('Number of seconds between service refresh check')
     ),
+    cfg.StrOpt(
+        'service_cache_path',
+        default='$state_path/f5-oslbaasv1-agent',
+        help=_('Directory where the agent saves the services it knows '
+               'about, to reload them when it restarts. Empty to '
+               'not save them. The saved services are matched to the '
+               'BIG-IPs by a hash of their device names and mac '
+               'addresses only, which is enough because the full '
+               'service and orphan audit still runs after a restart')
+    ),
+    cfg.IntOpt(
+        'stats_interval',
+        default=30,
+        help=_('Number of seconds between reads of the stats of a pool')
+    ),
+    cfg.IntOpt(
+        'stats_min_interval',
+        default=10,
+        help=_('Fewest seconds between reads of the stats of a pool '
+               'whose stats keep changing, when stats are read pool '
+               'by pool')
+    ),
+    cfg.IntOpt(
+        'stats_max_interval',
+        default=300,
+        help=_('Most seconds between reads of the stats of a pool '
+               'whose stats do not change')
+    ),
+    cfg.IntOpt(
+        'stats_max_pools',
+        default=500,
+        help=_('Most pools whose stats are read and sent to the '
+               'plugin in one stats collection')
+    ),
+    cfg.IntOpt(
+        'stats_requests_per_device',
+        default=100,
+        help=_('Most requests sent to each BIG-IP in one stats '
+               'collection, when stats are read pool by pool')
+    ),
+    cfg.IntOpt(
+        'service_audit_interval',
+        default=3600,
+        help=_('Number of seconds over which all services are checked '
+               'on the BIG-IPs whether they changed or not')
+    ),
     cfg.StrOpt(
         'environment_prefix', default='',
         help=_('The object name prefix for this environment'),
@@ -130,31 +184,42 @@ OPTS = [
 
 
 class LogicalServiceCache(object):
-    """Manage a cache of known services."""
+    """Manage a cache of known services.
+
+    Services are kept by pool id and indexed by agent host, so the
+    pools of an agent host are found without scanning the whole cache.
+    """
 
     class Service(object):
         """Inner classes used to hold values for weakref lookups."""
+        __slots__ = ['port_id', 'pool_id', 'tenant_id', 'agent_host']
+
         def __init__(self, port_id, pool_id, tenant_id, agent_host):
             self.port_id = port_id
             self.pool_id = pool_id
             self.tenant_id = tenant_id
             self.agent_host = agent_host
 
+        def _key(self):
+            return (self.port_id,
+                    self.pool_id,
+                    self.tenant_id,
+                    self.agent_host)
+
         def __eq__(self, other):
-            return self.__dict__ == other.__dict__
+            return self._key() == other._key()
 
         def __hash__(self):
-            return hash(
-                (self.port_id,
-                 self.pool_id,
-                 self.tenant_id,
-                 self.agent_host)
-            )
+            return hash(self._key())
 
     def __init__(self):
         LOG.debug(_("Initializing LogicalServiceCache version %s"
                     % __VERSION__))
         self.services = {}
+        # agent host -> pool ids
+        self.host_pools = {}
+        # changed since it was last saved
+        self.dirty = False
 
     @property
     def size(self):
@@ -170,23 +235,44 @@ class LogicalServiceCache(object):
         if pool_id not in self.services:
             s = self.Service(port_id, pool_id, tenant_id, agent_host)
             self.services[pool_id] = s
+            self._index(s)
+            self.dirty = True
         else:
             s = self.services[pool_id]
-            s.tenant_id = tenant_id
-            s.port_id = port_id
-            s.agent_host = agent_host
+            if s.agent_host != agent_host:
+                self._unindex(s)
+                s.agent_host = agent_host
+                self._index(s)
+                self.dirty = True
+            if s.tenant_id != tenant_id:
+                s.tenant_id = tenant_id
+                self.dirty = True
+            if s.port_id != port_id:
+                s.port_id = port_id
+                self.dirty = True
+
+    def _index(self, s):
+        self.host_pools.setdefault(s.agent_host, set()).add(s.pool_id)
+
+    def _unindex(self, s):
+        pool_ids = self.host_pools.get(s.agent_host)
+        if pool_ids is not None:
+            pool_ids.discard(s.pool_id)
+            if not pool_ids:
+                del self.host_pools[s.agent_host]
 
     def remove(self, service):
         if not isinstance(service, self.Service):
             pool_id = service['pool']['id']
         else:
             pool_id = service.pool_id
-        if pool_id in self.services:
-            del(self.services[pool_id])
+        self.remove_by_pool_id(pool_id)
 
     def remove_by_pool_id(self, pool_id):
-        if pool_id in self.services:
-            del(self.services[pool_id])
+        s = self.services.pop(pool_id, None)
+        if s:
+            self._unindex(s)
+            self.dirty = True
 
     def get_by_pool_id(self, pool_id):
         if pool_id in self.services:
@@ -194,20 +280,67 @@ class LogicalServiceCache(object):
         else:
             return None
 
-    def get_pool_ids(self):
-        return self.services.keys()
-
-    def get_tenant_ids(self):
-        tenant_ids = {}
-        for service in self.services:
-            tenant_ids[service.tenant_id] = 1
-        return tenant_ids.keys()
-
-    def get_agent_hosts(self):
-        agent_hosts = {}
-        for service in self.services:
-            agent_hosts[service.agent_host] = 1
-        return agent_hosts.keys()
+    def get_pool_ids(self, agent_host=None):
+        if agent_host is None:
+            return self.services.keys()
+        return list(self.host_pools.get(agent_host, ()))
+
+    def save(self, path, device_ids):
+        """ Write the services to path, replacing it atomically """
+        services = []
+        for s in self.services.values():
+            services.append({'port_id': s.port_id,
+                             'pool_id': s.pool_id,
+                             'tenant_id': s.tenant_id,
+                             'agent_host': s.agent_host})
+        saved = {'version': SERVICE_CACHE_VERSION,
+                 'devices': device_ids,
+                 'services': services}
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        # write a new file next to the old one and rename it over the
+        # old one, so a crash never leaves a partly written file.
+        # mkstemp creates it readable by the agent user only.
+        (fd, temp_path) = tempfile.mkstemp(dir=directory)
+        os.fchmod(fd, 0o600)
+        try:
+            with os.fdopen(fd, 'w') as temp_file:
+                json.dump(saved, temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.rename(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        self.dirty = False
+
+    def load(self, path, device_ids):
+        """ Read the services saved to path for the same devices.
+            Services cached since the agent started are newer than
+            the saved ones and are kept. Returns the number of
+            services loaded. """
+        if not os.path.exists(path):
+            return 0
+        with open(path) as saved_file:
+            saved = json.load(saved_file)
+        if saved.get('version') != SERVICE_CACHE_VERSION:
+            LOG.info(_('ignoring saved services with version %s'
+                       % saved.get('version')))
+            return 0
+        if saved.get('devices') != device_ids:
+            LOG.info(_('ignoring services saved for other devices'))
+            return 0
+        loaded = 0
+        for entry in saved['services']:
+            if entry['pool_id'] in self.services:
+                continue
+            s = self.Service(entry['port_id'], entry['pool_id'],
+                             entry['tenant_id'], entry['agent_host'])
+            self.services[s.pool_id] = s
+            self._index(s)
+            loaded += 1
+        return loaded
 
 
 class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
@@ -235,6 +368,24 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
             self.service_resync_interval = constants.RESYNC_INTERVAL
         LOG.debug(_('setting service resync interval to %d seconds'
                     % self.service_resync_interval))
+        if conf.service_audit_interval:
+            self.service_audit_interval = conf.service_audit_interval
+        else:
+            self.service_audit_interval = constants.AUDIT_INTERVAL
+        self.last_audit = None
+        self.audit_pool_ids = []
+        self.audit_batch_size = 0
+        self.orphans_removed = False
+        self.cache_loaded = False
+        # cleared if the driver cannot identify its devices
+        self.cache_saving = True
+        self.stats_scheduler = StatsScheduler(conf.stats_interval,
+                                              conf.stats_min_interval,
+                                              conf.stats_max_interval)
+        # the driver reads the stats of all pools in bulk, at most
+        # once every stats_interval
+        self.bulk_stats = True
+        self.last_bulk_stats = 0
 
         try:
             LOG.debug(_('loading LBaaS driver %s'
@@ -382,6 +533,17 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
             if hasattr(self.lbdriver, 'service_queue'):
                 self.agent_state['configurations']['request_queue_depth'] = \
                     len(self.lbdriver.service_queue)
+                if hasattr(self.lbdriver.service_queue, 'get_statistics'):
+                    self.agent_state['configurations']['request_queue'] = \
+                        self.lbdriver.service_queue.get_statistics()
+            self.agent_state['configurations']['stats_scheduler'] = \
+                self.stats_scheduler.get_statistics()
+            if hasattr(self.lbdriver, 'get_audit_statistics'):
+                self.agent_state['configurations']['orphan_audit'] = \
+                    self.lbdriver.get_audit_statistics()
+            if hasattr(self.lbdriver, 'get_icr_statistics'):
+                self.agent_state['configurations']['icontrol_rest'] = \
+                    self.lbdriver.get_icr_statistics()
             if self.lbdriver.agent_configurations:
                 self.agent_state['configurations'].update(
                     self.lbdriver.agent_configurations
@@ -428,9 +590,7 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
                 LOG.debug(
                     'Forcing resync of services on resync timer (%d seconds).'
                     % self.service_resync_interval)
-                self.cache.services = {}
                 self.last_resync = now
-                self.lbdriver.flush_cache()
         LOG.debug("tunnel_sync: periodic_resync need_resync: %s"
                   % str(self.needs_resync))
         # resync if we need to
@@ -441,28 +601,170 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
             if self.sync_state():
                 self.needs_resync = True
 
-    @periodic_task.periodic_task(spacing=30)
+    @periodic_task.periodic_task(spacing=10)
     def collect_stats(self, context):
         if not self.plugin_rpc:
             return
-        pool_services = copy.deepcopy(self.cache.services)
-        for pool_id in pool_services:
-            service = pool_services[pool_id]
-            if self.agent_host == service.agent_host:
-                try:
-                    LOG.debug("collecting stats for pool %s" % service.pool_id)
-                    stats = self.lbdriver.get_stats(
-                        self.plugin_rpc.get_service_by_pool_id(
-                            service.pool_id,
-                            self.conf.f5_global_routed_mode
-                        )
-                    )
-                    if stats:
-                        self.plugin_rpc.update_pool_stats(service.pool_id,
-                                                          stats)
-                except Exception as e:
-                    LOG.exception(_('Error upating stats' + str(e.message)))
-                    self.needs_resync = True
+        pool_ids = self.stats_scheduler.get_due_pool_ids(
+            self.cache.get_pool_ids(self.agent_host),
+            self.conf.stats_max_pools)
+        if not pool_ids:
+            return
+        if self.bulk_stats and \
+                time() - self.last_bulk_stats < self.conf.stats_interval:
+            # a bulk read costs the same for one pool as for all, so
+            # due pools wait for the next one
+            return
+        services = []
+        try:
+            service_defs = self.plugin_rpc.get_services_by_pool_ids(
+                pool_ids,
+                self.conf.f5_global_routed_mode
+            )
+            for pool_id in pool_ids:
+                service_def = service_defs.get(pool_id)
+                if service_def and service_def.get('pool'):
+                    services.append(service_def)
+        except Exception as e:
+            LOG.exception(_('Error upating stats' + str(e.message)))
+            self.needs_resync = True
+            return
+        if not services:
+            return
+        try:
+            # read the stats of all pools from each device at once
+            LOG.debug("collecting stats for %d pools" % len(services))
+            self.last_bulk_stats = time()
+            pools_stats = self.lbdriver.get_all_stats(services)
+            for service in services:
+                pools_stats.setdefault(service['pool']['id'], None)
+        except NotImplementedError:
+            self.bulk_stats = False
+            pools_stats = self._get_pools_stats(services)
+        except Exception as e:
+            LOG.exception(_('Error upating stats' + str(e.message)))
+            self.needs_resync = True
+            return
+        # only send the plugin the stats which changed. Pools without
+        # stats are rescheduled too, so they are not read every time.
+        changed_stats = {}
+        for pool_id in pools_stats:
+            if self.stats_scheduler.polled(pool_id, pools_stats[pool_id]) \
+                    and pools_stats[pool_id]:
+                changed_stats[pool_id] = pools_stats[pool_id]
+        LOG.debug("stats changed for %d of %d pools"
+                  % (len(changed_stats), len(pools_stats)))
+        if not changed_stats:
+            return
+        try:
+            self.plugin_rpc.update_pools_stats(changed_stats)
+        except Exception as e:
+            LOG.exception(_('Error upating stats' + str(e.message)))
+            self.needs_resync = True
+
+    def _get_pools_stats(self, services):
+        """ Read stats pool by pool, until a device has been sent
+            stats_requests_per_device requests. The pools left out
+            stay due and are read first in the next collection. """
+        pools_stats = {}
+        start_requests = self._get_device_requests()
+        reads = 0
+        for service in services:
+            if start_requests:
+                used = self._get_max_requests(start_requests)
+            else:
+                # the driver does not count requests, count reads
+                used = reads
+            if used >= self.conf.stats_requests_per_device:
+                LOG.debug("stats request budget used after %d of %d pools"
+                          % (reads, len(services)))
+                break
+            reads += 1
+            try:
+                LOG.debug("collecting stats for pool %s"
+                          % service['pool']['id'])
+                pools_stats[service['pool']['id']] = \
+                    self.lbdriver.get_stats(service)
+            except Exception as e:
+                LOG.exception(_('Error upating stats' + str(e.message)))
+                self.needs_resync = True
+        return pools_stats
+
+    def _get_device_requests(self):
+        """ Requests sent so far to each device, if the driver counts them """
+        device_requests = {}
+        if hasattr(self.lbdriver, 'get_icr_statistics'):
+            icr_stats = self.lbdriver.get_icr_statistics()
+            for host in icr_stats:
+                device_requests[host] = icr_stats[host]['requests']
+        return device_requests
+
+    def _get_max_requests(self, start_requests):
+        """ Most requests sent to one device since start_requests """
+        device_requests = self._get_device_requests()
+        max_requests = 0
+        for host in start_requests:
+            max_requests = max(max_requests,
+                               device_requests.get(host, 0) -
+                               start_requests[host])
+        return max_requests
+
+    @periodic_task.periodic_task(spacing=10)
+    def audit_orphans(self, context):
+        try:
+            self.lbdriver.audit_orphans()
+        except NotImplementedError:
+            pass  # Not all drivers will support this
+
+    @periodic_task.periodic_task(spacing=60)
+    def save_service_cache(self, context):
+        if not self.cache_saving or not self.cache_loaded or \
+                not self.cache.dirty:
+            return
+        path = self._get_service_cache_file()
+        if not path:
+            return
+        try:
+            self.cache.save(path, self.lbdriver.get_device_ids())
+            LOG.debug(_('saved %d services to %s' % (self.cache.size, path)))
+        except NotImplementedError:
+            # Not all drivers will support this
+            self.cache_saving = False
+        except Exception as exc:
+            LOG.error(_('Unable to save services to %s: %s'
+                        % (path, str(exc))))
+
+    def _get_service_cache_file(self):
+        if not self.conf.service_cache_path:
+            return None
+        return os.path.join(self.conf.service_cache_path,
+                            'services-%s.json'
+                            % str(self.agent_host).replace(':', '-'))
+
+    def _load_service_cache(self):
+        """ Reload the services saved before the agent restarted, so
+            only the ones which changed since need to be validated """
+        path = self._get_service_cache_file()
+        if not path:
+            self.cache_loaded = True
+            return
+        try:
+            device_ids = self.lbdriver.get_device_ids()
+        except NotImplementedError:
+            # Not all drivers will support this
+            self.cache_saving = False
+            self.cache_loaded = True
+            return
+        if not device_ids:
+            # not connected yet, try again on the next sync
+            return
+        self.cache_loaded = True
+        try:
+            loaded = self.cache.load(path, device_ids)
+            LOG.info(_('loaded %d saved services from %s' % (loaded, path)))
+        except Exception as exc:
+            LOG.error(_('Unable to load saved services from %s: %s'
+                        % (path, str(exc))))
 
     @periodic_task.periodic_task(spacing=600)
     def backup_configuration(self, context):
@@ -475,15 +777,16 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
     def sync_state(self):
         if not self.plugin_rpc:
             return
+        if not self.cache_loaded:
+            self._load_service_cache()
         resync = False
-        known_services = set()
-        for service in self.cache.services:
-            if self.agent_host == self.cache.services[service].agent_host:
-                known_services.add(service)
-        try:
-            # this produces a list of active pools for this agent
-            # or for this agents env + group if using specific env
-            active_pools = self.plugin_rpc.get_active_pools()
+        known_services = set(self.cache.get_pool_ids(self.agent_host))
+        try:
+            # this produces the lists of active and pending
+            # pools for this agent or for this agents env + group
+            # if using specific env in one call
+            snapshot = self.plugin_rpc.get_pool_sync_snapshot()
+            active_pools = snapshot['active_pools']
             active_pool_ids = set()
             for pool in active_pools:
                 if self.agent_host == pool['agent_host']:
@@ -496,13 +799,20 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
             # not know about.
             for deleted_id in known_services - active_pool_ids:
                 self.destroy_service(deleted_id)
-            # validate each service we are supposed to know about
-            for pool_id in active_pool_ids:
-                if not self.cache.get_by_pool_id(pool_id):
-                    self.validate_service(pool_id)
-            # this produces a list of pools with pending tasks
-            # to be performed
-            pending_pools = self.plugin_rpc.get_pending_pools()
+            # validate each service which is new to us. Services
+            # which changed since are pending and refreshed below.
+            validate_pool_ids = list(active_pool_ids - known_services)
+            LOG.debug(_('%d of %d active pools are new since last sync'
+                        % (len(validate_pool_ids), len(active_pool_ids))))
+            # and the next slice of the audit of all services
+            (audit_pool_ids, audit_done) = self._get_audit_pool_ids(
+                active_pool_ids, validate_pool_ids)
+            validate_pool_ids.extend(audit_pool_ids)
+            services = self._get_services(validate_pool_ids)
+            for pool_id in validate_pool_ids:
+                self.validate_service(pool_id, services.get(pool_id))
+            # pools with pending tasks to be performed
+            pending_pools = snapshot['pending_pools']
             pending_pool_ids = set()
             for pool in pending_pools:
                 if self.agent_host == pool['agent_host']:
@@ -510,38 +820,96 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
             LOG.debug(_('plugin produced the list of pending pool ids: %s'
                         % pending_pool_ids))
             # complete each pending task
+            services = self._get_services(list(pending_pool_ids))
             for pool_id in pending_pool_ids:
-                self.refresh_service(pool_id)
+                self.refresh_service(pool_id, services.get(pool_id))
             # get a list of any cached service we know now after
             # refreshing services
-            known_services = set()
-            for service in self.cache.services:
-                if self.agent_host == self.cache.services[service].agent_host:
-                    known_services.add(service)
+            known_services = self.cache.get_pool_ids(self.agent_host)
             LOG.debug(_('currently known pool ids after sync are: %s'
                         % list(known_services)))
             # remove any orphaned services we find on the bigips
-            all_pools = self.plugin_rpc.get_all_pools()
-            self.remove_orphans(all_pools)
+            # after startup and once every service has been audited
+            if audit_done or not self.orphans_removed:
+                self.orphans_removed = True
+                all_pools = self.plugin_rpc.get_all_pools()
+                self.remove_orphans(all_pools)
         except Exception:
             LOG.exception(_('Unable to retrieve ready services'))
             resync = True
+        self.save_service_cache(self.context)
         return resync
 
+    def _get_audit_pool_ids(self, active_pool_ids, validate_pool_ids):
+        """ Get the next pools to validate for the service audit.
+
+            Every service_audit_interval all active pools are validated
+            again whether they changed or not. The pools are spread
+            over the syncs of the interval instead of being validated
+            at once. Returns the pools to audit in this sync and
+            whether this sync completes the audit. """
+        now = datetime.datetime.now()
+        if not self.audit_pool_ids:
+            if self.last_audit and \
+                    (now - self.last_audit).total_seconds() < \
+                    self.service_audit_interval:
+                return ([], False)
+            # start a new audit with anything cached on the
+            # devices checked again
+            self.last_audit = now
+            try:
+                self.lbdriver.flush_cache()
+            except NotImplementedError:
+                pass  # Not all drivers will support this
+            self.audit_pool_ids = sorted(
+                set(active_pool_ids) - set(validate_pool_ids))
+            syncs = max(
+                self.service_audit_interval / self.service_resync_interval,
+                1)
+            self.audit_batch_size = int(
+                math.ceil(float(len(self.audit_pool_ids)) / syncs))
+            LOG.debug(_('starting audit of %d services, %d per sync'
+                        % (len(self.audit_pool_ids), self.audit_batch_size)))
+        audit_pool_ids = []
+        while self.audit_pool_ids and \
+                len(audit_pool_ids) < self.audit_batch_size:
+            pool_id = self.audit_pool_ids.pop(0)
+            if pool_id in active_pool_ids and \
+                    pool_id not in validate_pool_ids:
+                audit_pool_ids.append(pool_id)
+        return (audit_pool_ids, not self.audit_pool_ids)
+
+    def _get_services(self, pool_ids):
+        """ Get the service definitions of many pools in one call.
+            Pools whose services could not be read are left for
+            validate_service and refresh_service to get one by one. """
+        if not pool_ids:
+            return {}
+        try:
+            return self.plugin_rpc.get_services_by_pool_ids(
+                pool_ids,
+                self.conf.f5_global_routed_mode
+            )
+        except Exception as exc:
+            LOG.error(_("Unable to get services in bulk: %s" % exc.message))
+            return {}
+
     @log.log
-    def validate_service(self, pool_id):
+    def validate_service(self, pool_id, service=None):
         if not self.plugin_rpc:
             return
         try:
-            service = self.plugin_rpc.get_service_by_pool_id(
-                pool_id,
-                self.conf.f5_global_routed_mode
-            )
+            if not service:
+                service = self.plugin_rpc.get_service_by_pool_id(
+                    pool_id,
+                    self.conf.f5_global_routed_mode
+                )
             self.cache.put(service, self.agent_host)
             if not self.lbdriver.exists(service):
                 LOG.error(_('active pool %s is not on BIG-IP.. syncing'
                             % pool_id))
                 self.lbdriver.sync(service)
+            return True
         except NeutronException as exc:
             LOG.error("NeutronException: %s" % exc.msg)
         except Exception as e:
@@ -556,14 +924,15 @@ class LbaasAgentManagerBase(periodic_task.PeriodicTasks):
                                 str(e.message)), pool_id)
 
     @log.log
-    def refresh_service(self, pool_id):
+    def refresh_service(self, pool_id, service=None):
         if not self.plugin_rpc:
             return
         try:
-            service = self.plugin_rpc.get_service_by_pool_id(
-                pool_id,
-                self.conf.f5_global_routed_mode
-            )
+            if not service:
+                service = self.plugin_rpc.get_service_by_pool_id(
+                    pool_id,
+                    self.conf.f5_global_routed_mode
+                )
             self.cache.put(service, self.agent_host)
             self.lbdriver.sync(service)
         except NeutronException as exc:
@@ -0,0 +1,250 @@
+""" Orphan Audit """
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+try:
+    from neutron.openstack.common import log as logging
+except ImportError:
+    from oslo_log import log as logging
+from f5.oslbaasv1agent.drivers.bigip.utils import serialized
+from eventlet import greenthread
+from time import time
+import logging as std_logging
+import zlib
+
+LOG = logging.getLogger(__name__)
+
+
+class DeviceRequestBudget(object):
+    """ Hold the requests made to one big-ip to a rate.
+
+        Requests are counted by the iControl REST session of the
+        big-ip, so the budget covers every request sent while it is
+        held, not only the ones made by its holder. """
+
+    def __init__(self, bigip, requests_per_second):
+        self.bigip = bigip
+        self.requests_per_second = requests_per_second
+        self.start_time = time()
+        self.start_requests = self._requests_sent()
+
+    def _requests_sent(self):
+        """ Requests sent to the big-ip so far """
+        return self.bigip.icr_session.adapter.requests_sent
+
+    def throttle(self):
+        """ Sleep until the requests sent fit in the budget """
+        if self.requests_per_second <= 0:
+            return
+        requests = self._requests_sent() - self.start_requests
+        delay = float(requests) / self.requests_per_second - \
+            (time() - self.start_time)
+        if delay > 0:
+            greenthread.sleep(delay)
+
+
+class OrphanAudit(object):
+    """ Remove configuration neutron no longer knows about.
+
+        An audit starts from the pools and tenants neutron knows
+        about. The pools and tenant folders on the big-ips are split
+        into shards by a hash of their names, and each tick checks
+        one shard on every big-ip, under a budget of requests per
+        second per big-ip. Orphans are purged through the service
+        queue of their tenant, so they wait for, rather than block,
+        the provisioning of other tenants, and never take the slot
+        which runs alone. Folders are removed under the shared config
+        lock like any other tenant cleanup. The pools neutron knows are
+        read again for every shard, and each orphaned pool is looked
+        up once more when its purge comes, so pools created through
+        other agents while the audit runs are not purged either. """
+
+    def __init__(self, conf, driver):
+        self.conf = conf
+        self.driver = driver
+        self.service_queue = driver.service_queue
+        self.shards = max(conf.f5_audit_shards, 1)
+        self.requests_per_second = conf.f5_audit_requests_per_second
+        self.known_pools = set()
+        self.known_tenants = set()
+        # next shard to check, None when no audit is running
+        self.shard = None
+        # device name -> pools and managed folders found on it
+        self.pool_folders = {}
+        self.folders = {}
+        self.start_time = None
+        self.drift = {}
+        self.last_drift = {}
+
+    def start(self, all_pools):
+        """ Start an audit, replacing one which is running """
+        self.known_pools = set()
+        self.known_tenants = set()
+        for pool in all_pools:
+            self.known_pools.add(pool['pool_id'])
+            self.known_tenants.add(pool['tenant_id'])
+        self.shard = 0
+        self.pool_folders = {}
+        self.folders = {}
+        self.start_time = time()
+        self.drift = {'pools': 0,
+                      'folders': 0,
+                      'orphaned_pools': 0,
+                      'orphaned_folders': 0,
+                      'purged_pools': 0,
+                      'purged_folders': 0,
+                      'object_count_drift': 0}
+        LOG.debug(_('starting orphan audit of %d pools and %d tenants '
+                    'in %d shards' % (len(self.known_pools),
+                                      len(self.known_tenants),
+                                      self.shards)))
+
+    def _refresh_known(self):
+        """ Know the pools and tenants neutron has now as well """
+        for pool in self.driver.plugin_rpc.get_all_pools():
+            self.known_pools.add(pool['pool_id'])
+            self.known_tenants.add(pool['tenant_id'])
+
+    def _pool_exists(self, pool_id):
+        """ Does neutron have the pool """
+        service = self.driver.plugin_rpc.get_service_by_pool_id(
+            pool_id, self.conf.f5_global_routed_mode)
+        return bool(service and service.get('pool'))
+
+    def know_service(self, service):
+        """ Never purge the pool or tenant of a provisioned service """
+        if service and service.get('pool'):
+            self.known_pools.add(service['pool']['id'])
+            self.known_tenants.add(service['pool']['tenant_id'])
+
+    def in_shard(self, name, shard):
+        """ Does the object name hash into shard """
+        return (zlib.crc32(name) & 0xffffffff) % self.shards == shard
+
+    def tick(self):
+        """ Check the next shard on every big-ip """
+        if self.shard is None:
+            return
+        shard = self.shard
+        self._refresh_known()
+        self.driver.fanout(self.driver.get_all_bigips(),
+                           self._audit_bigip_shard, shard)
+        self.shard += 1
+        if self.shard >= self.shards:
+            self.last_drift = dict(self.drift)
+            self.last_drift['seconds'] = round(time() - self.start_time, 3)
+            LOG.info(_('orphan audit done: %s' % self.last_drift))
+            self.shard = None
+            self.pool_folders = {}
+            self.folders = {}
+
+    def _audit_bigip_shard(self, bigip, shard):
+        """ Find and purge the orphans of shard on a big-ip """
+        budget = DeviceRequestBudget(bigip, self.requests_per_second)
+        if bigip.device_name not in self.pool_folders:
+            # list the big-ip once for the whole audit
+            self.pool_folders[bigip.device_name] = \
+                bigip.pool.get_all_pool_folders()
+            self.folders[bigip.device_name] = \
+                bigip.system.get_managed_folders(bigip)
+            budget.throttle()
+            # correct the object counts kept for capacity metrics
+            drift = self.driver.reconcile_object_counts(bigip)
+            for kind in drift:
+                self.drift['object_count_drift'] += abs(drift[kind])
+            budget.throttle()
+        prefix = bigip.pool.OBJ_PREFIX
+        pool_folders = self.pool_folders[bigip.device_name]
+        for pool_name in pool_folders:
+            if not pool_name.startswith(prefix) or \
+                    not self.in_shard(pool_name, shard):
+                continue
+            self.drift['pools'] += 1
+            pool_id = pool_name[len(prefix):]
+            if pool_id in self.known_pools:
+                continue
+            self.drift['orphaned_pools'] += 1
+            folder = pool_folders[pool_name]
+            self._purge_orphaned_pool(
+                bigip, pool_name, folder, self.drift,
+                self._orphan_service(pool_id, folder, prefix))
+            budget.throttle()
+
+        for folder in self.folders[bigip.device_name]:
+            if not self.in_shard(folder, shard):
+                continue
+            self.drift['folders'] += 1
+            tenant_id = folder[len(prefix):]
+            if tenant_id in self.known_tenants:
+                continue
+            self.drift['orphaned_folders'] += 1
+            self._purge_orphaned_folder(
+                bigip, folder, self.drift,
+                self._orphan_service(None, folder, prefix))
+            budget.throttle()
+
+    @staticmethod
+    def _orphan_service(pool_id, folder, prefix):
+        """ Service queued for the purge, keyed by the folder tenant,
+            or by the pool for a folder no tenant owns, so the purge
+            never gets the key of requests which run alone """
+        tenant_id = None
+        if folder.startswith(prefix) and len(folder) > len(prefix):
+            tenant_id = folder[len(prefix):]
+        return {'pool': {'id': pool_id or folder,
+                         'tenant_id': tenant_id}}
+
+    @serialized('purge_orphaned_pool')
+    def _purge_orphaned_pool(self, bigip, pool_name, folder, drift,
+                             service):
+        """ Purge a pool which is still unknown when its turn comes.
+            The purge is counted in drift, the drift of the audit which
+            found the pool, even if another audit started since. """
+        if service['pool']['id'] in self.known_pools or \
+                self._pool_exists(service['pool']['id']):
+            return
+        LOG.debug(_('purging orphaned pool %s from %s on %s'
+                    % (pool_name, folder, bigip.device_name)))
+        bigip.pool.purge_orphaned_pool(pool_name, folder)
+        drift['purged_pools'] += 1
+
+    @serialized('purge_orphaned_folder')
+    def _purge_orphaned_folder(self, bigip, folder, drift, service):
+        """ Purge a folder which is still unknown when its turn comes.
+            The purge is counted in drift like a purged pool. """
+        self._refresh_known()
+        if service['pool']['tenant_id'] in self.known_tenants:
+            return
+        LOG.debug(_('purging orphaned folder %s on %s'
+                    % (folder, bigip.device_name)))
+        # the folder is shared config like the ones removed by tenant
+        # cleanup, and other tenants must not set the active folder
+        # until it is gone
+        with self.driver.shared_config_lock:
+            bigip.system.purge_folder_contents(folder, bigip)
+            with bigip.folder_lock:
+                sudslog = std_logging.getLogger('suds.client')
+                sudslog.setLevel(std_logging.FATAL)
+                bigip.system.force_root_folder()
+                sudslog.setLevel(std_logging.ERROR)
+                bigip.system.purge_folder(folder, bigip)
+        drift['purged_folders'] += 1
+
+    def get_statistics(self):
+        """ Drift found by the running and the last audits """
+        return {'running': self.shard is not None,
+                'shard': self.shard,
+                'shards': self.shards,
+                'current': dict(self.drift),
+                'last': dict(self.last_drift)}
@@ -16,6 +16,9 @@
 # Service resync interval
 RESYNC_INTERVAL = 300
 
+# Service audit interval
+AUDIT_INTERVAL = 3600
+
 # Topic for tunnel notifications between the plugin and agent
 TUNNEL = 'tunnel'
 
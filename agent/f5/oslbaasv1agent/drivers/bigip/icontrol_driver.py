@@ -39,12 +39,15 @@ from f5.oslbaasv1agent.drivers.bigip.vcmp import VcmpManager
 from f5.oslbaasv1agent.drivers.bigip.tenants import BigipTenantManager
 from f5.oslbaasv1agent.drivers.bigip.fdb_connector_ml2 import FDBConnectorML2
 from f5.oslbaasv1agent.drivers.bigip.l2 import BigipL2Manager
+from f5.oslbaasv1agent.drivers.bigip.audit import OrphanAudit
 from f5.oslbaasv1agent.drivers.bigip.network_direct import NetworkBuilderDirect
 import f5.oslbaasv1agent.drivers.bigip.lbaas_iapp as lbaas_iapp
 from f5.oslbaasv1agent.drivers.bigip.lbaas_bigip \
     import LBaaSBuilderBigipObjects, LBaaSBuilderBigipIApp
 from f5.oslbaasv1agent.drivers.bigip.lbaas_bigiq import LBaaSBuilderBigiqIApp
 from f5.oslbaasv1agent.drivers.bigip.utils import serialized
+from f5.oslbaasv1agent.drivers.bigip.utils import DeviceFanout
+from f5.oslbaasv1agent.drivers.bigip.utils import StepTimer
 
 from f5.bigip import bigip as f5_bigip
 from f5.common import constants as f5const
@@ -53,6 +56,7 @@ from f5.bigip import interfaces as bigip_interfaces
 from f5.bigip.interfaces import strip_domain_address
 
 from eventlet import greenthread
+import threading
 import uuid
 import urllib2
 import datetime
@@ -73,6 +77,20 @@ except:
     PLUGIN_CREATED_FLAG = plugin_const.ACTIVE
 # pylint: enable=bare-except
 
+# member states whose status is updated from the BIG-IP monitors
+MEMBER_STATUS_UPDATE_STATES = [plugin_const.ACTIVE,
+                               plugin_const.DOWN,
+                               plugin_const.INACTIVE]
+if PLUGIN_CREATED_FLAG not in MEMBER_STATUS_UPDATE_STATES:
+    MEMBER_STATUS_UPDATE_STATES.append(PLUGIN_CREATED_FLAG)
+
+# capacity metrics measured from the global statistics of a device
+GLOBAL_STATS_METRICS = ['throughput',
+                        'inbound_throughput',
+                        'outbound_throughput',
+                        'active_connections',
+                        'ssltps']
+
 # configuration objects specific to iControl driver
 OPTS = [
     cfg.StrOpt(
@@ -141,6 +159,31 @@ OPTS = [
         'f5_sync_mode', default='replication',
         help=_('The sync mechanism: autosync or replication'),
     ),
+    cfg.BoolOpt(
+        'f5_parallel_device_config', default=True,
+        help=_('In replication mode, configure all devices at once'),
+    ),
+    cfg.IntOpt(
+        'f5_concurrent_tenant_limit', default=4,
+        help=_('Number of tenants whose services can be configured '
+               'at the same time'),
+    ),
+    cfg.IntOpt(
+        'f5_audit_shards', default=16,
+        help=_('Number of parts the orphan audit splits the pools and '
+               'tenants on the BIG-IPs into, one checked at a time'),
+    ),
+    cfg.IntOpt(
+        'f5_audit_requests_per_second', default=10,
+        help=_('Maximum iControl REST requests per second to each '
+               'BIG-IP while the orphan audit runs, 0 for no limit'),
+    ),
+    cfg.IntOpt(
+        'f5_global_stats_seconds', default=60,
+        help=_('Number of seconds the global statistics read from a '
+               'BIG-IP are used for capacity metrics before they are '
+               'read again'),
+    ),
     cfg.StrOpt(
         'f5_vtep_folder', default='Common',
         help=_('Folder for the VTEP SelfIP'),
@@ -217,6 +260,18 @@ OPTS = [
         'icontrol_connection_retry_interval', default=10,
         help=_('How many seconds to wait between retry connection attempts'),
     ),
+    cfg.IntOpt(
+        'icontrol_connection_pool_size', default=10,
+        help=_('Maximum number of pooled iControl REST connections '
+               'kept open to each BIG-IP'),
+    ),
+    cfg.StrOpt(
+        'icontrol_wsdl_cache_path',
+        default='$state_path/f5-oslbaasv1-agent/wsdl',
+        help=_('Directory where iControl WSDLs read from the BIG-IPs are '
+               'kept for each TMOS version. It must only be writable by '
+               'the agent. Empty to always read them from the BIG-IPs'),
+    ),
     cfg.DictOpt(
         'common_network_ids', default={},
         help=_('network uuid to existing Common networks mapping')
@@ -272,6 +327,22 @@ class iControlDriver(LBaaSBaseDriver):
         # BIG-IP containers
         self.__bigips = {}
         self.__traffic_groups = []
+        # hostname -> (time read, global statistics)
+        self.__global_stats = {}
+        # seconds taken by each step of connecting to each device
+        self.init_timings = {}
+        self.device_fanout = DeviceFanout(
+            parallel=self.conf.f5_parallel_device_config)
+        # networks, route domains, tenant folders and config sync are
+        # shared by the tenants on each BIG-IP, so they are configured
+        # for one tenant at a time. The objects inside tenant folders
+        # are configured for up to f5_concurrent_tenant_limit tenants
+        # at the same time.
+        self.shared_config_lock = threading.RLock()
+        self.service_queue.max_concurrent = \
+            max(self.conf.f5_concurrent_tenant_limit, 1)
+        self.orphan_audit = OrphanAudit(self.conf, self)
+        self.audit_thread = None
 
         if self.conf.f5_global_routed_mode:
             LOG.info(_('WARNING - f5_global_routed_mode enabled.'
@@ -465,19 +536,18 @@ class iControlDriver(LBaaSBaseDriver):
                 f5const.CONNECTION_TIMEOUT = \
                     self.conf.icontrol_connection_timeout
 
-            first_bigip = self._open_bigip(self.hostnames[0])
-            self._init_bigip(first_bigip, self.hostnames[0], None)
+            self.init_timings = {}
+            first_bigip = self._connect_bigip(self.hostnames[0], None)
             self.__bigips[self.hostnames[0]] = first_bigip
 
             device_group_name = self._validate_ha(first_bigip)
             self._init_traffic_groups(first_bigip)
 
-            # connect to the rest of the devices
-            for hostname in self.hostnames[1:]:
-                bigip = self._open_bigip(hostname)
-                self._init_bigip(bigip, hostname, device_group_name)
-                self.__bigips[hostname] = bigip
+            # connect to the rest of the devices at the same time
+            self._connect_bigips(self.hostnames[1:], device_group_name)
 
+            self.agent_configurations['icontrol_init_timings'] = \
+                self.init_timings
             self.connected = True
 
         except NeutronException as exc:
@@ -491,24 +561,53 @@ class iControlDriver(LBaaSBaseDriver):
             greenthread.sleep(5)
             raise
 
+    def _connect_bigips(self, hostnames, device_group_name):
+        """ Open and prepare several bigips """
+        if not hostnames:
+            return
+        # f5_parallel_device_config decides whether they are
+        # connected at the same time or one after the other
+        self.__bigips.update(self.device_fanout.run_on_hostnames(
+            hostnames, self._connect_bigip, device_group_name))
+
+    def _connect_bigip(self, hostname, device_group_name):
+        """ Open and prepare a bigip, timing each step """
+        timer = StepTimer()
+        bigip = self._open_bigip(hostname)
+        timer.step('open')
+        self._init_bigip(bigip, hostname, device_group_name, timer)
+        self.init_timings[hostname] = timer.get_timings()
+        LOG.debug(_('Connecting to %s took %.5f secs: %s'
+                    % (hostname, self.init_timings[hostname]['total'],
+                       self.init_timings[hostname])))
+        return bigip
+
     def _open_bigip(self, hostname):
         """ Open bigip connection """
         LOG.info(_('Opening iControl connection to %s @ %s' %
                    (self.conf.icontrol_username, hostname)))
         return f5_bigip.BigIP(hostname, self.conf.icontrol_username,
                               self.conf.icontrol_password,
-                              f5const.CONNECTION_TIMEOUT)
+                              f5const.CONNECTION_TIMEOUT,
+                              self.conf.icontrol_connection_pool_size,
+                              self.conf.icontrol_wsdl_cache_path or None)
 
-    def _init_bigip(self, bigip, hostname, check_group_name=None):
+    def _init_bigip(self, bigip, hostname, check_group_name=None,
+                    timer=None):
         """ Prepare a bigip for usage """
+        if not timer:
+            timer = StepTimer()
         bigip.system.set_folder('/Common')
+        timer.step('set_folder')
         major_version, minor_version = _validate_bigip_version(bigip, hostname)
+        timer.step('version')
 
         extramb = bigip.system.get_provision_extramb()
         if int(extramb) < f5const.MIN_EXTRA_MB:
             raise f5ex.ProvisioningExtraMBValidateFailed(
                 'Device %s BIG-IP not provisioned for '
                 'management LARGE.' % hostname)
+        timer.step('extramb')
 
         if self.conf.f5_ha_type == 'pair' and \
                 bigip.cluster.get_sync_status() == 'Standalone':
@@ -521,6 +620,7 @@ class iControlDriver(LBaaSBaseDriver):
             raise f5ex.BigIPClusterInvalidHA(
                 'HA mode is pair and bigip %s in standalone mode'
                 % hostname)
+        timer.step('sync_status')
 
         if self.conf.f5_ha_type != 'standalone':
             device_group_name = bigip.device.get_device_group()
@@ -535,20 +635,24 @@ class iControlDriver(LBaaSBaseDriver):
                     ' %s but should be in %s.'
                     % (hostname, device_group_name, check_group_name))
             bigip.device_group_name = device_group_name
+            timer.step('device_group')
 
         for network in self.conf.common_network_ids.values():
             if not bigip.vlan.exists(network, folder='Common'):
                 raise f5ex.MissingNetwork(_(
                     'Common network %s on %s does not exist'
                     % (network, bigip.icontrol.hostname)))
+        timer.step('common_networks')
 
         if self.conf.icontrol_config_mode == 'iapp':
             lbaas_iapp.check_install_iapp(bigip)
+            timer.step('iapp')
 
         bigip.device_name = bigip.device.get_device_name()
         bigip.mac_addresses = bigip.interface.get_mac_addresses()
         bigip.device_interfaces = \
             bigip.interface.get_interface_macaddresses_dict()
+        timer.step('interfaces')
         bigip.assured_networks = []
         bigip.assured_tenant_snat_subnets = {}
         bigip.assured_gateway_subnets = []
@@ -558,10 +662,12 @@ class iControlDriver(LBaaSBaseDriver):
                 bigip.cluster.enable_auto_sync(device_group_name)
             else:
                 bigip.cluster.disable_auto_sync(device_group_name)
+            timer.step('auto_sync')
 
         # Turn off tunnel syncing... our VTEPs are local SelfIPs
         if bigip.system.get_tunnel_sync() == 'enable':
             bigip.system.set_tunnel_sync(enabled=False)
+        timer.step('tunnel_sync')
 
         LOG.debug(_('Connected to iControl %s @ %s ver %s.%s'
                     % (self.conf.icontrol_username, hostname,
@@ -627,39 +733,65 @@ class iControlDriver(LBaaSBaseDriver):
             highest_metric = 0.0
             highest_metric_name = None
             my_methods = dir(self)
+            metrics = []
             for metric in capacity_policy:
                 func_name = 'get_' + metric
                 if func_name in my_methods:
-                    max_capacity = int(capacity_policy[metric])
-                    metric_func = getattr(self, func_name)
-                    global_stats = []
-                    metric_value = 0
-                    for host in self.__bigips:
-                        hostbigip = self.__bigips[host]
-                        global_stats = hostbigip.stat.get_global_statistics()
-                        value = int(
-                            metric_func(bigip=hostbigip,
-                                        global_statistics=global_stats)
-                        )
-                        LOG.debug(_('calling capacity %s on %s returned: %s'
-                                    % (func_name,
-                                       hostbigip.icontrol.hostname,
-                                       value)))
-                        if value > metric_value:
-                            metric_value = value
-                    metric_capacity = float(metric_value) / float(max_capacity)
-                    if metric_capacity > highest_metric:
-                        highest_metric = metric_capacity
-                        highest_metric_name = metric
+                    metrics.append(metric)
                 else:
                     LOG.warn(_('capacity policy has method '
                                '%s which is not implemented in this driver'
                                % metric))
+            # read the global statistics of each device once, for
+            # all of the metrics which use them
+            global_stats = {}
+            for metric in metrics:
+                if metric in GLOBAL_STATS_METRICS:
+                    global_stats = self.fanout(self.get_all_bigips(),
+                                               self.get_global_statistics)
+                    break
+            for metric in metrics:
+                func_name = 'get_' + metric
+                max_capacity = int(capacity_policy[metric])
+                metric_func = getattr(self, func_name)
+                metric_value = 0
+                for host in self.__bigips:
+                    hostbigip = self.__bigips[host]
+                    value = int(
+                        metric_func(
+                            bigip=hostbigip,
+                            global_statistics=global_stats.get(
+                                hostbigip.device_name))
+                    )
+                    LOG.debug(_('calling capacity %s on %s returned: %s'
+                                % (func_name,
+                                   hostbigip.icontrol.hostname,
+                                   value)))
+                    if value > metric_value:
+                        metric_value = value
+                metric_capacity = float(metric_value) / float(max_capacity)
+                if metric_capacity > highest_metric:
+                    highest_metric = metric_capacity
+                    highest_metric_name = metric
             LOG.debug('capacity score: %s based on %s'
                       % (highest_metric, highest_metric_name))
             return highest_metric
         return 0
 
+    def get_global_statistics(self, bigip):
+        """ Global statistics of a big-ip, read at most once every
+            f5_global_stats_seconds """
+        hostname = bigip.icontrol.hostname
+        now = time()
+        if hostname in self.__global_stats:
+            (read_time, global_stats) = self.__global_stats[hostname]
+            if now - read_time < self.conf.f5_global_stats_seconds:
+                return global_stats
+        global_stats = bigip.stat.get_global_statistics()
+        if global_stats:
+            self.__global_stats[hostname] = (now, global_stats)
+        return global_stats
+
     def set_context(self, context):
         """ Context to keep for database access """
         self.context = context
@@ -833,94 +965,151 @@ class iControlDriver(LBaaSBaseDriver):
                 stats[lb_const.STATS_TOTAL_CONNECTIONS] += \
                     pool_stats['STATISTIC_SERVER_SIDE_TOTAL_CONNECTIONS']
                 # are there members to update status
-                if 'members' in service:
-                    # only query BIG-IP pool members if they
-                    # not in a state indicating provisioning or error
-                    # provisioning the pool member
-                    some_members_require_status_update = False
-                    update_if_status = [plugin_const.ACTIVE,
-                                        plugin_const.DOWN,
-                                        plugin_const.INACTIVE]
-                    if PLUGIN_CREATED_FLAG not in update_if_status:
-                        update_if_status.append(PLUGIN_CREATED_FLAG)
-
-                    for member in service['members']:
-                        if member['status'] in update_if_status:
-                            some_members_require_status_update = True
-                    # are we have members who are in a
-                    # state to update there status
-                    if some_members_require_status_update:
-                        # query pool members on each BIG-IP
-                        monitor_states = \
-                            hostbigip.pool.get_members_monitor_status(
-                                name=pool['id'],
-                                folder=pool['tenant_id'],
-                                config_mode=self.conf.icontrol_config_mode
-                            )
-                        for member in service['members']:
-                            if member['status'] in update_if_status:
-                                # create the entry for this
-                                # member in the return status
-                                # dictionary set to ACTIVE
-                                if not member['id'] in members:
-                                    members[member['id']] = \
-                                        {'status': plugin_const.INACTIVE}
-                                # check if it down or up by monitor
-                                # and update the status
-                                for state in monitor_states:
-                                    # matched the pool member
-                                    # by address and port number
-                                    if member['address'] == \
-                                            strip_domain_address(
-                                            state['addr']) and \
-                                            int(member['protocol_port']) == \
-                                            int(state['port']):
-                                        # if the monitor says member is up
-                                        if state['state'] == \
-                                                'MONITOR_STATUS_UP' or \
-                                           state['state'] == \
-                                                'MONITOR_STATUS_UNCHECKED':
-                                            # set ACTIVE as long as the
-                                            # status was not set to 'DOWN'
-                                            # on another BIG-IP
-                                            if members[
-                                                member['id']]['status'] != \
-                                                    'DOWN':
-                                                if member['admin_state_up']:
-                                                    members[member['id']][
-                                                        'status'] = \
-                                                        plugin_const.ACTIVE
-                                                else:
-                                                    members[member['id']][
-                                                        'status'] = \
-                                                        plugin_const.INACTIVE
-                                        else:
-                                            members[member['id']]['status'] = \
-                                                plugin_const.DOWN
+                if self._members_require_status_update(service):
+                    # query pool members on each BIG-IP
+                    monitor_states = \
+                        hostbigip.pool.get_members_monitor_status(
+                            name=pool['id'],
+                            folder=pool['tenant_id'],
+                            config_mode=self.conf.icontrol_config_mode
+                        )
+                    self._set_member_monitor_status(service, monitor_states,
+                                                    members)
         stats['members'] = members
         return stats
 
-    @serialized('remove_orphans')
+    @is_connected
+    def get_all_stats(self, services):
+        """ Get stats for many services at once.
+
+            Pool statistics and member monitor states are read for
+            all pools of each big-ip in two requests, rather than
+            three requests per pool. Returns stats like get_stats,
+            keyed by pool id, for the pools found on the big-ips. """
+        services = [service for service in services if service['pool']]
+        need_members = False
+        for service in services:
+            if self._members_require_status_update(service):
+                need_members = True
+                break
+
+        def _get_bigip_stats(bigip):
+            """ Read the stats of all pools on one big-ip """
+            monitor_states = {}
+            if need_members:
+                monitor_states = \
+                    bigip.pool.get_all_members_monitor_status()
+            return (bigip.pool.get_all_statistics(), monitor_states)
+        bigip_stats = self.fanout(self.get_all_bigips(), _get_bigip_stats)
+
+        all_stats = {}
+        for service in services:
+            pool = service['pool']
+            stats = {}
+            members = {}
+            for (pool_stats, monitor_states) in bigip_stats.values():
+                if pool['id'] not in pool_stats:
+                    continue
+                pool_stat = pool_stats[pool['id']]
+                if not stats:
+                    stats[lb_const.STATS_IN_BYTES] = 0
+                    stats[lb_const.STATS_OUT_BYTES] = 0
+                    stats[lb_const.STATS_ACTIVE_CONNECTIONS] = 0
+                    stats[lb_const.STATS_TOTAL_CONNECTIONS] = 0
+                if 'STATISTIC_SERVER_SIDE_BYTES_IN' in pool_stat:
+                    stats[lb_const.STATS_IN_BYTES] += \
+                        pool_stat['STATISTIC_SERVER_SIDE_BYTES_IN']
+                    stats[lb_const.STATS_OUT_BYTES] += \
+                        pool_stat['STATISTIC_SERVER_SIDE_BYTES_OUT']
+                    stats[lb_const.STATS_ACTIVE_CONNECTIONS] += \
+                        pool_stat['STATISTIC_SERVER_SIDE_CURRENT_CONNECTIONS']
+                    stats[lb_const.STATS_TOTAL_CONNECTIONS] += \
+                        pool_stat['STATISTIC_SERVER_SIDE_TOTAL_CONNECTIONS']
+                    if self._members_require_status_update(service):
+                        self._set_member_monitor_status(
+                            service, monitor_states.get(pool['id'], []),
+                            members)
+            if stats:
+                stats['members'] = members
+                all_stats[pool['id']] = stats
+        return all_stats
+
+    @staticmethod
+    def _members_require_status_update(service):
+        """ Are there members in a state to update their status.
+            Only query BIG-IP pool members if they are not in a state
+            indicating provisioning or error provisioning the member """
+        if 'members' not in service:
+            return False
+        for member in service['members']:
+            if member['status'] in MEMBER_STATUS_UPDATE_STATES:
+                return True
+        return False
+
+    @staticmethod
+    def _set_member_monitor_status(service, monitor_states, members):
+        """ Set the status of the service members in members from
+            their monitor states on one BIG-IP """
+        for member in service['members']:
+            if member['status'] in MEMBER_STATUS_UPDATE_STATES:
+                # create the entry for this
+                # member in the return status
+                # dictionary set to ACTIVE
+                if not member['id'] in members:
+                    members[member['id']] = \
+                        {'status': plugin_const.INACTIVE}
+                # check if it down or up by monitor
+                # and update the status
+                for state in monitor_states:
+                    # matched the pool member
+                    # by address and port number
+                    if member['address'] == \
+                            strip_domain_address(state['addr']) and \
+                            int(member['protocol_port']) == \
+                            int(state['port']):
+                        # if the monitor says member is up
+                        if state['state'] == 'MONITOR_STATUS_UP' or \
+                           state['state'] == 'MONITOR_STATUS_UNCHECKED':
+                            # set ACTIVE as long as the
+                            # status was not set to 'DOWN'
+                            # on another BIG-IP
+                            if members[member['id']]['status'] != 'DOWN':
+                                if member['admin_state_up']:
+                                    members[member['id']]['status'] = \
+                                        plugin_const.ACTIVE
+                                else:
+                                    members[member['id']]['status'] = \
+                                        plugin_const.INACTIVE
+                        else:
+                            members[member['id']]['status'] = \
+                                plugin_const.DOWN
+
     def remove_orphans(self, all_pools):
-        """ Remove out-of-date configuration on big-ips """
-        existing_tenants = []
-        existing_pools = []
-        for pool in all_pools:
-            existing_tenants.append(pool['tenant_id'])
-            existing_pools.append(pool['pool_id'])
-        for bigip in self.get_all_bigips():
-            bigip.pool.purge_orphaned_pools(existing_pools)
-        for bigip in self.get_all_bigips():
-            bigip.system.purge_orphaned_folders_contents(existing_tenants)
+        """ Remove out-of-date configuration on big-ips.
+            This starts an audit which audit_orphans works through
+            a shard at a time. """
+        self.orphan_audit.start(all_pools)
 
-        sudslog = std_logging.getLogger('suds.client')
-        sudslog.setLevel(std_logging.FATAL)
-        for bigip in self.get_all_bigips():
-            bigip.system.force_root_folder()
-        sudslog.setLevel(std_logging.ERROR)
+    @is_connected
+    def audit_orphans(self):
+        """ Check the next shard of the orphan audit in the background """
+        if self.audit_thread:
+            # the previous shard is still being checked
+            return
+        self.audit_thread = greenthread.spawn(self._audit_orphans_shard)
 
-        for bigip in self.get_all_bigips():
-            bigip.system.purge_orphaned_folders(existing_tenants)
+    def _audit_orphans_shard(self):
+        """ Check the next shard of the orphan audit """
+        try:
+            self.orphan_audit.tick()
+        except Exception as exc:
+            LOG.error(_('orphan audit failed: %s' % exc.message))
+        finally:
+            self.audit_thread = None
+
+    def get_audit_statistics(self):
+        """ Get the drift found by the orphan audit """
+        return self.orphan_audit.get_statistics()
 
     def fdb_add(self, fdb):
         """ Add (L2toL3) forwarding database entries """
@@ -1021,6 +1210,7 @@ class iControlDriver(LBaaSBaseDriver):
         if not service['pool']:
             LOG.error("_common_service_handler: Service pool is None")
             return
+        self.orphan_audit.know_service(service)
 
         # Here we look to see if the tenant has big-ips and
         # so we should use bigiq (if enabled) or fall back
@@ -1032,20 +1222,21 @@ class iControlDriver(LBaaSBaseDriver):
         else:
             use_bigiq = False
 
-        if not use_bigiq:
-            self.tenant_manager.assure_tenant_created(service)
-            LOG.debug("    _assure_tenant_created took %.5f secs" %
-                      (time() - start_time))
-
         traffic_group = self._service_to_traffic_group(service)
 
-        if not use_bigiq and self.network_builder:
-            start_time = time()
-            self.network_builder.prep_service_networking(
-                service, traffic_group)
-            if time() - start_time > .001:
-                LOG.debug("    _prep_service_networking "
-                          "took %.5f secs" % (time() - start_time))
+        if not use_bigiq:
+            with self.shared_config_lock:
+                self.tenant_manager.assure_tenant_created(service)
+                LOG.debug("    _assure_tenant_created took %.5f secs" %
+                          (time() - start_time))
+
+                if self.network_builder:
+                    start_time = time()
+                    self.network_builder.prep_service_networking(
+                        service, traffic_group)
+                    if time() - start_time > .001:
+                        LOG.debug("    _prep_service_networking "
+                                  "took %.5f secs" % (time() - start_time))
 
         all_subnet_hints = {}
         if use_bigiq:
@@ -1069,26 +1260,27 @@ class iControlDriver(LBaaSBaseDriver):
                 self.lbaas_builder_bigip_objects.assure_service(
                     service, traffic_group, all_subnet_hints)
 
-        if not use_bigiq and self.network_builder:
-            start_time = time()
-            try:
-                self.network_builder.post_service_networking(
-                    service, all_subnet_hints)
-            except NeutronException as exc:
-                LOG.error("post_service_networking exception: %s"
-                          % str(exc.msg))
-            except Exception as exc:
-                LOG.error("post_service_networking exception: %s"
-                          % str(exc.message))
-            LOG.debug("    _post_service_networking took %.5f secs" %
-                      (time() - start_time))
-
         if not use_bigiq:
-            start_time = time()
-            self.tenant_manager.assure_tenant_cleanup(
-                service, all_subnet_hints)
-            LOG.debug("    _assure_tenant_cleanup took %.5f secs" %
-                      (time() - start_time))
+            with self.shared_config_lock:
+                if self.network_builder:
+                    start_time = time()
+                    try:
+                        self.network_builder.post_service_networking(
+                            service, all_subnet_hints)
+                    except NeutronException as exc:
+                        LOG.error("post_service_networking exception: %s"
+                                  % str(exc.msg))
+                    except Exception as exc:
+                        LOG.error("post_service_networking exception: %s"
+                                  % str(exc.message))
+                    LOG.debug("    _post_service_networking took %.5f secs"
+                              % (time() - start_time))
+
+                start_time = time()
+                self.tenant_manager.assure_tenant_cleanup(
+                    service, all_subnet_hints)
+                LOG.debug("    _assure_tenant_cleanup took %.5f secs" %
+                          (time() - start_time))
 
         self._update_service_status(service)
 
@@ -1097,72 +1289,71 @@ class iControlDriver(LBaaSBaseDriver):
         LOG.debug("    final sync took %.5f secs" % (time() - start_time))
 
     def _update_service_status(self, service):
-        """ Update status of objects in OpenStack """
+        """ Update status of objects in OpenStack.
+
+            All status changes for the service are sent to the plugin
+            in one update_service_statuses call, or one by one if the
+            plugin does not have it. Changes the plugin could not apply
+            are sent again one by one. """
 
         # plugin_rpc may not be set when unit testing
         if not self.plugin_rpc:
             return
-        self._update_members_status(service['members'])
-        self._update_pool_status(service['pool'])
-        self._update_pool_monitors_status(service)
-        self._update_vip_status(service['vip'])
+        statuses = {'members': [],
+                    'members_destroyed': [],
+                    'pool': None,
+                    'pool_destroyed': None,
+                    'health_monitors': [],
+                    'health_monitors_destroyed': [],
+                    'vip': None,
+                    'vip_destroyed': None}
+        self._update_members_status(service['members'], statuses)
+        self._update_pool_status(service['pool'], statuses)
+        self._update_pool_monitors_status(service, statuses)
+        self._update_vip_status(service['vip'], statuses)
+        start_time = time()
+        self.plugin_rpc.update_service_statuses(statuses)
+        LOG.debug("            update_service_statuses"
+                  " took %.5f secs" % (time() - start_time))
 
-    def _update_members_status(self, members):
-        """ Update member status in OpenStack """
+    def _update_members_status(self, members, statuses):
+        """ Collect member status changes for OpenStack """
         for member in members:
             if member['status'] == plugin_const.PENDING_CREATE:
-                start_time = time()
-                self.plugin_rpc.update_member_status(
-                    member['id'],
-                    status=PLUGIN_CREATED_FLAG,
-                    status_description='member created')
-                LOG.debug("            update_member_status"
-                          " took %.5f secs" % (time() - start_time))
+                statuses['members'].append(
+                    {'member_id': member['id'],
+                     'status': PLUGIN_CREATED_FLAG,
+                     'status_description': 'member created'})
             elif member['status'] == plugin_const.PENDING_UPDATE:
-                start_time = time()
                 status = plugin_const.ACTIVE
                 if 'admin_state_up' in member and \
                         not member['admin_state_up']:
                     status = plugin_const.INACTIVE
-                self.plugin_rpc.update_member_status(
-                    member['id'],
-                    status=status,
-                    status_description='member updated')
-                LOG.debug("            update_member_status"
-                          " took %.5f secs" % (time() - start_time))
+                statuses['members'].append(
+                    {'member_id': member['id'],
+                     'status': status,
+                     'status_description': 'member updated'})
             elif member['status'] == plugin_const.PENDING_DELETE:
-                try:
-                    self.plugin_rpc.member_destroyed(member['id'])
-                except Exception as exc:
-                    LOG.error(_("Plugin delete member %s error: %s"
-                                % (member['id'], exc.message)))
-
-    def _update_pool_status(self, pool):
-        """ Update pool status in OpenStack """
+                statuses['members_destroyed'].append(member['id'])
+
+    def _update_pool_status(self, pool, statuses):
+        """ Collect pool status changes for OpenStack """
         status = plugin_const.ACTIVE
         if 'admin_state_up' in pool and not pool['admin_state_up']:
             status = plugin_const.INACTIVE
         if pool['status'] == plugin_const.PENDING_UPDATE:
-            self.plugin_rpc.update_pool_status(
-                pool['id'],
-                status=status,
-                status_description='pool updated')
+            statuses['pool'] = {'pool_id': pool['id'],
+                                'status': status,
+                                'status_description': 'pool updated'}
         elif pool['status'] == plugin_const.PENDING_CREATE:
-            self.plugin_rpc.update_pool_status(
-                pool['id'],
-                status=status,
-                status_description='pool created')
+            statuses['pool'] = {'pool_id': pool['id'],
+                                'status': status,
+                                'status_description': 'pool created'}
         elif pool['status'] == plugin_const.PENDING_DELETE:
-            try:
-                self.plugin_rpc.pool_destroyed(pool['id'])
-            except Exception as exc:
-                LOG.error(_("Plugin destroy pool %s error: %s"
-                            % (pool['id'], exc.message)))
+            statuses['pool_destroyed'] = pool['id']
 
-    def _update_pool_monitors_status(self, service):
-        """ Update pool monitor status in OpenStack """
-        monitors_destroyed = []
-        monitors_updated = []
+    def _update_pool_monitors_status(self, service, statuses):
+        """ Collect pool monitor status changes for OpenStack """
         pool = service['pool']
 
         LOG.debug("update_pool_monitors_status: service: %s" % service)
@@ -1177,58 +1368,36 @@ class iControlDriver(LBaaSBaseDriver):
             if monitor['id'] in health_monitors_status:
                 if health_monitors_status[monitor['id']] == \
                         plugin_const.PENDING_DELETE:
-                    monitors_destroyed.append(
+                    statuses['health_monitors_destroyed'].append(
                         {'health_monitor_id': monitor['id'],
                          'pool_id': pool['id']})
                 elif health_monitors_status[monitor['id']] == \
                         plugin_const.PENDING_UPDATE or \
                         health_monitors_status[monitor['id']] == \
                         plugin_const.PENDING_CREATE:
-                    monitors_updated.append(
+                    statuses['health_monitors'].append(
                         {'pool_id': pool['id'],
                          'health_monitor_id': monitor['id'],
                          'status': plugin_const.ACTIVE,
                          'status_description': 'monitor active'})
 
-        LOG.debug("Monitors to destroy: %s" % monitors_destroyed)
-        for monitor_destroyed in monitors_destroyed:
-            LOG.debug("Monitor destroying: %s" % monitor_destroyed)
-            self.plugin_rpc.health_monitor_destroyed(
-                **monitor_destroyed)
-        for monitor_updated in monitors_updated:
-            try:
-                self.plugin_rpc.update_health_monitor_status(
-                    **monitor_updated)
-            except Exception as exc:
-                if 'PENDING_DELETE' in str(exc):
-                    LOG.debug("Attempted to update monitor being deleted!")
-                else:
-                    LOG.debug(str(exc))
-                    raise
+        LOG.debug("Monitors to destroy: %s"
+                  % statuses['health_monitors_destroyed'])
 
-    def _update_vip_status(self, vip):
-        """ Update vip status in OpenStack """
+    def _update_vip_status(self, vip, statuses):
+        """ Collect vip status changes for OpenStack """
         status = plugin_const.ACTIVE
         if 'admin_state_up' in vip and not vip['admin_state_up']:
             status = plugin_const.INACTIVE
         if 'id' not in vip:
             return
-        if vip['status'] == plugin_const.PENDING_CREATE:
-            self.plugin_rpc.update_vip_status(
-                vip['id'],
-                status=status,
-                status_description=None)
-        elif vip['status'] == plugin_const.PENDING_UPDATE:
-            self.plugin_rpc.update_vip_status(
-                vip['id'],
-                status=status,
-                status_description=None)
+        if vip['status'] == plugin_const.PENDING_CREATE or \
+                vip['status'] == plugin_const.PENDING_UPDATE:
+            statuses['vip'] = {'vip_id': vip['id'],
+                               'status': status,
+                               'status_description': None}
         elif vip['status'] == plugin_const.PENDING_DELETE:
-            try:
-                self.plugin_rpc.vip_destroyed(vip['id'])
-            except Exception as exc:
-                LOG.error(_("Plugin delete vip %s error: %s"
-                            % (vip['id'], exc.message)))
+            statuses['vip_destroyed'] = vip['id']
 
     def _service_to_traffic_group(self, service):
         """ Hash service tenant id to index of traffic group """
@@ -1251,6 +1420,26 @@ class iControlDriver(LBaaSBaseDriver):
                 pass
         raise urllib2.URLError('cannot communicate to any bigips')
 
+    def get_icr_statistics(self):
+        """ Get iControl REST connection statistics for each big-ip """
+        icr_stats = {}
+        for host in self.__bigips:
+            icr_stats[host] = self.__bigips[host].get_icr_statistics()
+        return icr_stats
+
+    def get_device_ids(self):
+        """ Identify the big-ips under management by name and mac
+            addresses, keyed by hostname. Empty until connected. """
+        device_ids = {}
+        for host in self.__bigips:
+            bigip = self.__bigips[host]
+            if not hasattr(bigip, 'mac_addresses'):
+                return {}
+            device_ids[host] = hashlib.sha1(
+                bigip.device_name +
+                repr(sorted(bigip.mac_addresses))).hexdigest()
+        return device_ids
+
     def get_bigip_hosts(self):
         """ Get all big-ips hostnames under management """
         return self.__bigips
@@ -1259,6 +1448,11 @@ class iControlDriver(LBaaSBaseDriver):
         """ Get all big-ips under management """
         return self.__bigips.values()
 
+    def fanout(self, bigips, operation, *args, **kwargs):
+        """ Call operation(bigip, *args, **kwargs) on all of the big-ips
+            at the same time. Returns results keyed by device name. """
+        return self.device_fanout.run(bigips, operation, *args, **kwargs)
+
     def get_config_bigips(self):
         """ Return a list of big-ips that need to be configured.
             In replication sync mode, we configure all big-ips
@@ -1300,30 +1494,74 @@ class iControlDriver(LBaaSBaseDriver):
 
     def get_clientssl_profile_count(self, bigip=None, global_statistics=None):
         if bigip:
-            return len(bigip.ssl.all_client_profile_names())
+            return self._get_object_count(bigip, 'clientssl_profiles')
 
     def get_tenant_count(self, bigip=None, global_statistics=None):
         if bigip:
-            folders = bigip.system.get_folders()
-            folders.remove('/')
-            folders.remove('Common')
-            return len(folders)
+            return self._get_object_count(bigip, 'folders')
 
     def get_tunnel_count(self, bigip=None, global_statistics=None):
         if bigip:
-            vxlan_tunnels = bigip.vxlan.get_tunnels(folder='/')
-            gre_tunnels = bigip.l2gre.get_tunnels(folder='/')
-            return len(vxlan_tunnels) + len(gre_tunnels)
+            return self._get_object_count(bigip, 'tunnels')
 
     def get_vlan_count(self, bigip=None, global_statistics=None):
         if bigip:
-            return len(bigip.vlan.get_vlans(folder='/'))
+            return self._get_object_count(bigip, 'vlans')
 
     def get_route_domain_count(self, bigip=None, global_statistics=None):
         if bigip:
-            domain_ids = bigip.route.get_domain_ids(folder='/')
-            domain_ids.remove(0)
-            return len(domain_ids)
+            return self._get_object_count(bigip, 'route_domains')
+
+    def _get_object_count(self, bigip, kind):
+        """ Count of objects of kind kept by the big-ip, listing
+            them from the big-ip only if they were never counted """
+        count = bigip.object_counter.get(kind)
+        if count is None:
+            count = self.reconcile_object_count(bigip, kind)
+        return count
+
+    def reconcile_object_counts(self, bigip):
+        """ List the kinds of objects counted on a big-ip to correct
+            the counts kept as objects are created and deleted.
+            Returns the drift found for each kind. """
+        drift = {}
+        for kind in list(bigip.object_counter.counts):
+            self.reconcile_object_count(bigip, kind)
+            drift[kind] = bigip.object_counter.drift.get(kind, 0)
+        return drift
+
+    def reconcile_object_count(self, bigip, kind):
+        """ List the objects of kind on a big-ip to correct its count """
+        count = getattr(self, '_count_' + kind)(bigip)
+        bigip.object_counter.reconcile(kind, count)
+        return count
+
+    @staticmethod
+    def _count_clientssl_profiles(bigip):
+        return len(bigip.ssl.all_client_profile_names())
+
+    @staticmethod
+    def _count_folders(bigip):
+        folders = bigip.system.get_folders()
+        folders.remove('/')
+        folders.remove('Common')
+        return len(folders)
+
+    @staticmethod
+    def _count_tunnels(bigip):
+        vxlan_tunnels = bigip.vxlan.get_tunnels(folder='/') or []
+        gre_tunnels = bigip.l2gre.get_tunnels(folder='/') or []
+        return len(vxlan_tunnels) + len(gre_tunnels)
+
+    @staticmethod
+    def _count_vlans(bigip):
+        return len(bigip.vlan.get_vlans(folder='/'))
+
+    @staticmethod
+    def _count_route_domains(bigip):
+        domain_ids = bigip.route.get_domain_ids(folder='/')
+        domain_ids.remove(0)
+        return len(domain_ids)
 
     def _init_traffic_groups(self, bigip):
         """ Count vips and gws on traffic groups """
@@ -1339,7 +1577,8 @@ class iControlDriver(LBaaSBaseDriver):
                 len(self.get_all_bigips()) < 2:
             return
         bigip = self.get_bigip()
-        self._sync_with_retries(bigip)
+        with self.shared_config_lock:
+            self._sync_with_retries(bigip)
 
     def _sync_with_retries(self, bigip, force_now=False,
                            attempts=4, retry_delay=130):
@@ -54,17 +54,17 @@ class LBaaSBuilderBigipObjects(LBaaSBuilder):
         self._check_monitor_delete(service)
 
         start_time = time()
-        self._assure_pool_create(service['pool'])
+        pool_states = self._assure_pool_create(service['pool'])
         LOG.debug("    _assure_pool_create took %.5f secs" %
                   (time() - start_time))
 
         start_time = time()
-        self._assure_pool_monitors(service)
+        self._assure_pool_monitors(service, pool_states)
         LOG.debug("    _assure_pool_monitors took %.5f secs" %
                   (time() - start_time))
 
         start_time = time()
-        self._assure_members(service, all_subnet_hints)
+        self._assure_members(service, all_subnet_hints, pool_states)
         LOG.debug("    _assure_members took %.5f secs" %
                   (time() - start_time))
 
@@ -81,28 +81,41 @@ class LBaaSBuilderBigipObjects(LBaaSBuilder):
         return all_subnet_hints
 
     def _assure_pool_create(self, pool):
-        """ Provision Pool - Create/Update """
+        """ Provision Pool - Create/Update
+
+            Returns the pool state read from each big-ip, keyed by
+            device name, for the monitor and member reconciliation. """
         # Service Layer (Shared Config)
-        for bigip in self.driver.get_config_bigips():
-            self.bigip_pool_manager.assure_bigip_pool_create(bigip, pool)
+        return self.driver.fanout(
+            self.driver.get_config_bigips(),
+            self.bigip_pool_manager.assure_bigip_pool_create,
+            pool)
 
-    def _assure_pool_monitors(self, service):
+    def _assure_pool_monitors(self, service, pool_states):
         """
             Provision Health Monitors - Create/Update
         """
         # Service Layer (Shared Config)
-        for bigip in self.driver.get_config_bigips():
-            self.bigip_pool_manager.assure_bigip_pool_monitors(bigip, service)
-
-    def _assure_members(self, service, all_subnet_hints):
+        def _assure_bigip_pool_monitors(bigip):
+            """ Provision monitors on one big-ip """
+            self.bigip_pool_manager.assure_bigip_pool_monitors(
+                bigip, service, pool_states.get(bigip.device_name))
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           _assure_bigip_pool_monitors)
+
+    def _assure_members(self, service, all_subnet_hints, pool_states):
         """
             Provision Members - Create/Update
         """
         # Service Layer (Shared Config)
-        for bigip in self.driver.get_config_bigips():
+        def _assure_bigip_members(bigip):
+            """ Provision members on one big-ip """
             subnet_hints = all_subnet_hints[bigip.device_name]
             self.bigip_pool_manager.assure_bigip_members(
-                bigip, service, subnet_hints)
+                bigip, service, subnet_hints,
+                pool_states.get(bigip.device_name))
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           _assure_bigip_members)
 
         # avoids race condition:
         # deletion of pool member objects must sync before we
@@ -115,44 +128,51 @@ class LBaaSBuilderBigipObjects(LBaaSBuilder):
         if 'id' not in vip:
             return
 
-        bigips = self.driver.get_config_bigips()
-        for bigip in bigips:
-            subnet_hints = all_subnet_hints[bigip.device_name]
-            subnet = vip['subnet']
-
-            if vip['status'] == plugin_const.PENDING_CREATE or \
-               vip['status'] == plugin_const.PENDING_UPDATE:
-                self.bigip_vip_manager.assure_bigip_create_vip(
-                    bigip, service, traffic_group)
-                if subnet and subnet['id'] in \
-                        subnet_hints['check_for_delete_subnets']:
-                    del subnet_hints['check_for_delete_subnets'][subnet['id']]
-                if subnet and subnet['id'] not in \
-                        subnet_hints['do_not_delete_subnets']:
-                    subnet_hints['do_not_delete_subnets'].append(subnet['id'])
-
-            elif vip['status'] == plugin_const.PENDING_DELETE:
-                self.bigip_vip_manager.assure_bigip_delete_vip(bigip, service)
-                if subnet and subnet['id'] not in \
-                        subnet_hints['do_not_delete_subnets']:
-                    subnet_hints['check_for_delete_subnets'][subnet['id']] = \
-                        {'network': vip['network'],
-                         'subnet': subnet,
-                         'is_for_member': False}
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           self._assure_bigip_vip, service, traffic_group,
+                           all_subnet_hints)
 
         # avoids race condition:
         # deletion of vip address must sync before we
         # remove the selfip from the peer bigips.
         self.driver.sync_if_clustered()
 
+    def _assure_bigip_vip(self, bigip, service, traffic_group,
+                          all_subnet_hints):
+        """ Ensure the vip is on one bigip. """
+        vip = service['vip']
+        subnet_hints = all_subnet_hints[bigip.device_name]
+        subnet = vip['subnet']
+
+        if vip['status'] == plugin_const.PENDING_CREATE or \
+           vip['status'] == plugin_const.PENDING_UPDATE:
+            self.bigip_vip_manager.assure_bigip_create_vip(
+                bigip, service, traffic_group)
+            if subnet and subnet['id'] in \
+                    subnet_hints['check_for_delete_subnets']:
+                del subnet_hints['check_for_delete_subnets'][subnet['id']]
+            if subnet and subnet['id'] not in \
+                    subnet_hints['do_not_delete_subnets']:
+                subnet_hints['do_not_delete_subnets'].append(subnet['id'])
+
+        elif vip['status'] == plugin_const.PENDING_DELETE:
+            self.bigip_vip_manager.assure_bigip_delete_vip(bigip, service)
+            if subnet and subnet['id'] not in \
+                    subnet_hints['do_not_delete_subnets']:
+                subnet_hints['check_for_delete_subnets'][subnet['id']] = \
+                    {'network': vip['network'],
+                     'subnet': subnet,
+                     'is_for_member': False}
+
     def _assure_pool_delete(self, service):
         """ Assure pool is deleted from big-ip """
         if service['pool']['status'] != plugin_const.PENDING_DELETE:
             return
 
         # Service Layer (Shared Config)
-        for bigip in self.driver.get_config_bigips():
-            self.bigip_pool_manager.assure_bigip_pool_delete(bigip, service)
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           self.bigip_pool_manager.assure_bigip_pool_delete,
+                           service)
 
     def _check_monitor_delete(self, service):
         """If the pool is being deleted, then delete related objects"""
@@ -178,9 +198,13 @@ class LBaaSBuilderBigipIApp(LBaaSBuilderIApp):
 
     def assure_service(self, service, traffic_group, all_subnet_hints):
         LOG.debug("    assure_service 1")
-        for bigip in self.driver.get_config_bigips():
+
+        def _assure_bigip_service(bigip):
+            """ Configure the service on one big-ip """
             subnet_hints = all_subnet_hints[bigip.device_name]
             self.assure_bigip_service(bigip, service, subnet_hints)
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           _assure_bigip_service)
 
     def assure_bigip_service(self, bigip, service, subnet_hints):
         """ Configure the service """
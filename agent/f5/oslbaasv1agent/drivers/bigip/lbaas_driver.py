@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from f5.oslbaasv1agent.drivers.bigip.utils import ServiceScheduler
 
 
 class LBaaSBaseDriver(object):
@@ -23,7 +24,7 @@ class LBaaSBaseDriver(object):
         self.agent_id = None
         self.plugin_rpc = None
         self.connected = False
-        self.service_queue = []
+        self.service_queue = ServiceScheduler()
         self.agent_configurations = {}
 
     def set_context(self, context):
@@ -54,10 +55,18 @@ class LBaaSBaseDriver(object):
         """ Persist backend configuratoins """
         raise NotImplementedError()
 
+    def get_device_ids(self):
+        """ Identify the Driver Targets, keyed by host """
+        raise NotImplementedError()
+
     def get_stats(self, service):
         """ Get Stats for a Pool Service """
         raise NotImplementedError()
 
+    def get_all_stats(self, services):
+        """ Get Stats for many Pool Services, keyed by pool id """
+        raise NotImplementedError()
+
     def exists(self, service):
         """ Check If LBaaS Service is Defined on Driver Target """
         raise NotImplementedError()
@@ -70,6 +79,10 @@ class LBaaSBaseDriver(object):
         """ Remove Unknown Service from Driver Target """
         raise NotImplementedError()
 
+    def audit_orphans(self):
+        """ Continue Removing Unknown Services from Driver Target """
+        raise NotImplementedError()
+
     def create_vip(self, vip, service):
         """ LBaaS Create VIP """
         raise NotImplementedError()
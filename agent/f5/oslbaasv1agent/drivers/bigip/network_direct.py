@@ -27,7 +27,6 @@ from f5.bigip.interfaces import strip_domain_address
 from f5.oslbaasv1agent.drivers.bigip.selfips import BigipSelfIpManager
 from f5.oslbaasv1agent.drivers.bigip.snats import BigipSnatManager
 
-import itertools
 import netaddr
 
 LOG = logging.getLogger(__name__)
@@ -90,12 +89,8 @@ class NetworkBuilderDirect(object):
 
         # Per Device Network Connectivity (VLANs or Tunnels)
         subnetsinfo = _get_subnets_to_assure(service)
-        for (assure_bigip, subnetinfo) in \
-                itertools.product(self.driver.get_all_bigips(), subnetsinfo):
-            self.bigip_l2_manager.assure_bigip_network(
-                assure_bigip, subnetinfo['network'])
-            self.bigip_selfip_manager.assure_bigip_selfip(
-                assure_bigip, service, subnetinfo)
+        self.driver.fanout(self.driver.get_all_bigips(),
+                           self._assure_bigip_networks, service, subnetsinfo)
 
         # L3 Shared Config
         assure_bigips = self.driver.get_config_bigips()
@@ -105,11 +100,20 @@ class NetworkBuilderDirect(object):
 
             if subnetinfo['is_for_member'] and not self.conf.f5_snat_mode:
                 self._allocate_gw_addr(subnetinfo)
-                for assure_bigip in assure_bigips:
-                    # if we are not using SNATS, attempt to become
-                    # the subnet's default gateway.
-                    self.bigip_selfip_manager.assure_gateway_on_subnet(
-                        assure_bigip, subnetinfo, traffic_group)
+                # if we are not using SNATS, attempt to become
+                # the subnet's default gateway.
+                self.driver.fanout(
+                    assure_bigips,
+                    self.bigip_selfip_manager.assure_gateway_on_subnet,
+                    subnetinfo, traffic_group)
+
+    def _assure_bigip_networks(self, bigip, service, subnetsinfo):
+        """ Assure network connectivity on one bigip. """
+        for subnetinfo in subnetsinfo:
+            self.bigip_l2_manager.assure_bigip_network(
+                bigip, subnetinfo['network'])
+            self.bigip_selfip_manager.assure_bigip_selfip(
+                bigip, service, subnetinfo)
 
     def _annotate_service_route_domains(self, service):
         """ Add route domain notation to pool member and vip addresses. """
@@ -436,14 +440,19 @@ class NetworkBuilderDirect(object):
 
         # Delete shared config objects
         deleted_names = set()
-        for bigip in self.driver.get_config_bigips():
+
+        def _assure_delete_nets_shared(bigip):
+            """ Delete shared config objects from one big-ip """
             LOG.debug('    post_service_networking: calling '
                       '_assure_delete_networks del nets sh for bigip %s %s'
                       % (bigip.device_name, all_subnet_hints))
             subnet_hints = all_subnet_hints[bigip.device_name]
-            deleted_names = deleted_names.union(
-                self._assure_delete_nets_shared(bigip, service,
-                                                subnet_hints))
+            return self._assure_delete_nets_shared(bigip, service,
+                                                   subnet_hints)
+        results = self.driver.fanout(self.driver.get_config_bigips(),
+                                     _assure_delete_nets_shared)
+        for bigip_deleted_names in results.values():
+            deleted_names = deleted_names.union(bigip_deleted_names)
 
         # avoids race condition:
         # deletion of shared ip objects must sync before we
@@ -451,7 +460,8 @@ class NetworkBuilderDirect(object):
         self.driver.sync_if_clustered()
 
         # Delete non shared config objects
-        for bigip in self.driver.get_all_bigips():
+        def _assure_delete_nets_nonshared(bigip):
+            """ Delete non shared config objects from one big-ip """
             LOG.debug('    post_service_networking: calling '
                       '    _assure_delete_networks del nets ns for bigip %s'
                       % bigip.device_name)
@@ -463,9 +473,12 @@ class NetworkBuilderDirect(object):
                 # hints are stored. So, just use those hints for every bigip.
                 device_name = self.driver.get_bigip().device_name
                 subnet_hints = all_subnet_hints[device_name]
-            deleted_names = deleted_names.union(
-                self._assure_delete_nets_nonshared(
-                    bigip, service, subnet_hints))
+            return self._assure_delete_nets_nonshared(
+                bigip, service, subnet_hints)
+        results = self.driver.fanout(self.driver.get_all_bigips(),
+                                     _assure_delete_nets_nonshared)
+        for bigip_deleted_names in results.values():
+            deleted_names = deleted_names.union(bigip_deleted_names)
 
         for port_name in deleted_names:
             LOG.debug('    post_service_networking: calling '
@@ -476,20 +489,24 @@ class NetworkBuilderDirect(object):
 
     def update_bigip_l2(self, service):
         """ Update fdb entries on bigip """
+        self.driver.fanout(self.driver.get_all_bigips(),
+                           self.update_bigip_service_l2, service)
+
+    def update_bigip_service_l2(self, bigip, service):
+        """ Update fdb entries on one bigip """
         vip = service['vip']
         pool = service['pool']
 
-        for bigip in self.driver.get_all_bigips():
-            for member in service['members']:
-                if member['status'] == plugin_const.PENDING_DELETE:
-                    self.delete_bigip_member_l2(bigip, pool, member)
-                else:
-                    self.update_bigip_member_l2(bigip, pool, member)
-            if 'id' in vip:
-                if vip['status'] == plugin_const.PENDING_DELETE:
-                    self.delete_bigip_vip_l2(bigip, vip)
-                else:
-                    self.update_bigip_vip_l2(bigip, vip)
+        for member in service['members']:
+            if member['status'] == plugin_const.PENDING_DELETE:
+                self.delete_bigip_member_l2(bigip, pool, member)
+            else:
+                self.update_bigip_member_l2(bigip, pool, member)
+        if 'id' in vip:
+            if vip['status'] == plugin_const.PENDING_DELETE:
+                self.delete_bigip_vip_l2(bigip, vip)
+            else:
+                self.update_bigip_vip_l2(bigip, vip)
 
     def update_bigip_member_l2(self, bigip, pool, member):
         """ update pool member l2 records """
@@ -22,6 +22,7 @@ except ImportError:
     from oslo_log import log as logging
     from neutron_lbaas.services.loadbalancer import constants as lb_const
 from neutron.plugins.common import constants as plugin_const
+from f5.bigip import exceptions as f5ex
 from time import time
 
 LOG = logging.getLogger(__name__)
@@ -35,21 +36,30 @@ class BigipPoolManager(object):
         self.bigip_l2_manager = bigip_l2_manager
 
     def assure_bigip_pool_create(self, bigip, pool):
-        """ Create pool on the bigip """
-        if not pool['status'] == plugin_const.PENDING_DELETE:
-            desc = pool['name'] + ':' + pool['description']
+        """ Create pool on the bigip or correct its description.
+
+            Returns the pool state read from the bigip, which the
+            monitor and member reconciliation use instead of reading
+            the pool again. The lb method depends on the members, so
+            it is reconciled with them. """
+        if pool['status'] == plugin_const.PENDING_DELETE:
+            return None
+        desc = pool['name'] + ':' + pool['description']
+        pool_state = bigip.pool.get_state(name=pool['id'],
+                                          folder=pool['tenant_id'])
+        if pool_state is None:
             bigip.pool.create(name=pool['id'],
                               lb_method=pool['lb_method'],
                               description=desc,
                               folder=pool['tenant_id'])
-            if pool['status'] == plugin_const.PENDING_UPDATE:
-                # make sure pool attributes are correct
-                bigip.pool.set_lb_method(name=pool['id'],
-                                         lb_method=pool['lb_method'],
-                                         folder=pool['tenant_id'])
-                bigip.pool.set_description(name=pool['id'],
-                                           description=desc,
-                                           folder=pool['tenant_id'])
+            return bigip.pool.get_state(name=pool['id'],
+                                        folder=pool['tenant_id'])
+        if pool_state['description'] != desc:
+            bigip.pool.set_description(name=pool['id'],
+                                       description=desc,
+                                       folder=pool['tenant_id'])
+            pool_state['description'] = desc
+        return pool_state
 
     def assure_bigip_pool_delete(self, bigip, service):
         """ Assure pool is deleted from big-ip """
@@ -57,18 +67,25 @@ class BigipPoolManager(object):
         bigip.pool.delete(name=service['pool']['id'],
                           folder=service['pool']['tenant_id'])
 
-    def assure_bigip_pool_monitors(self, bigip, service):
+    def assure_bigip_pool_monitors(self, bigip, service, pool_state=None):
         """ Create pool monitors on bigip """
         pool = service['pool']
         # Current monitors on the pool according to BigIP
-        existing_monitors = bigip.pool.get_monitors(name=pool['id'],
-                                                    folder=pool['tenant_id'])
+        if pool_state:
+            existing_monitors = list(pool_state['monitors'])
+        else:
+            existing_monitors = bigip.pool.get_monitors(
+                name=pool['id'], folder=pool['tenant_id'])
 
         health_monitors_status = {}
         for monitor in pool['health_monitors_status']:
             health_monitors_status[monitor['monitor_id']] = \
                 monitor['status']
 
+        # monitor type and folder -> state of its monitors on BigIP,
+        # each read with one request when first needed
+        monitor_states = {}
+
         # Current monitor associations according to Neutron
         for monitor in service['health_monitors']:
             found_existing_monitor = monitor['id'] in existing_monitors
@@ -95,18 +112,31 @@ class BigipPoolManager(object):
                 if not found_existing_monitor:
                     timeout = int(monitor['max_retries']) * \
                         int(monitor['timeout'])
+                    send_text = None
+                    recv_text = None
+                    if monitor['type'] == 'HTTP' or \
+                            monitor['type'] == 'HTTPS':
+                        (send_text, recv_text) = \
+                            self._get_http_monitor_strings(monitor)
                     bigip.monitor.create(name=monitor['id'],
                                          mon_type=monitor['type'],
                                          interval=monitor['delay'],
                                          timeout=timeout,
-                                         send_text=None,
-                                         recv_text=None,
+                                         send_text=send_text,
+                                         recv_text=recv_text,
                                          folder=monitor['tenant_id'])
-                    self._update_monitor(bigip, monitor, set_times=False)
                 else:
-                    if health_monitors_status[monitor['id']] == \
-                            plugin_const.PENDING_UPDATE:
-                        self._update_monitor(bigip, monitor)
+                    # diff the monitor with the bigip whatever its
+                    # status, so changes made on the bigip are undone
+                    states_key = (monitor['type'], monitor['tenant_id'])
+                    if states_key not in monitor_states:
+                        monitor_states[states_key] = \
+                            bigip.monitor.get_states(
+                                mon_type=monitor['type'],
+                                folder=monitor['tenant_id'])
+                    self._update_monitor(
+                        bigip, monitor,
+                        monitor_states[states_key].get(monitor['id']))
 
                 if not found_existing_monitor:
                     bigip.pool.add_monitor(name=pool['id'],
@@ -124,26 +154,49 @@ class BigipPoolManager(object):
                                  mon_type=None,
                                  folder=pool['tenant_id'])
 
-    def _update_monitor(self, bigip, monitor, set_times=True):
-        """ Update monitor on bigip """
-        if set_times:
-            timeout = int(monitor['max_retries']) * \
-                int(monitor['timeout'])
-            # make sure monitor attributes are correct
-            bigip.monitor.set_interval(name=monitor['id'],
-                                       mon_type=monitor['type'],
-                                       interval=monitor['delay'],
-                                       folder=monitor['tenant_id'])
-            bigip.monitor.set_timeout(name=monitor['id'],
-                                      mon_type=monitor['type'],
-                                      timeout=timeout,
-                                      folder=monitor['tenant_id'])
-
-        if monitor['type'] == 'HTTP' or monitor['type'] == 'HTTPS':
-            self._update_http_monitor(bigip, monitor)
-
-    def _update_http_monitor(self, bigip, monitor):
+    def _update_monitor(self, bigip, monitor, monitor_state,
+                        set_times=True):
+        """ Update the monitor attributes which differ from
+            monitor_state, its state on bigip """
+        if not monitor_state:
+            monitor_state = {'interval': None, 'timeout': None,
+                             'send': None, 'recv': None}
+        with bigip.transaction():
+            if set_times:
+                timeout = int(monitor['max_retries']) * \
+                    int(monitor['timeout'])
+                # make sure monitor attributes are correct
+                if monitor_state['interval'] != int(monitor['delay']):
+                    bigip.monitor.set_interval(name=monitor['id'],
+                                               mon_type=monitor['type'],
+                                               interval=monitor['delay'],
+                                               folder=monitor['tenant_id'])
+                if monitor_state['timeout'] != timeout:
+                    bigip.monitor.set_timeout(name=monitor['id'],
+                                              mon_type=monitor['type'],
+                                              timeout=timeout,
+                                              folder=monitor['tenant_id'])
+
+            if monitor['type'] == 'HTTP' or monitor['type'] == 'HTTPS':
+                self._update_http_monitor(bigip, monitor, monitor_state)
+
+    def _update_http_monitor(self, bigip, monitor, monitor_state):
         """ Update pool monitor on bigip """
+        (send_text, recv_text) = self._get_http_monitor_strings(monitor)
+        if monitor_state['send'] != send_text:
+            bigip.monitor.set_send_string(name=monitor['id'],
+                                          mon_type=monitor['type'],
+                                          send_text=send_text,
+                                          folder=monitor['tenant_id'])
+        if monitor_state['recv'] != recv_text:
+            bigip.monitor.set_recv_string(name=monitor['id'],
+                                          mon_type=monitor['type'],
+                                          recv_text=recv_text,
+                                          folder=monitor['tenant_id'])
+
+    @staticmethod
+    def _get_http_monitor_strings(monitor):
+        """ Get send and receive strings for http monitor """
         if 'url_path' in monitor:
             send_text = "GET " + monitor['url_path'] + \
                 " HTTP/1.0\\r\\n\\r\\n"
@@ -182,74 +235,116 @@ class BigipPoolManager(object):
 
         LOG.debug('setting monitor send: %s, receive: %s'
                   % (send_text, recv_text))
+        return (send_text, recv_text)
+
+    def assure_bigip_members(self, bigip, service, subnet_hints,
+                             pool_state=None):
+        """ Ensure pool members are on bigip.
 
-        bigip.monitor.set_send_string(name=monitor['id'],
-                                      mon_type=monitor['type'],
-                                      send_text=send_text,
-                                      folder=monitor['tenant_id'])
-        bigip.monitor.set_recv_string(name=monitor['id'],
-                                      mon_type=monitor['type'],
-                                      recv_text=recv_text,
-                                      folder=monitor['tenant_id'])
-
-    def assure_bigip_members(self, bigip, service, subnet_hints):
-        """ Ensure pool members are on bigip """
+            Members are compared with the pool state from the bigip
+            and only members which are missing, differ or are no
+            longer wanted are written. """
         pool = service['pool']
         start_time = time()
-        # Does pool exist... If not don't bother
-        if not bigip.pool.exists(name=pool['id'], folder=pool['tenant_id']):
-            return
-        # Current members on the BigIP
-        pool['existing_members'] = bigip.pool.get_members(
-            name=pool['id'], folder=pool['tenant_id'])
-        # Flag if we need to change the pool's LB method to
-        # include weighting by the ratio attribute
-        any_using_ratio = False
-        # Members according to Neutron
+        if not pool_state:
+            # Does pool exist... If not don't bother
+            pool_state = bigip.pool.get_state(name=pool['id'],
+                                              folder=pool['tenant_id'])
+            if not pool_state:
+                return
+        # Current members on the BigIP. Kept local because the
+        # service is shared by all the big-ips being configured.
+        existing_members = list(pool_state['members'])
+        # Members according to Neutron. Removing a member can also
+        # remove its node, which tolerates the node still being in
+        # use elsewhere. That can not be done inside a transaction,
+        # so deletes are done first and the adds and updates are
+        # batched into a single transaction.
+        deleting_members = []
+        assuring_members = []
         for member in service['members']:
+            if member['status'] == plugin_const.PENDING_DELETE:
+                deleting_members.append(member)
+            else:
+                assuring_members.append(member)
+        for member in deleting_members:
             member_hints = \
-                self._assure_bigip_member(bigip, subnet_hints, pool, member)
-            if member_hints['using_ratio']:
-                any_using_ratio = True
-
-            # Remove member from the list of members bigip needs to remove
+                self._assure_bigip_member(bigip, subnet_hints, pool, member,
+                                          existing_members)
             if member_hints['found_existing']:
-                pool['existing_members'].remove(member_hints['found_existing'])
+                existing_members.remove(member_hints['found_existing'])
+
+        try:
+            with bigip.transaction():
+                existing_members = self._assure_bigip_members_set(
+                    bigip, subnet_hints, pool, assuring_members,
+                    existing_members, pool_state)
+        except f5ex.TransactionCommitException as exc:
+            # A member added or removed since the pool state was read
+            # fails the whole commit. Outside a transaction each write
+            # tolerates the member already being there or gone.
+            LOG.info(_('Pool %s members changed while assuring them, '
+                       'assuring them one by one: %s' % (pool['id'], exc)))
+            current_state = bigip.pool.get_state(name=pool['id'],
+                                                 folder=pool['tenant_id'])
+            if not current_state:
+                return
+            pool_state.update(current_state)
+            existing_members = self._assure_bigip_members_set(
+                bigip, subnet_hints, pool, assuring_members,
+                list(pool_state['members']), pool_state)
 
         LOG.debug(_("Pool: %s removing members %s"
-                    % (pool['id'], pool['existing_members'])))
+                    % (pool['id'], existing_members)))
         # remove any members which are no longer in the service
-        for need_to_delete in pool['existing_members']:
+        for need_to_delete in existing_members:
             bigip.pool.remove_member(name=pool['id'],
                                      ip_address=need_to_delete['addr'],
                                      port=int(need_to_delete['port']),
                                      folder=pool['tenant_id'])
+        if time() - start_time > .001:
+            LOG.debug("        _assure_members setting pool lb method" +
+                      " took %.5f secs" % (time() - start_time))
+
+    def _assure_bigip_members_set(self, bigip, subnet_hints, pool,
+                                  assuring_members, existing_members,
+                                  pool_state):
+        """ Add and update the members to keep and set the lb method.
+            Returns the existing members which are not to be kept. """
+        existing_members = list(existing_members)
+        # Flag if we need to change the pool's LB method to
+        # include weighting by the ratio attribute
+        any_using_ratio = False
+        for member in assuring_members:
+            member_hints = self._assure_bigip_member(
+                bigip, subnet_hints, pool, member, existing_members)
+            if member_hints['using_ratio']:
+                any_using_ratio = True
+
+            # Remove member from the list of members bigip needs
+            # to remove
+            if member_hints['found_existing']:
+                existing_members.remove(member_hints['found_existing'])
 
         # if members are using weights, change the LB to RATIO
         if any_using_ratio:
-            # LOG.debug(_("Pool: %s changing to ratio based lb"
-            #        % pool['id']))
             if pool['lb_method'] == lb_const.LB_METHOD_LEAST_CONNECTIONS:
-                bigip.pool.set_lb_method(name=pool['id'],
-                                         lb_method='RATIO_LEAST_CONNECTIONS',
-                                         folder=pool['tenant_id'])
+                lb_method = 'RATIO_LEAST_CONNECTIONS'
             else:
-                bigip.pool.set_lb_method(name=pool['id'],
-                                         lb_method='RATIO',
-                                         folder=pool['tenant_id'])
+                lb_method = 'RATIO'
         else:
-            # We must update the pool lb_method for the case where
-            # the pool object was not updated, but the member
-            # used to have a weight (setting ration) and now does
-            # not.
+            # This also puts the pool lb_method back when the
+            # members used to have weights and now do not.
+            lb_method = pool['lb_method']
+        if str(lb_method).upper() != pool_state['lb_method']:
             bigip.pool.set_lb_method(name=pool['id'],
-                                     lb_method=pool['lb_method'],
+                                     lb_method=lb_method,
                                      folder=pool['tenant_id'])
-        if time() - start_time > .001:
-            LOG.debug("        _assure_members setting pool lb method" +
-                      " took %.5f secs" % (time() - start_time))
+            pool_state['lb_method'] = str(lb_method).upper()
+        return existing_members
 
-    def _assure_bigip_member(self, bigip, subnet_hints, pool, member):
+    def _assure_bigip_member(self, bigip, subnet_hints, pool, member,
+                             existing_members):
         """ Ensure pool member is on bigip """
         start_time = time()
 
@@ -260,7 +355,7 @@ class BigipPoolManager(object):
                         'deleted_members': []}
 
         ip_address = member['address']
-        for existing_member in pool['existing_members']:
+        for existing_member in existing_members:
             if ip_address.startswith(existing_member['addr']) and \
                (member['protocol_port'] == existing_member['port']):
                 member_hints['found_existing'] = existing_member
@@ -277,24 +372,30 @@ class BigipPoolManager(object):
                      'subnet': subnet,
                      'is_for_member': True}
         else:
-            just_added = False
+            # Do we have weights for ratios?
+            if member['weight'] > 1:
+                member_hints['using_ratio'] = True
             if not member_hints['found_existing']:
                 add_start_time = time()
                 port = int(member['protocol_port'])
-                if bigip.pool.add_member(name=pool['id'],
-                                         ip_address=ip_address,
-                                         port=port,
-                                         folder=pool['tenant_id'],
-                                         no_checks=True):
-                    just_added = True
+                ratio = None
+                if member['weight'] > 1:
+                    ratio = int(member['weight'])
+                # state and ratio are set as part of the create
+                bigip.pool.add_member(name=pool['id'],
+                                      ip_address=ip_address,
+                                      port=port,
+                                      folder=pool['tenant_id'],
+                                      no_checks=True,
+                                      enabled=member['admin_state_up'],
+                                      ratio=ratio)
                 LOG.debug("           bigip.pool.add_member %s took %.5f" %
                           (ip_address, time() - add_start_time))
-            if just_added or member['status'] == plugin_const.PENDING_UPDATE:
+            else:
                 member_info = {'pool': pool, 'member': member,
                                'ip_address': ip_address,
-                               'just_added': just_added}
-                member_hints['using_ratio'] = \
-                    self._assure_update_member(bigip, member_info)
+                               'existing': member_hints['found_existing']}
+                self._assure_update_member(bigip, member_info)
             if subnet and \
                subnet['id'] in subnet_hints['check_for_delete_subnets']:
                 del subnet_hints['check_for_delete_subnets'][subnet['id']]
@@ -308,48 +409,34 @@ class BigipPoolManager(object):
         return member_hints
 
     def _assure_update_member(self, bigip, member_info):
-        """ Update properties of pool member on bigip """
+        """ Update the properties of a pool member which differ on bigip """
         pool = member_info['pool']
         member = member_info['member']
         ip_address = member_info['ip_address']
-        just_added = member_info['just_added']
+        existing = member_info['existing']
 
-        using_ratio = False
-        # Is it enabled or disabled?
-        # no_checks because we add the member above if not found
+        enabled = None
+        if existing['enabled'] != bool(member['admin_state_up']):
+            enabled = member['admin_state_up']
+        ratio = 1
+        if member['weight'] > 1:
+            ratio = int(member['weight'])
+        if existing['ratio'] == ratio:
+            ratio = None
+        if enabled is None and ratio is None:
+            return
+        # Set enabled or disabled and the ratio in one update.
+        # no_checks because the member was found on the pool
         start_time = time()
-        member_port = int(member['protocol_port'])
-        if member['admin_state_up']:
-            bigip.pool.enable_member(name=pool['id'],
-                                     ip_address=ip_address,
-                                     port=member_port,
-                                     folder=pool['tenant_id'],
-                                     no_checks=True)
-        else:
-            bigip.pool.disable_member(name=pool['id'],
-                                      ip_address=ip_address,
-                                      port=member_port,
-                                      folder=pool['tenant_id'],
-                                      no_checks=True)
-        LOG.debug("            member enable/disable took %.5f secs" %
+        bigip.pool.update_member(name=pool['id'],
+                                 ip_address=ip_address,
+                                 port=int(member['protocol_port']),
+                                 enabled=enabled,
+                                 ratio=ratio,
+                                 folder=pool['tenant_id'],
+                                 no_checks=True)
+        LOG.debug("            member update took %.5f secs" %
                   (time() - start_time))
-        # Do we have weights for ratios?
-        if member['weight'] > 1:
-            if not just_added:
-                start_time = time()
-                set_ratio = bigip.pool.set_member_ratio
-                set_ratio(name=pool['id'],
-                          ip_address=ip_address,
-                          port=member_port,
-                          ratio=int(member['weight']),
-                          folder=pool['tenant_id'],
-                          no_checks=True)
-                if time() - start_time > .0001:
-                    LOG.debug("            member set ratio took %.5f secs" %
-                              (time() - start_time))
-            using_ratio = True
-
-        return using_ratio
 
     def _assure_bigip_delete_member(self, bigip,
                                     pool, member, ip_address):
@@ -0,0 +1,103 @@
+""" Pool Stats Scheduler """
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from time import time
+import random
+
+# fraction of the interval each poll may move by, so pools polled
+# together drift apart
+STATS_JITTER = 0.2
+
+# slots of a scheduled pool
+DUE = 0
+INTERVAL = 1
+STATS = 2
+
+
+class StatsScheduler(object):
+    """ Decide when to poll the stats of each pool.
+
+        A pool is first polled at a random time within the interval,
+        so pools and agents started together do not poll together.
+        Each poll whose stats did not change doubles the interval of
+        the pool, up to max_interval, and each poll whose stats did
+        change halves it, down to min_interval. Every interval is
+        moved by up to STATS_JITTER of itself. """
+
+    def __init__(self, interval, min_interval, max_interval):
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        # pool id -> [due, interval, last stats]
+        self.pools = {}
+        self.polls = 0
+        self.changed = 0
+
+    def __len__(self):
+        return len(self.pools)
+
+    def get_due_pool_ids(self, pool_ids, limit=None):
+        """ Pools of pool_ids due for a poll, most overdue first.
+            Pools no longer in pool_ids are forgotten. """
+        now = time()
+        pool_ids = set(pool_ids)
+        for pool_id in list(self.pools.keys()):
+            if pool_id not in pool_ids:
+                del self.pools[pool_id]
+        due = []
+        for pool_id in pool_ids:
+            if pool_id not in self.pools:
+                self.pools[pool_id] = [now + random.random() * self.interval,
+                                       self.interval, None]
+            elif self.pools[pool_id][DUE] <= now:
+                due.append((self.pools[pool_id][DUE], pool_id))
+        due.sort()
+        if limit:
+            due = due[:limit]
+        return [pool_id for (_due, pool_id) in due]
+
+    def polled(self, pool_id, stats):
+        """ Reschedule a pool from the stats just read for it.
+            Returns whether they changed since the last poll. """
+        if pool_id not in self.pools:
+            return True
+        scheduled = self.pools[pool_id]
+        changed = stats != scheduled[STATS]
+        self.polls += 1
+        if changed:
+            self.changed += 1
+            scheduled[INTERVAL] = max(scheduled[INTERVAL] / 2.0,
+                                      self.min_interval)
+        else:
+            scheduled[INTERVAL] = min(scheduled[INTERVAL] * 2.0,
+                                      self.max_interval)
+        scheduled[STATS] = stats
+        scheduled[DUE] = time() + scheduled[INTERVAL] * \
+            (1 + STATS_JITTER * (2 * random.random() - 1))
+        return changed
+
+    def get_statistics(self):
+        """ Scheduled pools by interval and poll counters """
+        hot = idle = 0
+        for scheduled in self.pools.values():
+            if scheduled[INTERVAL] < self.interval:
+                hot += 1
+            elif scheduled[INTERVAL] > self.interval:
+                idle += 1
+        return {'pools': len(self.pools),
+                'hot_pools': hot,
+                'idle_pools': idle,
+                'polls': self.polls,
+                'changed': self.changed}
@@ -40,31 +40,43 @@ class BigipTenantManager(object):
         traffic_group = '/Common/' + traffic_group
 
         # create tenant folder
-        for bigip in self.driver.get_config_bigips():
-            folder = bigip.decorate_folder(tenant_id)
-            if not bigip.system.folder_exists(folder):
-                bigip.system.create_folder(
-                    folder, change_to=True, traffic_group=traffic_group)
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           self._assure_bigip_folder, tenant_id,
+                           traffic_group)
 
         # folder must sync before route domains are created.
         self.driver.sync_if_clustered()
 
         # create tenant route domain
         if self.conf.use_namespaces:
-            for bigip in self.driver.get_all_bigips():
-                folder = bigip.decorate_folder(tenant_id)
-                if not bigip.route.domain_exists(folder):
-                    bigip.route.create_domain(
-                        folder, self.conf.f5_route_domain_strictness)
+            self.driver.fanout(self.driver.get_all_bigips(),
+                               self._assure_bigip_route_domain, tenant_id)
+
+    def _assure_bigip_folder(self, bigip, tenant_id, traffic_group):
+        """ Create tenant partition on one bigip """
+        folder = bigip.decorate_folder(tenant_id)
+        if not bigip.system.folder_exists(folder):
+            bigip.system.create_folder(
+                folder, change_to=True, traffic_group=traffic_group)
+
+    def _assure_bigip_route_domain(self, bigip, tenant_id):
+        """ Create tenant route domain on one bigip """
+        folder = bigip.decorate_folder(tenant_id)
+        if not bigip.route.domain_exists(folder):
+            bigip.route.create_domain(
+                folder, self.conf.f5_route_domain_strictness)
 
     def assure_tenant_cleanup(self, service, all_subnet_hints):
         """ Delete tenant partition.
             Called for every bigip only in replication mode,
             otherwise called once.
         """
-        for bigip in self.driver.get_config_bigips():
+        def _assure_bigip_tenant_cleanup(bigip):
+            """ Delete tenant partition on one big-ip """
             subnet_hints = all_subnet_hints[bigip.device_name]
             self._assure_bigip_tenant_cleanup(bigip, service, subnet_hints)
+        self.driver.fanout(self.driver.get_config_bigips(),
+                           _assure_bigip_tenant_cleanup)
 
     # called for every bigip only in replication mode.
     # otherwise called once
@@ -17,12 +17,197 @@ try:
     from neutron.openstack.common import log as logging
 except ImportError:
     from oslo_log import log as logging
-from eventlet import greenthread
+from eventlet import event
+from eventlet import greenpool
 from time import time
+import sys
 import uuid
 
 LOG = logging.getLogger(__name__)
 
+# Operations which do nothing but assure the whole service, so any
+# number of them queued for a pool can be done by one of them using
+# the latest service definition.
+COALESCIBLE_METHODS = ['create_vip', 'update_vip', 'delete_vip',
+                       'create_pool', 'update_pool',
+                       'create_member', 'update_member', 'delete_member',
+                       'create_pool_health_monitor']
+
+
+class ServiceRequest(object):
+    """ A driver operation waiting in or running from the scheduler """
+
+    def __init__(self, method_name, key, service=None):
+        self.request_id = uuid.uuid4()
+        self.method_name = method_name
+        self.key = key
+        self.service = service
+        self.pool_id = None
+        if service and service.get('pool'):
+            self.pool_id = service['pool'].get('id')
+        self.queued_time = time()
+        self.start_time = None
+        self.ready = event.Event()
+        # set when the request is done, for requests coalesced into it
+        self.done = event.Event()
+        self.coalesced = 0
+        # the request doing the work for a coalesced request
+        self.leader = None
+
+
+class ServiceScheduler(object):
+    """ Run driver operations in order per tenant.
+
+        Requests with the same key (the tenant of the service) run
+        one at a time in the order they arrived. Requests for
+        different keys run concurrently, up to max_concurrent at a
+        time. A request without a key affects every tenant. It waits
+        for everything queued before it to finish, and runs alone.
+        Waiting requests are woken when they can run instead of
+        polling the queue.
+
+        A coalescible request for a pool whose latest queued request
+        is also coalescible and still waiting is not queued. The
+        waiting request takes the newer service definition instead,
+        and the newer caller gets its result when it is done. """
+
+    def __init__(self, max_concurrent=1):
+        self.max_concurrent = max_concurrent
+        self.waiting = []
+        self.running = {}
+        self.running_global = False
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.waiting) + len(self.running) + \
+            int(self.running_global)
+
+    def enqueue(self, method_name, key, service=None):
+        """ Add a request to the queue """
+        request = ServiceRequest(method_name, key, service)
+        leader = self._find_leader(request)
+        if leader:
+            leader.service = service
+            leader.coalesced += 1
+            self.coalesced += 1
+            request.leader = leader
+            return request
+        self.waiting.append(request)
+        self._dispatch()
+        return request
+
+    def _find_leader(self, request):
+        """ Find a waiting request this request can be coalesced into.
+
+            Only the latest request for the pool is considered, so a
+            request never overtakes a different kind of request for
+            the same pool. Requests already running are not in the
+            waiting list, so they never take a newer service. """
+        if request.method_name not in COALESCIBLE_METHODS or \
+                not request.pool_id:
+            return None
+        for queued in reversed(self.waiting):
+            if queued.pool_id != request.pool_id:
+                continue
+            if queued.method_name in COALESCIBLE_METHODS:
+                return queued
+            return None
+        return None
+
+    def wait(self, request):
+        """ Block until the request may run """
+        try:
+            request.ready.wait()
+        except BaseException:
+            # killed while waiting, give up the place in the queue
+            if request in self.waiting:
+                self.waiting.remove(request)
+            else:
+                self.finish(request)
+            raise
+
+    def finish(self, request):
+        """ Mark a running request done and start what can now run """
+        if request.key is None:
+            self.running_global = False
+        elif request.key in self.running:
+            del self.running[request.key]
+        self._dispatch()
+
+    def _start(self, request):
+        """ Move a request from waiting to running """
+        self.waiting.remove(request)
+        request.start_time = time()
+        wait_time = request.start_time - request.queued_time
+        self.requests += 1
+        self.total_wait += wait_time
+        if wait_time > self.max_wait:
+            self.max_wait = wait_time
+        if request.key is None:
+            self.running_global = True
+        else:
+            self.running[request.key] = request
+        request.ready.send(True)
+
+    def _dispatch(self):
+        """ Start every waiting request which is allowed to run.
+
+            This alters the queue other greenthreads are waiting on.
+            It does no I/O, so it can not be preempted by another
+            greenthread. Do not add logging here. """
+        busy_keys = set(self.running.keys())
+        for request in list(self.waiting):
+            if self.running_global:
+                break
+            if request.key is None:
+                # runs alone, and nothing queued after it may pass it
+                if not self.running and request is self.waiting[0]:
+                    self._start(request)
+                break
+            if request.key in busy_keys:
+                continue
+            if len(self.running) >= self.max_concurrent:
+                break
+            busy_keys.add(request.key)
+            self._start(request)
+
+    def get_statistics(self):
+        """ Queue depth and wait time metrics """
+        average_wait = 0.0
+        if self.requests:
+            average_wait = self.total_wait / self.requests
+        oldest_wait = 0.0
+        if self.waiting:
+            oldest_wait = time() - self.waiting[0].queued_time
+        return {'queue_depth': len(self),
+                'waiting': len(self.waiting),
+                'running': len(self.running) + int(self.running_global),
+                'requests': self.requests,
+                'average_wait_secs': round(average_wait, 5),
+                'max_wait_secs': round(self.max_wait, 5),
+                'oldest_waiting_secs': round(oldest_wait, 5),
+                'coalesced': self.coalesced}
+
+
+def _get_service_key(service):
+    """ Get the scheduler key for a service """
+    if service and service.get('pool'):
+        return service['pool'].get('tenant_id') or service['pool']['id']
+    return None
+
+
+def _replace_service(args, kwargs, service):
+    """ Put service in place of the service argument """
+    if 'service' in kwargs:
+        kwargs = dict(kwargs)
+        kwargs['service'] = service
+    else:
+        args = args[:-1] + (service,)
+    return (args, kwargs)
+
 
 def serialized(method_name):
     """Outer wrapper in order to specify method name"""
@@ -32,7 +217,6 @@ def serialized(method_name):
             """ Necessary wrapper """
             # args[0] must be an instance of iControlDriver
             service_queue = args[0].service_queue
-            my_request_id = uuid.uuid4()
 
             service = None
             if len(args) > 0:
@@ -42,79 +226,145 @@ def serialized(method_name):
             if 'service' in kwargs:
                 service = kwargs['service']
 
-            # Consolidate create_member requests for the same pool.
-            #
-            # NOTE: The following block of code alters the state of
-            # a queue that other greenthreads are waiting behind.
-            # This code assumes it will not be preempted by another
-            # greenthread while running. It does not do I/O or call any
-            # other monkey-patched code which might cause a context switch.
-            # To avoid race conditions, DO NOT add logging to this code
-            # block.
-
-            # num_requests = len(service_queue)
-
-            # queue optimization
-
-            # if num_requests > 1 and method_name == 'create_member':
-            #    cur_pool_id = service['pool']['id']
-                # cur_index = num_requests - 1
-                #  do not attempt to replace the first entry (index 0)
-                #  because it may already be in process.
-                # while cur_index > 0:
-                #    (check_request, check_method, check_service) = \
-                #        service_queue[cur_index]
-                #    if check_service['pool']['id'] != cur_pool_id:
-                #        cur_index -= 1
-                #        continue
-                #    if check_method != 'create_member':
-                #        break
-                # move this request up in the queue and return
-                # so that existing thread can handle it
-                #    service_queue[cur_index] = \
-                #        (check_request, check_method, service)
-                #    return
-
-            # End of code block which assumes no preemption.
-
-            req = (my_request_id, method_name, service)
-            service_queue.append(req)
-            reqs_ahead_of_us = request_index(service_queue, my_request_id)
-            while reqs_ahead_of_us != 0:
-                if reqs_ahead_of_us == 1:
-                    # it is almost our turn. get ready
-                    waitsecs = .01
-                else:
-                    waitsecs = reqs_ahead_of_us * .5
-                if waitsecs > .01:
-                    LOG.debug('%s request %s is blocking'
-                              ' for %.2f secs - queue depth: %d'
-                              % (str(method_name), my_request_id,
-                                 waitsecs, len(service_queue)))
-                greenthread.sleep(waitsecs)
-                reqs_ahead_of_us = request_index(service_queue, my_request_id)
+            request = service_queue.enqueue(method_name,
+                                            _get_service_key(service),
+                                            service)
+            if request.leader:
+                LOG.debug('%s request %s coalesced into %s request %s'
+                          % (str(method_name), request.request_id,
+                             request.leader.method_name,
+                             request.leader.request_id))
+                return request.leader.done.wait()
+            if not request.start_time:
+                LOG.debug('%s request %s is waiting'
+                          ' - queue depth: %d'
+                          % (str(method_name), request.request_id,
+                             len(service_queue)))
+            service_queue.wait(request)
             try:
-                LOG.debug('%s request %s is running with queue depth: %d'
-                          % (str(method_name), my_request_id,
+                LOG.debug('%s request %s is running after %.5f secs'
+                          ' with queue depth: %d'
+                          % (str(method_name), request.request_id,
+                             request.start_time - request.queued_time,
                              len(service_queue)))
-                start_time = time()
+                if request.service is not service:
+                    # newer requests were coalesced into this one
+                    LOG.debug('%s request %s handling %d coalesced requests'
+                              % (str(method_name), request.request_id,
+                                 request.coalesced))
+                    (args, kwargs) = \
+                        _replace_service(args, kwargs, request.service)
                 result = method(*args, **kwargs)
                 LOG.debug('%s request %s took %.5f secs'
-                          % (str(method_name), my_request_id,
-                             time() - start_time))
+                          % (str(method_name), request.request_id,
+                             time() - request.start_time))
             except:
                 LOG.error('%s request %s FAILED'
-                          % (str(method_name), my_request_id))
+                          % (str(method_name), request.request_id))
+                request.done.send_exception(sys.exc_info()[1])
                 raise
             finally:
-                service_queue.pop(0)
+                service_queue.finish(request)
+            request.done.send(result)
             return result
         return wrapper
     return real_serialized
 
 
-def request_index(request_queue, request_id):
-    """ Get index of request in request queue """
-    for request in request_queue:
-        if request[0] == request_id:
-            return request_queue.index(request)
+class DeviceFanoutException(Exception):
+    """ An operation failed on one or more big-ips.
+
+        errors holds the sys.exc_info() of each big-ip which failed
+        and results the result of each big-ip which did not, both
+        keyed by big-ip name. """
+    def __init__(self, operation_name, errors, results):
+        self.errors = errors
+        self.results = results
+        self.msg = '%s failed on %s' % (
+            operation_name,
+            '; '.join(['%s: %s' % (name, errors[name][1])
+                       for name in sorted(errors)]))
+        super(DeviceFanoutException, self).__init__(self.msg)
+
+    def get_failed(self):
+        """ Names of the big-ips which failed """
+        return sorted(self.errors)
+
+
+class DeviceFanout(object):
+    """ Apply the same operation to several big-ips at once.
+
+        Each big-ip gets its own greenthread, so the operations for
+        one big-ip still run in order while the big-ips are configured
+        at the same time. The call returns when every big-ip is done,
+        so it takes as long as the slowest big-ip. A failure on one
+        big-ip does not stop the others. Every error is logged, and
+        once all big-ips have finished, whether they ran at the same
+        time or one after the other, a DeviceFanoutException with the
+        error of every big-ip which failed is raised. """
+
+    def __init__(self, parallel=True):
+        self.parallel = parallel
+
+    def run(self, bigips, operation, *args, **kwargs):
+        """ Call operation(bigip, *args, **kwargs) for every big-ip.
+            Returns the results keyed by big-ip device name, or raises
+            DeviceFanoutException if any big-ip failed. """
+        return self._run([(bigip.device_name, bigip) for bigip in bigips],
+                         operation, args, kwargs)
+
+    def run_on_hostnames(self, hostnames, operation, *args, **kwargs):
+        """ Call operation(hostname, *args, **kwargs) for every hostname,
+            for big-ips which are not connected yet. Returns the
+            results keyed by hostname. """
+        return self._run([(hostname, hostname) for hostname in hostnames],
+                         operation, args, kwargs)
+
+    def _run(self, targets, operation, args, kwargs):
+        """ Call operation on the target of every (name, target) """
+        results = {}
+        errors = {}
+
+        def _run_on_target(name, target):
+            """ Run operation on one big-ip and record the outcome """
+            start_time = time()
+            try:
+                results[name] = operation(target, *args, **kwargs)
+            except Exception:
+                LOG.exception('%s failed on %s' % (operation.__name__, name))
+                errors[name] = sys.exc_info()
+            LOG.debug('%s on %s took %.5f secs'
+                      % (operation.__name__, name, time() - start_time))
+
+        if not self.parallel or len(targets) < 2:
+            for (name, target) in targets:
+                _run_on_target(name, target)
+        else:
+            pool = greenpool.GreenPool(len(targets))
+            for (name, target) in targets:
+                pool.spawn_n(_run_on_target, name, target)
+            pool.waitall()
+        if errors:
+            raise DeviceFanoutException(operation.__name__, errors, results)
+        return results
+
+
+class StepTimer(object):
+    """ Record how long each step of a sequence of calls takes """
+
+    def __init__(self):
+        self.start_time = time()
+        self.last_time = self.start_time
+        self.steps = {}
+
+    def step(self, name):
+        """ Record time since the previous step as step name """
+        now = time()
+        self.steps[name] = round(now - self.last_time, 5)
+        self.last_time = now
+
+    def get_timings(self):
+        """ Get step timings, in seconds, including the total """
+        timings = dict(self.steps)
+        timings['total'] = round(self.last_time - self.start_time, 5)
+        return timings
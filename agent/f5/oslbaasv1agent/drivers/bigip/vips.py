@@ -194,19 +194,33 @@ class BigipVipManager(object):
         bigip_vs = bigip.virtual_server
 
         desc = vip['name'] + ':' + vip['description']
-        bigip_vs.set_description(name=vip['id'],
-                                 description=desc,
-                                 folder=pool['tenant_id'])
-
-        bigip_vs.set_pool(name=vip['id'],
-                          pool_name=pool['id'],
-                          folder=pool['tenant_id'])
-        if vip['admin_state_up']:
-            bigip_vs.enable_virtual_server(name=vip['id'],
-                                           folder=pool['tenant_id'])
-        else:
-            bigip_vs.disable_virtual_server(name=vip['id'],
-                                            folder=pool['tenant_id'])
+        # Read the virtual server once and only write what differs.
+        vs_state = bigip_vs.get_state(name=vip['id'],
+                                      folder=vip['tenant_id'])
+        if not vs_state:
+            vs_state = {'description': None, 'pool': None,
+                        'enabled': None, 'connection_limit': None,
+                        'rules': None, 'persist': None,
+                        'fallback_persist': None}
+        # The persistence, profile and rule updates below read the
+        # virtual server before changing it, so only these plain
+        # attribute updates are batched into a transaction.
+        with bigip.transaction():
+            if vs_state['description'] != desc:
+                bigip_vs.set_description(name=vip['id'],
+                                         description=desc,
+                                         folder=pool['tenant_id'])
+            if vs_state['pool'] != pool['id']:
+                bigip_vs.set_pool(name=vip['id'],
+                                  pool_name=pool['id'],
+                                  folder=pool['tenant_id'])
+            if vs_state['enabled'] != bool(vip['admin_state_up']):
+                if vip['admin_state_up']:
+                    bigip_vs.enable_virtual_server(name=vip['id'],
+                                                   folder=pool['tenant_id'])
+                else:
+                    bigip_vs.disable_virtual_server(name=vip['id'],
+                                                    folder=pool['tenant_id'])
 
         if 'session_persistence' in vip and vip['session_persistence']:
             # branch on persistence type
@@ -237,7 +251,8 @@ class BigipVipManager(object):
                                          folder=vip['tenant_id'])
             elif persistence_type == 'APP_COOKIE':
                 self._set_bigip_vip_cookie_persist(bigip, service)
-        else:
+        elif vs_state['persist'] is None or vs_state['persist'] or \
+                vs_state['fallback_persist']:
             bigip_vs.remove_all_persist_profiles(name=vip['id'],
                                                  folder=vip['tenant_id'])
 
@@ -270,7 +285,7 @@ class BigipVipManager(object):
                 rule_name = RPS_THROTTLE_RULE_PREFIX + vip['id']
                 bigip_vs.add_rule(name=vip['id'], rule_name=rule_name,
                                   priority=500, folder=vip['tenant_id'])
-            else:
+            elif vs_state['connection_limit'] != conn_limit:
                 LOG.debug('setting connection limit')
                 # if not HTTP.. use connection limits
                 bigip_vs.set_connection_limit(name=vip['id'],
@@ -278,17 +293,19 @@ class BigipVipManager(object):
                                               folder=pool['tenant_id'])
         else:
             # clear throttle rule
-            LOG.debug('removing RPS throttle rule if present')
             rule_name = RPS_THROTTLE_RULE_PREFIX + vip['id']
-            bigip_vs.remove_rule(name=vip['id'],
-                                 rule_name=rule_name,
-                                 priority=500,
-                                 folder=vip['tenant_id'])
+            if vs_state['rules'] is None or rule_name in vs_state['rules']:
+                LOG.debug('removing RPS throttle rule')
+                bigip_vs.remove_rule(name=vip['id'],
+                                     rule_name=rule_name,
+                                     priority=500,
+                                     folder=vip['tenant_id'])
             # clear the connection limits
-            LOG.debug('removing connection limits')
-            bigip_vs.set_connection_limit(name=vip['id'],
-                                          connection_limit=0,
-                                          folder=pool['tenant_id'])
+            if vs_state['connection_limit'] != 0:
+                LOG.debug('removing connection limits')
+                bigip_vs.set_connection_limit(name=vip['id'],
+                                              connection_limit=0,
+                                              folder=pool['tenant_id'])
 
     def _set_bigip_vip_cookie_persist(self, bigip, service):
         """ Setup VIP Cookie Persistence """
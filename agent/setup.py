@@ -82,6 +82,7 @@ setup(name='f5-oslbaasv1-agent',
                   'f5.oslbaasv1agent.drivers.bigip.agent',
                   'f5.oslbaasv1agent.drivers.bigip.agent_api',
                   'f5.oslbaasv1agent.drivers.bigip.agent_manager',
+                  'f5.oslbaasv1agent.drivers.bigip.audit',
                   'f5.oslbaasv1agent.drivers.bigip.constants',
                   'f5.oslbaasv1agent.drivers.bigip.exceptions',
                   'f5.oslbaasv1agent.drivers.bigip.fdb_connector',
@@ -99,6 +100,7 @@ setup(name='f5-oslbaasv1-agent',
                   'f5.oslbaasv1agent.drivers.bigip.rpc',
                   'f5.oslbaasv1agent.drivers.bigip.selfips',
                   'f5.oslbaasv1agent.drivers.bigip.snats',
+                  'f5.oslbaasv1agent.drivers.bigip.stats',
                   'f5.oslbaasv1agent.drivers.bigip.tenants',
                   'f5.oslbaasv1agent.drivers.bigip.utils',
                   'f5.oslbaasv1agent.drivers.bigip.vcmp',
@@ -15,11 +15,13 @@
 #
 
 import os
+import json
 import logging
-import requests
-import socket
+import threading
 
 from f5.bigip.pycontrol import pycontrol as pc
+from f5.bigip.icr_session import IcrSession
+from f5.bigip.object_counter import ObjectCounter
 from f5.common import constants as const
 from f5.bigip import interfaces as bigip_interfaces
 
@@ -48,14 +50,25 @@ LOG = logging.getLogger(__name__)
 
 class BigIP(object):
     """ An interface to a single BIG-IP """
-    def __init__(self, hostname, username, password, timeout=None):
+    def __init__(self, hostname, username, password, timeout=None,
+                 pool_maxsize=None, wsdl_cache_dir=None):
         # get icontrol connection stub
-        self.icontrol = self._get_icontrol(hostname, username, password)
-        self.icr_session = self._get_icr_session(hostname, username, password)
+        self.icontrol = self._get_icontrol(hostname, username, password,
+                                           timeout,
+                                           version=self.get_tmos_version,
+                                           wsdl_cache_dir=wsdl_cache_dir)
         self.icr_url = 'https://%s/mgmt/tm' % hostname
+        self.icr_session = self._get_icr_session(self.icr_url,
+                                                 username, password,
+                                                 timeout, pool_maxsize)
+
+        # held while a call depends on the iControl active folder
+        self.folder_lock = threading.RLock()
 
         # interface instance cache
         self.interfaces = {}
+        # counts of objects kept for capacity metrics
+        self.object_counter = ObjectCounter()
         self.device_name = None
         self.local_ip = None
 
@@ -307,24 +320,30 @@ class BigIP(object):
         return bigip_interfaces.prefixed(folder)
 
     @staticmethod
-    def _get_icontrol(hostname, username, password, timeout=None):
+    def _get_icontrol(hostname, username, password, timeout=None,
+                      version=None, wsdl_cache_dir=None):
         """ Initialize iControl interface """
         # Logger.log(Logger.DEBUG,
         #           "Opening iControl connections to %s for interfaces %s"
         #            % (self.hostname, self.interfaces))
 
+        # suds clients are only built when an interface is used
         if os.path.exists(const.WSDL_CACHE_DIR):
             icontrol = pc.BIGIP(hostname=hostname,
                                 username=username,
                                 password=password,
                                 directory=const.WSDL_CACHE_DIR,
-                                wsdls=[])
+                                wsdls=[],
+                                lazy=True)
         else:
             icontrol = pc.BIGIP(hostname=hostname,
                                 username=username,
                                 password=password,
                                 fromurl=True,
-                                wsdls=[])
+                                wsdls=[],
+                                lazy=True,
+                                wsdl_cache_dir=wsdl_cache_dir,
+                                version=version)
 
         if timeout:
             icontrol.set_timeout(timeout)
@@ -334,22 +353,33 @@ class BigIP(object):
         return icontrol
 
     @staticmethod
-    def _get_icr_session(hostname, username, password, timeout=None):
+    def _get_icr_session(icr_url, username, password, timeout=None,
+                         pool_maxsize=None):
         """ Get iControl REST Session """
-        icr_session = requests.session()
-        icr_session.auth = (username, password)
-        icr_session.verify = False
-        if hasattr(requests, 'packages'):
-            ul3 = requests.packages.urllib3  # @UndefinedVariable
-            ul3.disable_warnings(
-                category=ul3.exceptions.InsecureRequestWarning
-            )
-        icr_session.headers.update({'Content-Type': 'application/json'})
-        if timeout:
-            socket.setdefaulttimeout(timeout)
-        else:
-            socket.setdefaulttimeout(const.CONNECTION_TIMEOUT)
-        return icr_session
+        return IcrSession(username, password, icr_url=icr_url,
+                          timeout=timeout, pool_maxsize=pool_maxsize)
+
+    def get_tmos_version(self):
+        """ Get TMOS version and build using iControl REST """
+        request_url = self.icr_url + '/sys/version'
+        response = self.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            return_obj = json.loads(response.text)
+            if 'entries' in return_obj:
+                for entry in return_obj['entries'].values():
+                    stats = entry['nestedStats']['entries']
+                    return stats['Version']['description'] + '_' + \
+                        stats['Build']['description']
+        return None
+
+    def transaction(self):
+        """ Batch iControl REST writes into one transaction """
+        return self.icr_session.transaction()
+
+    def get_icr_statistics(self):
+        """ Get iControl REST connection statistics """
+        return self.icr_session.get_statistics()
 
     @staticmethod
     def ulong_to_int(ulong_64):
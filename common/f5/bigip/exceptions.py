@@ -270,6 +270,14 @@ class SystemDeleteException(Exception):
     pass
 
 
+class TransactionCreationException(Exception):
+    pass
+
+
+class TransactionCommitException(Exception):
+    pass
+
+
 class VirtualServerCreationException(Exception):
     pass
 
@@ -0,0 +1,240 @@
+""" iControl REST transport for BIG-IP """
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import contextlib
+import json
+import logging
+import requests
+import threading
+from requests.adapters import HTTPAdapter
+
+from f5.common.logger import Log
+from f5.common import constants as const
+from f5.bigip import exceptions
+
+LOG = logging.getLogger(__name__)
+
+TRANSACTION_HEADER = 'X-F5-REST-Coordination-Id'
+TRANSACTION_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE']
+
+
+class IcrHTTPAdapter(HTTPAdapter):
+    """ Pooled, keep-alive HTTP adapter for a single BIG-IP.
+
+        Connections to the device are kept open and reused between
+        requests, so the TCP and TLS handshakes are only paid when
+        the pool has to grow. The pool is bounded by pool_maxsize
+        and, when pool_block is set, callers wait for a free
+        connection rather than opening more than that many
+        connections to the device. Requests which do not specify
+        a timeout get the adapter timeout instead of relying on
+        the process wide socket default. """
+
+    def __init__(self, pool_maxsize=None, pool_block=None,
+                 timeout=None, max_retries=None):
+        if not pool_maxsize:
+            pool_maxsize = const.ICR_POOL_MAXSIZE
+        if pool_block is None:
+            pool_block = const.ICR_POOL_BLOCK
+        if max_retries is None:
+            max_retries = const.ICR_MAX_RETRIES
+        if timeout:
+            self.timeout = timeout
+        else:
+            self.timeout = const.CONNECTION_TIMEOUT
+        self.requests_sent = 0
+        self.requests_in_flight = 0
+        self.request_seconds = 0.0
+        # one device per adapter, so one connection pool is enough
+        super(IcrHTTPAdapter, self).__init__(pool_connections=1,
+                                             pool_maxsize=pool_maxsize,
+                                             max_retries=max_retries,
+                                             pool_block=pool_block)
+
+    def send(self, request, **kwargs):
+        """ Send request using a pooled connection """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        self.requests_sent += 1
+        self.requests_in_flight += 1
+        try:
+            response = super(IcrHTTPAdapter, self).send(request, **kwargs)
+        finally:
+            self.requests_in_flight -= 1
+        if response.elapsed:
+            self.request_seconds += response.elapsed.total_seconds()
+        return response
+
+    def _connection_pools(self):
+        """ Get the connection pools currently held by the adapter """
+        pools = []
+        for key in self.poolmanager.pools.keys():
+            try:
+                pools.append(self.poolmanager.pools[key])
+            except KeyError:
+                pass
+        return pools
+
+    def get_statistics(self):
+        """ Connection usage counters for this adapter """
+        new_connections = 0
+        idle_connections = 0
+        for pool in self._connection_pools():
+            new_connections += pool.num_connections
+            for conn in list(pool.pool.queue):
+                if conn and getattr(conn, 'sock', None):
+                    idle_connections += 1
+        reused_connections = max(self.requests_sent - new_connections, 0)
+        average_request_ms = 0.0
+        if self.requests_sent:
+            average_request_ms = \
+                1000.0 * self.request_seconds / self.requests_sent
+        return {'requests': self.requests_sent,
+                'open_connections':
+                    idle_connections + self.requests_in_flight,
+                'new_connections': new_connections,
+                'reused_connections': reused_connections,
+                'average_request_ms': round(average_request_ms, 3)}
+
+
+class IcrSession(requests.Session):
+    """ requests Session used for iControl REST calls to one BIG-IP """
+
+    def __init__(self, username, password, icr_url=None, timeout=None,
+                 pool_maxsize=None, pool_block=None):
+        super(IcrSession, self).__init__()
+        self.auth = (username, password)
+        self.verify = False
+        self.headers.update({'Content-Type': 'application/json'})
+        self.icr_url = icr_url
+        self.adapter = IcrHTTPAdapter(pool_maxsize=pool_maxsize,
+                                      pool_block=pool_block,
+                                      timeout=timeout)
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+        if hasattr(requests, 'packages'):
+            ul3 = requests.packages.urllib3  # @UndefinedVariable
+            ul3.disable_warnings(
+                category=ul3.exceptions.InsecureRequestWarning
+            )
+        # transaction state is kept per (green)thread because the
+        # session is shared by everything talking to this device.
+        self._transaction = threading.local()
+        self.transactions_committed = 0
+
+    def request(self, method, url, *args, **kwargs):
+        """ Send request, adding it to the open transaction if any """
+        trans = self._transaction
+        if getattr(trans, 'depth', 0) and \
+                str(method).upper() in TRANSACTION_METHODS:
+            if not trans.trans_id:
+                trans.trans_id = self._begin_transaction()
+            headers = dict(kwargs.get('headers') or {})
+            headers[TRANSACTION_HEADER] = trans.trans_id
+            kwargs['headers'] = headers
+            trans.commands += 1
+        return super(IcrSession, self).request(method, url, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Batch the writes made inside the block into one transaction.
+
+            Writes (POST, PUT, PATCH, DELETE) are queued on the device
+            and committed together when the block exits. Reads are not
+            part of the transaction and will not see queued writes,
+            so code inside the block must not read back objects it
+            just wrote. The transaction is only created on the first
+            write, nested blocks join the outer transaction, and an
+            exception inside the block discards the queued writes. """
+        trans = self._transaction
+        if getattr(trans, 'depth', 0):
+            trans.depth += 1
+            try:
+                yield
+            finally:
+                trans.depth -= 1
+            return
+
+        trans.depth = 1
+        trans.trans_id = None
+        trans.commands = 0
+        committed = False
+        try:
+            yield
+            trans.depth = 0
+            if trans.trans_id:
+                self._commit_transaction(trans.trans_id, trans.commands)
+            committed = True
+        finally:
+            trans.depth = 0
+            if trans.trans_id and not committed:
+                self._discard_transaction(trans.trans_id)
+            trans.trans_id = None
+            trans.commands = 0
+
+    def in_transaction(self):
+        """ Is the calling thread inside a transaction block """
+        return bool(getattr(self._transaction, 'depth', 0))
+
+    def _transaction_url(self, trans_id=None):
+        """ URL of the transaction collection or a transaction """
+        request_url = self.icr_url + '/transaction'
+        if trans_id:
+            request_url += '/' + str(trans_id)
+        return request_url
+
+    def _begin_transaction(self):
+        """ Create a transaction on the device """
+        response = super(IcrSession, self).request(
+            'POST', self._transaction_url(), data=json.dumps({}),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            # the device returns a number, headers must be strings
+            return str(json.loads(response.text)['transId'])
+        Log.error('transaction', response.text)
+        raise exceptions.TransactionCreationException(response.text)
+
+    def _commit_transaction(self, trans_id, commands):
+        """ Validate and commit the queued transaction commands """
+        response = super(IcrSession, self).request(
+            'PATCH', self._transaction_url(trans_id),
+            data=json.dumps({'state': 'VALIDATING'}),
+            timeout=const.CONNECTION_TIMEOUT)
+        if response.status_code < 400:
+            response_obj = json.loads(response.text)
+            if response_obj.get('state') != 'FAILED':
+                self.transactions_committed += 1
+                LOG.debug('committed transaction %s with %d commands'
+                          % (trans_id, commands))
+                return True
+        Log.error('transaction', response.text)
+        raise exceptions.TransactionCommitException(response.text)
+
+    def _discard_transaction(self, trans_id):
+        """ Delete a transaction which will not be committed """
+        try:
+            super(IcrSession, self).request(
+                'DELETE', self._transaction_url(trans_id),
+                timeout=const.CONNECTION_TIMEOUT)
+        except Exception as exc:
+            Log.error('transaction', 'could not discard transaction %s: %s'
+                      % (trans_id, str(exc)))
+
+    def get_statistics(self):
+        """ Connection usage counters for this session """
+        icr_stats = self.adapter.get_statistics()
+        icr_stats['transactions'] = self.transactions_committed
+        return icr_stats
@@ -47,6 +47,10 @@ def icontrol_folder(method):
 
     If the value in the name already includes '/Common/' the
     decoration honors that full path.
+
+    The active folder belongs to the device's iControl session, so
+    the device folder lock is held until the method returns. Other
+    greenthreads can not change the folder in the meantime.
     """
     def wrapper(*args, **kwargs):
         """ Necessary wrapper """
@@ -121,7 +125,12 @@ def icontrol_folder(method):
                                 kwargs[name], folder)
             instance.bigip.set_folder(None, kwargs['folder'])
         return method(*args, **kwargs)
-    return wrapper
+
+    def locked_wrapper(*args, **kwargs):
+        """ Hold the device folder lock while the active folder is used """
+        with args[0].bigip.folder_lock:
+            return wrapper(*args, **kwargs)
+    return locked_wrapper
 
 
 def icontrol_rest_folder(method):
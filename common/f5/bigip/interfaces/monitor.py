@@ -16,6 +16,7 @@
 from f5.common.logger import Log
 from f5.common import constants as const
 from f5.bigip.interfaces import icontrol_rest_folder
+from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
 
@@ -181,6 +182,34 @@ class Monitor(object):
             raise exceptions.MonitorQueryException(response.text)
         return None
 
+    @icontrol_rest_folder
+    @log
+    def get_states(self, mon_type=None, folder='Common'):
+        """ Get interval, timeout, send and receive strings of every
+            monitor of a type in the folder in one request, keyed by
+            monitor name without the object prefix """
+        folder = str(folder).replace('/', '')
+        states = {}
+        if mon_type:
+            mon_type = self._get_monitor_rest_type(mon_type)
+            request_url = self.bigip.icr_url + '/ltm/monitor/' + mon_type
+            request_url += '?$select=name,interval,timeout,send,recv'
+            request_url += '&$filter=partition eq ' + folder
+            response = self.bigip.icr_session.get(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                return_obj = json.loads(response.text)
+                for mon_def in return_obj.get('items', []):
+                    states[strip_folder_and_prefix(mon_def['name'])] = \
+                        {'interval': mon_def.get('interval', 0),
+                         'timeout': mon_def.get('timeout', 0),
+                         'send': mon_def.get('send'),
+                         'recv': mon_def.get('recv')}
+            elif response.status_code != 404:
+                Log.error('monitor', response.text)
+                raise exceptions.MonitorQueryException(response.text)
+        return states
+
     @icontrol_rest_folder
     @log
     def get_interval(self, name=None, mon_type=None, folder='Common'):
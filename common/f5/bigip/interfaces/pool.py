@@ -199,6 +199,48 @@ class Pool(object):
             return members
         return None
 
+    @icontrol_rest_folder
+    @log
+    def get_state(self, name=None, folder='Common'):
+        """ Get the pool settings, monitors and members in one request.
+
+            Returns None if the pool does not exist. Members are
+            returned like get_members with their state and ratio. """
+        if name:
+            folder = str(folder).replace('/', '')
+            request_url = self.bigip.icr_url + '/ltm/pool/'
+            request_url += '~' + folder + '~' + name
+            request_url += '?expandSubcollections=true'
+            response = self.bigip.icr_session.get(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                response_obj = json.loads(response.text)
+                state = dict()
+                state['lb_method'] = self._get_lb_method_from_rest_type(
+                    response_obj.get('loadBalancingMode'))
+                state['description'] = response_obj.get('description')
+                state['monitors'] = []
+                if 'monitor' in response_obj:
+                    for w in response_obj['monitor'].split():
+                        if w.startswith('/'):
+                            state['monitors'].append(
+                                strip_folder_and_prefix(w))
+                state['members'] = []
+                members_ref = response_obj.get('membersReference', {})
+                for member in members_ref.get('items', []):
+                    (addr, port) = split_addr_port(member['name'])
+                    state['members'].append(
+                        {'addr': addr,
+                         'port': int(port),
+                         'enabled':
+                             member.get('session') != 'user-disabled',
+                         'ratio': int(member.get('ratio', 1))})
+                return state
+            elif response.status_code != 404:
+                Log.error('pool', response.text)
+                raise exceptions.PoolQueryException(response.text)
+        return None
+
     @icontrol_rest_folder
     @log
     def get_pools(self, folder='Common'):
@@ -222,21 +264,27 @@ class Pool(object):
         return pool_names
 
     @log
-    def purge_orphaned_pools(self, known_pools, delete_virtual_server=True):
+    def get_all_pool_folders(self):
+        """ Get the folder of every pool, keyed by pool name """
         request_url = self.bigip.icr_url + '/ltm/pool'
         request_url += '?$select=name,partition'
 
         response = self.bigip.icr_session.get(
             request_url, timeout=const.CONNECTION_TIMEOUT)
-        existing_pools = {}
+        pool_folders = {}
         if response.status_code < 400:
             return_obj = json.loads(response.text)
             if 'items' in return_obj:
                 for pool in return_obj['items']:
-                    existing_pools[pool['name']] = pool['partition']
+                    pool_folders[pool['name']] = pool['partition']
         elif response.status_code != 404:
             Log.error('pool', response.text)
             raise exceptions.PoolQueryException(response.text)
+        return pool_folders
+
+    @log
+    def purge_orphaned_pools(self, known_pools, delete_virtual_server=True):
+        existing_pools = self.get_all_pool_folders()
 
         Log.debug('pool', 'purging pools - existing : %s, known : %s'
                   % (existing_pools.keys(), known_pools))
@@ -259,31 +307,34 @@ class Pool(object):
 
         # anything left should be purged
         for pool in cleanup_list:
-            Log.debug('purge_orphaned_pools',
-                      "Purging pool %s in folder %s" %
-                      (pool, cleanup_list[pool]))
-            vs_name = \
-                self.bigip.virtual_server.get_virtual_servers_by_pool_name(
-                    pool_name=pool, folder=cleanup_list[pool])
-            if vs_name:
-                try:
-                    self.bigip.virtual_server.delete(
-                        name=vs_name, folder=cleanup_list[pool])
-                    self.bigip.virtual_server.delete_persist_profile_like(
-                        match=vs_name, folder=cleanup_list[pool])
-                    self.bigip.rule.delete_like(
-                        match=vs_name, folder=cleanup_list[pool])
-                    self.bigip.virtual_server.delete_profile_like(
-                        match=vs_name, folder=cleanup_list[pool])
-                except Exception as e:
-                    Log.error('purge_orphaned_pools', e.message)
+            self.purge_orphaned_pool(pool, cleanup_list[pool])
+
+    @log
+    def purge_orphaned_pool(self, name, folder):
+        """ Delete a pool with the virtual server using it """
+        Log.debug('purge_orphaned_pools',
+                  "Purging pool %s in folder %s" % (name, folder))
+        vs_name = \
+            self.bigip.virtual_server.get_virtual_servers_by_pool_name(
+                pool_name=name, folder=folder)
+        if vs_name:
             try:
-                Log.debug('purge_orphaned_pools',
-                          "Deleting pool %s in folder %s" %
-                          (pool, cleanup_list[pool]))
-                self.delete(name=pool, folder=cleanup_list[pool])
+                self.bigip.virtual_server.delete(
+                    name=vs_name, folder=folder)
+                self.bigip.virtual_server.delete_persist_profile_like(
+                    match=vs_name, folder=folder)
+                self.bigip.rule.delete_like(
+                    match=vs_name, folder=folder)
+                self.bigip.virtual_server.delete_profile_like(
+                    match=vs_name, folder=folder)
             except Exception as e:
-                    Log.error('purge_orphaned_pools', e.message)
+                Log.error('purge_orphaned_pools', e.message)
+        try:
+            Log.debug('purge_orphaned_pools',
+                      "Deleting pool %s in folder %s" % (name, folder))
+            self.delete(name=name, folder=folder)
+        except Exception as e:
+            Log.error('purge_orphaned_pools', e.message)
 
     @icontrol_rest_folder
     @log
@@ -318,6 +369,42 @@ class Pool(object):
             return members
         return None
 
+    @icontrol_rest_folder
+    @log
+    def get_all_members_monitor_status(self, folder=None):
+        """ Get the member monitor states of every pool in one request.
+
+            Returns lists like get_members_monitor_status keyed by
+            pool name, limited to the pools in folder if one is
+            given. """
+        request_url = self.bigip.icr_url + '/ltm/pool'
+        request_url += '?expandSubcollections=true'
+        if folder:
+            folder = str(folder).replace('/', '')
+            request_url += '&$filter=partition eq ' + folder
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        all_members = {}
+        if response.status_code < 400:
+            return_obj = json.loads(response.text)
+            for pool in return_obj.get('items', []):
+                members = []
+                members_ref = pool.get('membersReference', {})
+                for member in members_ref.get('items', []):
+                    (addr, port) = split_addr_port(member['name'])
+                    member_state = 'MONITOR_STATUS_' + \
+                        member['state'].upper()
+                    members.append(
+                        {'addr': addr,
+                         'port': port,
+                         'state': member_state})
+                all_members[strip_folder_and_prefix(pool['fullPath'])] = \
+                    members
+        elif response.status_code != 404:
+            Log.error('pool', response.text)
+            raise exceptions.PoolQueryException(response.text)
+        return all_members
+
     @icontrol_rest_folder
     @log
     def get_statistics(self, name=None, folder='Common', config_mode='object'):
@@ -341,28 +428,66 @@ class Pool(object):
                     if 'nestedStats' in stats[stat]:
                         stats = stats[stat]['nestedStats']['entries']
                         break
-                for stat in stats:
-                    name = stat
-                    value = None
-                    if 'value' in stats[name]:
-                        value = stats[name]['value']
-                    if 'description' in stats[name]:
-                        value = stats[name]['description']
-                    if value is None:
-                        Log.error('poolstats', 'bad stats:' + response.text)
-                        continue
-                    (st, val) = self._get_icontrol_stat(name, value)
-                    if st:
-                        return_stats[st] = val
+                return_stats = self._get_stats_from_entries(stats)
+        elif response.status_code != 404:
+            Log.error('pool', response.text)
+            raise exceptions.PoolQueryException(response.text)
+        return return_stats
+
+    @icontrol_rest_folder
+    @log
+    def get_all_statistics(self, folder=None):
+        """ Get the statistics of every pool in one request.
+
+            Returns the statistics keyed by pool name, limited to
+            the pools in folder if one is given. """
+        request_url = self.bigip.icr_url + '/ltm/pool/stats'
+        response = self.bigip.icr_session.get(
+            request_url, timeout=const.CONNECTION_TIMEOUT)
+        if folder:
+            folder = '/' + str(folder).replace('/', '') + '/'
+        all_stats = {}
+        if response.status_code < 400:
+            return_obj = json.loads(response.text)
+            entries = return_obj.get('entries', {})
+            for pool_entry in entries.values():
+                if 'nestedStats' not in pool_entry:
+                    continue
+                stats = pool_entry['nestedStats']['entries']
+                if 'tmName' not in stats:
+                    continue
+                full_name = stats['tmName']['description']
+                if folder and not full_name.startswith(folder):
+                    continue
+                all_stats[strip_folder_and_prefix(full_name)] = \
+                    self._get_stats_from_entries(stats)
         elif response.status_code != 404:
             Log.error('pool', response.text)
             raise exceptions.PoolQueryException(response.text)
+        return all_stats
+
+    def _get_stats_from_entries(self, stats):
+        """ Convert REST stats entries to statistic names and values """
+        return_stats = {}
+        for name in stats:
+            value = None
+            if 'value' in stats[name]:
+                value = stats[name]['value']
+            if 'description' in stats[name]:
+                value = stats[name]['description']
+            if value is None:
+                Log.error('poolstats', 'bad stats: %s' % stats)
+                continue
+            (st, val) = self._get_icontrol_stat(name, value)
+            if st:
+                return_stats[st] = val
         return return_stats
 
     @icontrol_rest_folder
     @log
     def add_member(self, name=None, ip_address=None, port=None,
-                   folder='Common', no_checks=False):
+                   folder='Common', no_checks=False, enabled=None,
+                   ratio=None):
         if name and ip_address and port:
             folder = str(folder).replace('/', '')
             request_url = self.bigip.icr_url + '/ltm/pool/'
@@ -375,6 +500,14 @@ class Pool(object):
                 payload['name'] = ip_address + ':' + str(port)
             payload['partition'] = folder
             payload['address'] = ip_address
+            # set state and ratio in the create instead of extra updates
+            if enabled is not None:
+                if enabled:
+                    payload['session'] = 'user-enabled'
+                else:
+                    payload['session'] = 'user-disabled'
+            if ratio:
+                payload['ratio'] = ratio
             response = self.bigip.icr_session.post(
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
@@ -456,6 +589,47 @@ class Pool(object):
                 raise exceptions.PoolUpdateException(response.text)
         return False
 
+    @icontrol_rest_folder
+    @log
+    def update_member(self, name=None, ip_address=None, port=None,
+                      enabled=None, ratio=None, folder='Common',
+                      no_checks=False):
+        if name and ip_address and port:
+            folder = str(folder).replace('/', '')
+            request_url = self.bigip.icr_url + '/ltm/pool/'
+            request_url += '~' + folder + '~' + name
+            request_url += '/members/'
+            request_url += '~' + folder + '~'
+            if ':' in ip_address:
+                request_url += urllib.quote(ip_address) + '.' + str(port)
+            else:
+                request_url += urllib.quote(ip_address) + ':' + str(port)
+            payload = dict()
+            if enabled is not None:
+                if enabled:
+                    payload['session'] = 'user-enabled'
+                else:
+                    payload['session'] = 'user-disabled'
+            if ratio:
+                payload['ratio'] = ratio
+            if not payload:
+                return True
+            response = self.bigip.icr_session.patch(
+                request_url, data=json.dumps(payload),
+                timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                return True
+            elif response.status_code == 404:
+                Log.error('pool',
+                          'tried to update non-existant member %s on pool %s.'
+                          % (ip_address + ':' + str(port),
+                             '/' + folder + '/' + name))
+                return False
+            else:
+                Log.error('pool', response.text)
+                raise exceptions.PoolUpdateException(response.text)
+        return False
+
     @icontrol_rest_folder
     @log
     def set_member_ratio(self, name=None, ip_address=None, port=None,
@@ -658,27 +832,8 @@ class Pool(object):
                 if 'loadBalancingMode' not in response_obj:
                     return 'round-robin'
                 else:
-                    if response_obj['loadBalancingMode'] == \
-                            'least-connections-member':
-                        return 'LEAST_CONNECTIONS'
-                    if response_obj['loadBalancingMode'] == \
-                            'ratio-least-connections-member':
-                        return 'RATIO_LEAST_CONNECTIONS'
-                    if response_obj['loadBalancingMode'] == \
-                            'least-connections-node':
-                        return 'SOURCE_IP'
-                    if response_obj['loadBalancingMode'] == \
-                            'observed-member':
-                        return 'OBSERVED_MEMBER'
-                    if response_obj['loadBalancingMode'] == \
-                            'predictive-member':
-                        return 'PREDICTIVE_MEMBER'
-                    if response_obj['loadBalancingMode'] == \
-                            'ratio-member':
-                        return 'RATIO'
-                    if response_obj['loadBalancingMode'] == \
-                            'round-robin':
-                        return 'ROUND_ROBIN'
+                    return self._get_lb_method_from_rest_type(
+                        response_obj['loadBalancingMode'])
             elif response.status_code == 404:
                 Log.error(
                     'pool',
@@ -922,6 +1077,24 @@ class Pool(object):
         else:
             return 'round-robin'
 
+    def _get_lb_method_from_rest_type(self, lb_method_type):
+        if lb_method_type == 'least-connections-member':
+            return 'LEAST_CONNECTIONS'
+        elif lb_method_type == 'ratio-least-connections-member':
+            return 'RATIO_LEAST_CONNECTIONS'
+        elif lb_method_type == 'least-connections-node':
+            return 'SOURCE_IP'
+        elif lb_method_type == 'observed-member':
+            return 'OBSERVED_MEMBER'
+        elif lb_method_type == 'predictive-member':
+            return 'PREDICTIVE_MEMBER'
+        elif lb_method_type == 'ratio-member':
+            return 'RATIO'
+        elif lb_method_type == 'round-robin' or not lb_method_type:
+            return 'ROUND_ROBIN'
+        else:
+            return None
+
     def _get_icontrol_stat(self, name, value):
         if name == "activeMemberCnt":
             return ('POOL_ACTIVE_MEMBERS', value)
@@ -18,6 +18,7 @@ from f5.common import constants as const
 from f5.bigip.interfaces import icontrol_rest_folder
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
+from f5.bigip import object_counter
 
 import json
 
@@ -269,6 +270,8 @@ class Route(object):
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.bigip.object_counter.created(
+                    object_counter.ROUTE_DOMAINS)
                 return payload['id']
             elif response.status_code == 409:
                 return True
@@ -292,6 +295,8 @@ class Route(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.bigip.object_counter.deleted(
+                    object_counter.ROUTE_DOMAINS)
                 return True
             elif response.status_code != 404:
                 Log.error('route-domain', response.text)
@@ -17,6 +17,7 @@ from f5.common import constants as const
 from f5.bigip.interfaces import icontrol_rest_folder, icontrol_folder
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
+from f5.bigip import object_counter
 
 import os
 import re
@@ -321,6 +322,8 @@ class SSL(object):
                     profile_names=[profile_name],
                     passphrases=[profile_string_passphrase]
                 )
+            self.bigip.object_counter.created(
+                object_counter.CLIENTSSL_PROFILES)
 
     @log
     @icontrol_folder
@@ -338,6 +341,8 @@ class SSL(object):
         if self.client_profile_exits(name=profile_name, folder=folder):
             # remove ssl profile
             self.lb_clientssl.delete_profile([profile_name])
+            self.bigip.object_counter.deleted(
+                object_counter.CLIENTSSL_PROFILES)
             # remove certificate
             self.mgmt_keycert.certificate_delete(
                  mode='MANAGEMENT_MODE_DEFAULT',
@@ -19,6 +19,7 @@ from f5.common.logger import Log
 from f5.common import constants as const
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
+from f5.bigip import object_counter
 
 from suds import WebFault
 
@@ -27,6 +28,78 @@ import time
 import uuid
 
 
+class FolderContext(object):
+    """ Local view of the iControl active folder and known folders.
+
+        Folders seen to exist and the active folder of the iControl
+        SOAP session are remembered for FOLDER_CACHE_TIMEOUT seconds,
+        so repeated calls against the same tenant folder do not have
+        to ask the device again. """
+
+    def __init__(self, timeout=None):
+        if timeout is None:
+            timeout = const.FOLDER_CACHE_TIMEOUT
+        self.timeout = timeout
+        self.existing_folders = {}
+        self.current_folder = None
+        self.current_folder_updated = 0
+
+    def _fresh(self, updated):
+        """ Is a timestamp still within the cache timeout """
+        return (time.time() - updated) < self.timeout
+
+    def exists(self, folder):
+        """ Is folder known to exist """
+        if folder in self.existing_folders:
+            if self._fresh(self.existing_folders[folder]):
+                return True
+            del self.existing_folders[folder]
+        return False
+
+    def add(self, folder):
+        """ Record folder as existing """
+        self.existing_folders[folder] = time.time()
+
+    def remove(self, folder):
+        """ Forget folder, including as the active folder """
+        if folder in self.existing_folders:
+            del self.existing_folders[folder]
+        if self.current_folder == '/' + folder:
+            self.clear_current()
+
+    def is_current(self, folder):
+        """ Is folder known to be the active folder """
+        return bool(self.current_folder) and \
+            folder == self.current_folder and \
+            self._fresh(self.current_folder_updated)
+
+    def set_current(self, folder):
+        """ Record folder as the active folder """
+        self.current_folder = folder
+        self.current_folder_updated = time.time()
+
+    def clear_current(self):
+        """ Forget the active folder """
+        self.current_folder = None
+        self.current_folder_updated = 0
+
+    def clear(self):
+        """ Forget everything """
+        self.existing_folders = {}
+        self.clear_current()
+
+
+def folder_locked(method):
+    """ Hold the device folder lock while method runs. The lock
+        guards the iControl active folder and the folder context,
+        which every tenant configured on the device shares. """
+    def wrapper(*args, **kwargs):
+        """ Necessary wrapper """
+        with args[0].bigip.folder_lock:
+            return method(*args, **kwargs)
+    return wrapper
+
+
 class System(object):
     """ Class for configuring bigip system """
 
@@ -53,12 +126,11 @@ class System(object):
 
         # create stubs to hold static system params to avoid redundant calls
         self.version = None
-        self.current_folder = None
         self.systeminfo = None
         self.exempt_folders = ['/', 'Common']
-        self.existing_folders = {}
-        self.existint_folders_updated = None
+        self.folder_context = FolderContext()
 
+    @folder_locked
     @log
     def folder_exists(self, folder):
         """ Does folder exist? """
@@ -66,29 +138,25 @@ class System(object):
             folder = str(folder).replace('/', '')
             if folder == 'Common':
                 return True
-            if folder in self.existing_folders:
-                now = time.time()
-                if self.existint_folders_updated:
-                    if ((now - self.existint_folders_updated) <
-                            const.FOLDER_CACHE_TIMEOUT):
-                        return True
-                    else:
-                        del self.existing_folders[folder]
+            if self.folder_context.exists(folder):
+                return True
             request_url = self.bigip.icr_url + '/sys/folder/'
             request_url += '~' + folder
             request_url += '?$select=name'
             response = self.bigip.icr_session.get(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
-                self.existing_folders[folder] = 1
+                self.folder_context.add(folder)
                 return True
             elif response.status_code == 404:
+                self.folder_context.remove(folder)
                 return False
             else:
                 Log.error('folder', response.text)
                 raise exceptions.SystemQueryException(response.text)
         return False
 
+    @folder_locked
     @log
     def create_folder(self, folder, change_to=False, traffic_group=None):
         """ Create folder """
@@ -111,8 +179,9 @@ class System(object):
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.folder_context.add(folder)
+                self.bigip.object_counter.created(object_counter.FOLDERS)
                 if change_to:
-                    self.existing_folders[folder] = 1
                     self.set_folder(folder)
                 else:
                     self.set_folder('/Common')
@@ -122,6 +191,7 @@ class System(object):
                 raise exceptions.SystemCreationException(response.text)
         return False
 
+    @folder_locked
     def force_root_folder(self):
         """ Force iControl SOAP context into root folder.
             This is typically done before deleting a folder.
@@ -133,7 +203,7 @@ class System(object):
             because setting your active folder, by itself, does
             not do anything. """
         self.sys_session.set_active_folder('/')
-        self.current_folder = '/'
+        self.folder_context.set_current('/')
         self.mgmt_folder.get_list()
         fakename = '/set-folder-workaround-' + str(uuid.uuid4())[0:8]
         try:
@@ -141,6 +211,7 @@ class System(object):
         except WebFault:
             pass
 
+    @folder_locked
     @log
     def delete_folder(self, folder):
         """ Delete folder """
@@ -150,8 +221,8 @@ class System(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
-                if folder in self.existing_folders:
-                    del self.existing_folders[folder]
+                self.folder_context.remove(folder)
+                self.bigip.object_counter.deleted(object_counter.FOLDERS)
                 self.set_folder('/Common')
                 return True
             elif response.status_code == 404:
@@ -179,6 +250,7 @@ class System(object):
             raise exceptions.SystemQueryException(response.text)
         return return_list
 
+    @folder_locked
     @log
     def set_folder(self, folder):
         """ Set Folder """
@@ -187,20 +259,24 @@ class System(object):
             Log.error('System', msg)
             raise exceptions.SystemUpdateException(msg)
 
+        if not str(folder).startswith('/'):
+            folder = '/' + folder
+        # the active folder must exist, so no need to check again
+        if self.folder_context.is_current(folder):
+            return
+
         if not self.folder_exists(folder):
             msg = 'set_folder:set_active_folder failed, ' + \
                   'folder does not exist!'
             Log.error('System', msg)
             raise exceptions.SystemUpdateException(msg)
 
-        if not str(folder).startswith('/'):
-            folder = '/' + folder
-        if self.current_folder and folder == self.current_folder:
-            return
         try:
             self.sys_session.set_active_folder(folder)
-            self.current_folder = folder
+            self.folder_context.set_current(folder)
         except WebFault as webfault:
+            self.folder_context.remove(folder.replace('/', ''))
+            self.folder_context.clear_current()
             Log.error('System',
                       'set_folder:set_active_folder failed: ' +
                       str(webfault.message))
@@ -240,8 +316,8 @@ class System(object):
                       'Request to purge exempt folder %s ignored.' % folder)
 
     @log
-    def purge_orphaned_folders_contents(self, known_folders, bigip=None):
-        """ Purge Folder of contents """
+    def get_managed_folders(self, bigip=None):
+        """ Get the folders managed with this object prefix """
         if not bigip:
             bigip = self.bigip
         existing_folders = bigip.system.get_folders()
@@ -258,6 +334,14 @@ class System(object):
             # iapp folders need to be purged by removing the iapp
             if folder.endswith('.app'):
                 existing_folders.remove(folder)
+        return existing_folders
+
+    @log
+    def purge_orphaned_folders_contents(self, known_folders, bigip=None):
+        """ Purge Folder of contents """
+        if not bigip:
+            bigip = self.bigip
+        existing_folders = self.get_managed_folders(bigip)
         for folder in known_folders:
             decorated_folder = bigip.decorate_folder(folder)
             if decorated_folder in existing_folders:
@@ -278,19 +362,7 @@ class System(object):
         """ Purge Folders """
         if not bigip:
             bigip = self.bigip
-        existing_folders = bigip.system.get_folders()
-        # remove all folders which are default
-        existing_folders.remove('/')
-        existing_folders.remove('Common')
-        # remove all folders which are not managed
-        # with this object prefix
-        existing_folders_copy = list(existing_folders)
-        for folder in existing_folders_copy:
-            if not folder.startswith(self.OBJ_PREFIX):
-                existing_folders.remove(folder)
-            # iapp folders need to be purged by removing the iapp
-            if folder.endswith('.app'):
-                existing_folders.remove(folder)
+        existing_folders = self.get_managed_folders(bigip)
         for folder in known_folders:
             decorated_folder = bigip.decorate_folder(folder)
             if decorated_folder in existing_folders:
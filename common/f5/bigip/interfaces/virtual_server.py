@@ -1365,6 +1365,50 @@ class VirtualServer(object):
             raise exceptions.VirtualServerQueryException(response.text)
         return False
 
+    @icontrol_rest_folder
+    @log
+    def get_state(self, name=None, folder='Common'):
+        """ Get the vip settings, rules and profiles in one request.
+
+            Returns None if the vip does not exist. Pool, rule and
+            profile names have their folder and prefix removed. """
+        if name:
+            folder = str(folder).replace('/', '')
+            request_url = self.bigip.icr_url + '/ltm/virtual/'
+            request_url += '~' + folder + '~' + name
+            request_url += '?expandSubcollections=true'
+            response = self.bigip.icr_session.get(
+                request_url, timeout=const.CONNECTION_TIMEOUT)
+            if response.status_code < 400:
+                response_obj = json.loads(response.text)
+                state = dict()
+                state['pool'] = None
+                if response_obj.get('pool'):
+                    state['pool'] = strip_folder_and_prefix(
+                        response_obj['pool'])
+                state['description'] = response_obj.get('description')
+                state['enabled'] = 'disabled' not in response_obj
+                state['connection_limit'] = \
+                    int(response_obj.get('connectionLimit', 0))
+                state['rules'] = strip_folder_and_prefix(
+                    response_obj.get('rules', []))
+                state['persist'] = []
+                for persist in response_obj.get('persist', []):
+                    state['persist'].append(
+                        strip_folder_and_prefix(persist['name']))
+                state['fallback_persist'] = \
+                    response_obj.get('fallbackPersistence')
+                state['profiles'] = []
+                profiles_ref = response_obj.get('profilesReference', {})
+                for profile in profiles_ref.get('items', []):
+                    state['profiles'].append(
+                        strip_folder_and_prefix(profile['name']))
+                return state
+            elif response.status_code != 404:
+                Log.error('virtual', response.text)
+                raise exceptions.VirtualServerQueryException(response.text)
+        return None
+
     @icontrol_rest_folder
     @log
     def get_pool(self, name=None, folder='Common'):
@@ -20,6 +20,7 @@ from f5.bigip.interfaces import icontrol_rest_folder
 from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
+from f5.bigip import object_counter
 
 import os
 import json
@@ -58,6 +59,7 @@ class Vlan(object):
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.bigip.object_counter.created(object_counter.VLANS)
                 if not folder == 'Common':
                     self.bigip.route.add_vlan_to_domain_by_id(
                         name=name, folder=folder,
@@ -81,6 +83,7 @@ class Vlan(object):
             response = self.bigip.icr_session.delete(
                 request_url, timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.bigip.object_counter.deleted(object_counter.VLANS)
                 return True
             elif response.status_code != 404:
                 Log.error('VLAN', response.text)
@@ -108,8 +111,11 @@ class Vlan(object):
                         response = self.bigip.icr_session.delete(
                             self.bigip.icr_link(item['selfLink']),
                             timeout=const.CONNECTION_TIMEOUT)
-                        if response.status_code > 400 and \
-                           response.status_code != 404:
+                        if response.status_code < 400:
+                            self.bigip.object_counter.deleted(
+                                object_counter.VLANS)
+                        elif response.status_code > 400 and \
+                                response.status_code != 404:
                             Log.error('vlan', response.text)
                             raise exceptions.VLANDeleteException(response.text)
         elif response.status_code == 404:
@@ -22,6 +22,7 @@ from f5.bigip.interfaces import strip_folder_and_prefix
 from f5.bigip.interfaces import prefixed
 from f5.bigip import exceptions
 from f5.bigip.interfaces import log
+from f5.bigip import object_counter
 
 import json
 import os
@@ -109,6 +110,7 @@ class VXLAN(object):
                 request_url, data=json.dumps(payload),
                 timeout=const.CONNECTION_TIMEOUT)
             if response.status_code < 400:
+                self.bigip.object_counter.created(object_counter.TUNNELS)
                 if not folder == 'Common':
                     self.bigip.route.add_vlan_to_domain_by_id(
                         name=name, folder=folder,
@@ -154,6 +156,7 @@ class VXLAN(object):
         response = self.bigip.icr_session.delete(
             request_url, timeout=const.CONNECTION_TIMEOUT)
         if response.status_code < 400:
+            self.bigip.object_counter.deleted(object_counter.TUNNELS)
             return True
         elif response.status_code == 404:
             return True
@@ -181,8 +184,11 @@ class VXLAN(object):
                         response = self.bigip.icr_session.delete(
                             self.bigip.icr_link(item['selfLink']),
                             timeout=const.CONNECTION_TIMEOUT)
-                        if response.status_code > 400 and \
-                           response.status_code != 404:
+                        if response.status_code < 400:
+                            self.bigip.object_counter.deleted(
+                                object_counter.TUNNELS)
+                        elif response.status_code > 400 and \
+                                response.status_code != 404:
                             Log.error('VXLAN', response.text)
                             raise exceptions.VXLANDeleteException(
                                 response.text)
@@ -0,0 +1,62 @@
+""" Counts of configuration objects on a BIG-IP """
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# kinds of objects counted
+FOLDERS = 'folders'
+TUNNELS = 'tunnels'
+VLANS = 'vlans'
+ROUTE_DOMAINS = 'route_domains'
+CLIENTSSL_PROFILES = 'clientssl_profiles'
+
+
+class ObjectCounter(object):
+    """ Number of objects of each kind on a BIG-IP.
+
+        The count of a kind is unknown until it is reconciled with
+        the objects listed from the device. From then on it follows
+        the objects created and deleted through this BIG-IP, and
+        only drifts by changes made some other way, until the next
+        reconcile corrects it. """
+
+    def __init__(self):
+        self.counts = {}
+        # listed less counted at the last reconcile of each kind
+        self.drift = {}
+
+    def get(self, kind):
+        """ Count of kind, or None if never reconciled """
+        return self.counts.get(kind)
+
+    def created(self, kind, count=1):
+        """ Count objects of kind created """
+        if kind in self.counts:
+            self.counts[kind] += count
+
+    def deleted(self, kind, count=1):
+        """ Count objects of kind deleted """
+        if kind in self.counts:
+            self.counts[kind] = max(self.counts[kind] - count, 0)
+
+    def reconcile(self, kind, count):
+        """ Replace the count of kind with the count listed """
+        if kind in self.counts:
+            self.drift[kind] = count - self.counts[kind]
+        self.counts[kind] = count
+
+    def get_statistics(self):
+        """ Counts and the drift found reconciling them """
+        return {'counts': dict(self.counts),
+                'drift': dict(self.drift)}
@@ -16,8 +16,13 @@
 #
 
 import logging
+import os
 import platform
+import re
 import ssl
+import stat
+import tempfile
+import threading
 
 try:
     from urllib2 import ProxyHandler
@@ -53,6 +58,8 @@ SESSION_WSDL = 'System.Session'
 __version__ = '2.1'
 __build__ = 'r3'
 
+LOG = logging.getLogger(__name__)
+
 
 class BIGIP(object):
     """
@@ -61,7 +68,8 @@ class BIGIP(object):
     def __init__(self, hostname=None, username=None,
                  password=None, wsdls=None, directory=None,
                  fromurl=False, debug=False, proto='https',
-                 sessions=False, cache=True, **kwargs):
+                 sessions=False, cache=True, lazy=False,
+                 wsdl_cache_dir=None, version=None, **kwargs):
 
         self.hostname = hostname
         self.username = username
@@ -73,6 +81,17 @@ class BIGIP(object):
         self.debug = debug
         self.kw = kwargs
         self.sessionid = None
+        self.timeout = None
+        # build suds clients when an interface is first used
+        self.lazy = lazy
+        # persistent WSDL cache, version can be a callable which
+        # is only called when the first client is built.
+        self.wsdl_cache_dir = wsdl_cache_dir
+        self.version = version
+        self.wsdl_cache = None
+        # wsdl -> lock held while its lazy interface is built
+        self.interface_locks = {}
+        self.interface_locks_lock = threading.Lock()
 
         # Setup the in-memory object cache
         if cache:
@@ -97,34 +116,41 @@ class BIGIP(object):
         else:
             self.wsdls = wsdls
 
-        self.clients = self._get_clients()
+        if self.lazy:
+            self.clients = []
+            for wsdl in self.wsdls:
+                self._set_lazy_interface(wsdl)
+            if self.sessions:
+                self._load_interface(SESSION_WSDL)
+        else:
+            self.clients = self._get_clients()
 
-        for client in self.clients:
-            self._build_suds_interface(client)
+            for client in self.clients:
+                self._build_suds_interface(client)
 
     #---------------------
     # Methods to modify active pyControl objects
     #---------------------
     def set_timeout(self, timeout):
         if 0 < timeout <= 300:
+            self.timeout = timeout
             for client in self.clients:
                 client.set_options(timeout=timeout)
 
     def add_interface(self, wsdl):
         if not wsdl in self.wsdls:
             self.wsdls.append(wsdl)
-            client = self._get_client(wsdl)
-            self._build_suds_interface(client)
-            self.clients.append(client)
-
-    def add_interfaces(self, wsdls):
-        for wsdl in wsdls:
-            if not wsdl in self.wsdls:
-                self.wsdls.append(wsdl)
+            if self.lazy:
+                self._set_lazy_interface(wsdl)
+            else:
                 client = self._get_client(wsdl)
                 self._build_suds_interface(client)
                 self.clients.append(client)
 
+    def add_interfaces(self, wsdls):
+        for wsdl in wsdls:
+            self.add_interface(wsdl)
+
     #---------------------
     # Setters and getters.
     #---------------------
@@ -168,7 +194,76 @@ class BIGIP(object):
 
             self.set_sessionid(self.sessionid.__str__(), client)
 
+    def _set_lazy_interface(self, wsdl):
+        """ Set a placeholder which builds the interface when used. """
+        (module_name, interface_name) = wsdl.split('.')
+        if not hasattr(self, module_name):
+            setattr(self, module_name, ModuleInstance(module_name))
+        module = getattr(self, module_name)
+        setattr(module, interface_name, LazyInterfaceInstance(self, wsdl))
+
+    def _load_interface(self, wsdl):
+        """ Build the suds client for a lazy interface if needed. """
+        (module_name, interface_name) = wsdl.split('.')
+        module = getattr(self, module_name)
+        # only one caller builds the client, the others wait for it
+        with self._get_interface_lock(wsdl):
+            interface = getattr(module, interface_name)
+            if isinstance(interface, LazyInterfaceInstance):
+                client = self._get_client(wsdl)
+                if self.timeout:
+                    client.set_options(timeout=self.timeout)
+                self._build_suds_interface(client)
+                self.clients.append(client)
+                interface = getattr(module, interface_name)
+        return interface
+
+    def _get_interface_lock(self, wsdl):
+        """ Get the lock for building a lazy interface. """
+        with self.interface_locks_lock:
+            if wsdl not in self.interface_locks:
+                self.interface_locks[wsdl] = threading.Lock()
+            return self.interface_locks[wsdl]
+
+    def _get_wsdl_cache(self):
+        """ Get the persistent WSDL cache for the device version. """
+        if self.wsdl_cache or not self.wsdl_cache_dir or not self.fromurl:
+            return self.wsdl_cache
+        version = self.version
+        try:
+            if callable(version):
+                version = version()
+        except Exception as exc:
+            LOG.warning('could not get version of %s for WSDL cache: %s'
+                        % (self.hostname, exc))
+            version = None
+        if not version:
+            # do not ask again, load WSDLs from the device
+            self.wsdl_cache_dir = None
+            return None
+        self.wsdl_cache = WsdlFileCache(self.wsdl_cache_dir, version)
+        return self.wsdl_cache
+
+    def _fetch_wsdl(self, wsdl):
+        """ Read a WSDL document from the device. """
+        url = 'https://%s%s?WSDL=%s' % (self.hostname, ICONTROL_URI, wsdl)
+        t = HTTPSUnVerifiedCertTransport(username=self.username,
+                                         password=self.password)
+        fp = t.open(transport.Request(url))
+        try:
+            return fp.read()
+        finally:
+            fp.close()
+
     def _get_client(self, wsdl):
+        wsdl_cache = self._get_wsdl_cache()
+        if wsdl_cache:
+            try:
+                url = wsdl_cache.get_url(wsdl, self._fetch_wsdl)
+                return self._get_suds_client(url, **self.kw)
+            except (IOError, OSError) as exc:
+                LOG.warning('WSDL cache failed for %s, loading from '
+                            'device: %s' % (wsdl, exc))
         url = self._set_url(wsdl)
         return self._get_suds_client(url, **self.kw)
 
@@ -219,8 +314,10 @@ class BIGIP(object):
         Windows. *nix should be fine. Also exposed general kwargs to
         pass down to Suds for advance users who don't want to deal
         with set_options().
+        The transport follows the protocol of the SOAP location, as
+        the WSDL url may be a file in the WSDL cache.
         """
-        if not url.startswith("https"):
+        if self.proto != 'https' and not url.startswith("https"):
             t = transport.http.HttpAuthenticated(username=self.username,
                                                  password=self.password)
             c = ROClient(url, transport=t, username=self.username,
@@ -342,6 +439,82 @@ class InterfaceInstance(object):
         self.name = name
 
 
+class LazyInterfaceInstance(object):
+    """
+    Placeholder for an iControl interface. The suds client for the
+    interface is built the first time any of its attributes are used.
+    """
+    def __init__(self, bigip, wsdl):
+        self._bigip = bigip
+        self._wsdl = wsdl
+        self.name = wsdl.split('.')[1]
+
+    def __getattr__(self, attr):
+        interface = self._bigip._load_interface(self._wsdl)
+        return getattr(interface, attr)
+
+
+class WsdlFileCache(object):
+    """
+    Persistent on-disk WSDL cache for one TMOS version.
+
+    WSDL documents are read from the first device of a version which
+    needs them and written to <directory>/<version>/<wsdl>.wsdl. All
+    later clients, for any device running that version and across
+    restarts, load them from disk. Only the WSDL text is stored, and
+    the directories are only used if they belong to this user and
+    nobody else can write to them.
+    """
+    def __init__(self, directory, version):
+        version = re.sub(r'[^A-Za-z0-9._-]', '_', str(version))
+        self.base_directory = directory
+        self.directory = os.path.join(directory, version)
+
+    @staticmethod
+    def _secure_directory(directory):
+        """ Create directory private to this user, or check that an
+            existing one is. Raises OSError if it is not. """
+        if not os.path.lexists(directory):
+            try:
+                os.makedirs(directory, 0o700)
+            except OSError:
+                if not os.path.lexists(directory):
+                    raise
+        dir_stat = os.lstat(directory)
+        if not stat.S_ISDIR(dir_stat.st_mode):
+            raise OSError('%s is not a directory' % directory)
+        if dir_stat.st_uid != os.geteuid():
+            raise OSError('%s is not owned by this user' % directory)
+        if dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise OSError('%s is writable by other users' % directory)
+
+    def get_url(self, wsdl, fetch):
+        """ Get file url for a WSDL, calling fetch(wsdl) if not cached """
+        if not wsdl.endswith('.wsdl'):
+            wsdl += '.wsdl'
+        self._secure_directory(self.base_directory)
+        self._secure_directory(self.directory)
+        path = os.path.join(self.directory, wsdl)
+        if not os.path.isfile(path):
+            document = fetch(wsdl[:-len('.wsdl')])
+            # write to a temporary file and rename so other
+            # readers never see a partial document
+            (fd, tmp_path) = tempfile.mkstemp(dir=self.directory,
+                                              suffix='.tmp')
+            try:
+                tmp_file = os.fdopen(fd, 'wb')
+                try:
+                    tmp_file.write(document)
+                finally:
+                    tmp_file.close()
+                os.rename(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return 'file:' + pathname2url(path)
+
+
 class ROClient(Client):
     def __init__(self, url, **kwargs):
         """
@@ -22,6 +22,10 @@ MAX_HOSTNAME_LENGTH = 128
 DEFAULT_FOLDER = "/Common"
 FOLDER_CACHE_TIMEOUT = 120
 CONNECTION_TIMEOUT = 30
+# ICONTROL REST CONNECTION POOL PER DEVICE
+ICR_POOL_MAXSIZE = 10
+ICR_POOL_BLOCK = True
+ICR_MAX_RETRIES = 0
 FDB_POPULATE_STATIC_ARP = True
 # DEVICE LOCK PREFIX
 DEVICE_LOCK_PREFIX = 'lock_'
@@ -71,6 +71,8 @@ setup(name='f5-bigip-common',
       py_modules=[
                   'f5.bigip.bigip',
                   'f5.bigip.exceptions',
+                  'f5.bigip.icr_session',
+                  'f5.bigip.object_counter',
                   'f5.bigip.interfaces.arp',
                   'f5.bigip.interfaces.cluster',
                   'f5.bigip.interfaces.device',
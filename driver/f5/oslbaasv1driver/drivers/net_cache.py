@@ -0,0 +1,125 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import collections
+import random
+
+from time import time
+
+# fraction of the ttl entries may expire early by, so entries
+# cached together are not all refetched together
+EXPIRY_JITTER = 0.2
+
+
+class NetCache(object):
+    """ Bounded least recently used cache of neutron objects.
+
+        Each entry expires on its own, somewhere in the last
+        EXPIRY_JITTER of the ttl after it was stored. Expired
+        entries are dropped when read, and by a sweep of the whole
+        cache at most once every EXPIRY_JITTER of the ttl, so entries
+        which are never read again do not stay. When the cache is
+        full the least recently used entry is evicted. on_remove, if
+        given, is called with the key and value of every entry which
+        leaves the cache. """
+
+    def __init__(self, max_size, ttl, on_remove=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_remove = on_remove
+        # key -> (expires, value), least recently used first
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.next_sweep = time() + self.ttl * EXPIRY_JITTER
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    def get(self, key, count=True):
+        """ Unexpired value for key or None """
+        self._sweep_if_due()
+        entry = self.entries.pop(key, None)
+        if entry and entry[0] <= time():
+            self.expirations += 1
+            self._removed(key, entry[1])
+            entry = None
+        if not entry:
+            if count:
+                self.misses += 1
+            return None
+        self.entries[key] = entry
+        if count:
+            self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        """ Store value for key, evicting the oldest entries if full """
+        self._sweep_if_due()
+        expires = time() + self.ttl * (1 - random.random() * EXPIRY_JITTER)
+        if key in self.entries:
+            del self.entries[key]
+        self.entries[key] = (expires, value)
+        while len(self.entries) > self.max_size:
+            (old_key, old_entry) = self.entries.popitem(last=False)
+            self.evictions += 1
+            self._removed(old_key, old_entry[1])
+
+    def sweep(self):
+        """ Drop every expired entry """
+        now = time()
+        self.next_sweep = now + self.ttl * EXPIRY_JITTER
+        for key in list(self.entries.keys()):
+            entry = self.entries[key]
+            if entry[0] <= now:
+                del self.entries[key]
+                self.expirations += 1
+                self._removed(key, entry[1])
+
+    def _sweep_if_due(self):
+        """ Sweep if the last sweep was long enough ago """
+        if time() >= self.next_sweep:
+            self.sweep()
+
+    def invalidate(self, key):
+        """ Drop the entry for key if cached """
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.invalidations += 1
+            self._removed(key, entry[1])
+
+    def clear(self):
+        """ Drop all entries """
+        for key in list(self.entries.keys()):
+            self._removed(key, self.entries.pop(key)[1])
+
+    def _removed(self, key, value):
+        """ Tell the owner an entry left the cache """
+        if self.on_remove:
+            self.on_remove(key, value)
+
+    def get_statistics(self):
+        """ Cache usage counters """
+        return {'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations}
@@ -15,8 +15,6 @@
 #
 
 import uuid
-import netaddr
-import datetime
 
 try:
     from oslo.config import cfg  # @UnresolvedImport
@@ -25,6 +23,7 @@ except ImportError:
 
 from time import time
 
+from sqlalchemy import func
 from neutron.api.v2 import attributes
 from neutron.common import constants as q_const
 from neutron.plugins.common import constants
@@ -33,6 +32,23 @@ from neutron.db import agents_db
 from neutron.context import get_admin_context
 from neutron.extensions import portbindings
 import f5.oslbaasv1driver.drivers.constants as lbaasv1constants
+from f5.oslbaasv1driver.drivers.net_cache import NetCache
+from f5.oslbaasv1driver.drivers.subnet_index import SubnetIndex
+
+try:
+    from oslo import messaging
+except ImportError:
+    try:
+        import oslo_messaging as messaging
+    except ImportError:
+        messaging = None
+
+try:
+    from neutron.callbacks import events
+    from neutron.callbacks import registry
+    from neutron.callbacks import resources
+except ImportError:
+    registry = None
 
 PREJUNO = False
 PREKILO = False
@@ -43,6 +59,8 @@ try:
     from neutron.extensions \
         import lbaas_agentscheduler  # @UnresolvedImport @Reimport
     from neutron.db.loadbalancer import loadbalancer_db as lb_db
+    from neutron.services.loadbalancer \
+        import agent_scheduler as lb_agent_scheduler
     from neutron.openstack.common import log as logging
     from neutron.openstack.common import importutils
     from neutron.extensions.loadbalancer \
@@ -68,6 +86,8 @@ except ImportError:
     from neutron_lbaas.extensions \
         import lbaas_agentscheduler  # @UnresolvedImport @Reimport
     from neutron_lbaas.db.loadbalancer import loadbalancer_db as lb_db
+    from neutron_lbaas.services.loadbalancer \
+        import agent_scheduler as lb_agent_scheduler
     from oslo_log import log as logging
     from oslo_utils import importutils
     from neutron_lbaas.extensions.loadbalancer \
@@ -104,28 +124,70 @@ OPTS = [
                         '.drivers.agent_scheduler'
                         '.TenantScheduler'),
                help=_('Driver to use for scheduling '
-                      'pool to a default loadbalancer agent'))
+                      'pool to a default loadbalancer agent')),
+    cfg.IntOpt('f5_net_cache_size',
+               default=10000,
+               help=_('Maximum number of networks, and of subnets, '
+                      'cached by the driver')),
+    cfg.IntOpt('f5_net_cache_seconds',
+               default=300,
+               help=_('Seconds a cached network or subnet is used '
+                      'before it is read from neutron again. Changes '
+                      'to a cached network or subnet are seen once it '
+                      'expires'))
 ]
 
 cfg.CONF.register_opts(OPTS)
 
 VIF_TYPE = 'f5'
-NET_CACHE_SECONDS = 1800
+# seconds the bound hosts of a network are cached. Entries are dropped
+# when this process is notified of a port change on the network, but
+# releases without port callbacks notify nothing, and other neutron
+# server processes are never notified, so a host bound or unbound
+# through them is seen at most this many seconds later.
+NETWORK_HOSTS_SECONDS = 30
+# rebuild the tunnel endpoint index at least this often even if
+# no agent was added, removed or restarted
+VTEP_INDEX_SECONDS = 300
+# how long the index is used before checking the agents for changes
+VTEP_CHECK_SECONDS = 10
 
 
 class LoadBalancerCallbacks(object):
     """Callbacks made by the agent to update the data model."""
-    RPC_API_VERSION = '1.0'
+    # 1.1 - update_service_statuses, get_pool_sync_snapshot,
+    #       get_services_by_pool_ids, update_pools_stats
+    RPC_API_VERSION = '1.1'
 
     def __init__(self, plugin, env, scheduler):
         LOG.debug('LoadBalancerCallbacks RPC subscriber initialized')
+        if messaging:
+            self.target = messaging.Target(version=self.RPC_API_VERSION)
         self.plugin = plugin
         self.env = env
         self.scheduler = scheduler
-        self.net_cache = {}
-        self.subnet_cache = {}
-
-        self.last_cache_update = datetime.datetime.now()
+        self.net_cache = NetCache(cfg.CONF.f5_net_cache_size,
+                                  cfg.CONF.f5_net_cache_seconds)
+        # cidr index of the subnets in subnet_cache
+        self.subnet_index = SubnetIndex()
+        self.subnet_cache = NetCache(
+            cfg.CONF.f5_net_cache_size,
+            cfg.CONF.f5_net_cache_seconds,
+            on_remove=self._uncache_subnet)
+        # network id -> distinct binding hosts of its ports
+        self.network_hosts_cache = NetCache(cfg.CONF.f5_net_cache_size,
+                                            NETWORK_HOSTS_SECONDS)
+        if registry:
+            for event in (events.AFTER_CREATE,
+                          events.AFTER_UPDATE,
+                          events.AFTER_DELETE):
+                registry.subscribe(self._port_changed,
+                                   resources.PORT, event)
+        # host -> tunnel type -> tunnel endpoint ips, from all agents
+        self.vtep_index = None
+        self.vtep_index_signature = None
+        self.vtep_index_time = 0
+        self.vtep_index_checked = 0
 
     def _core_plugin(self):
         """ Get the core plugin """
@@ -279,70 +341,176 @@ class LoadBalancerCallbacks(object):
 
             return pools_to_update
 
+    @log.log
+    def get_pool_sync_snapshot(self, context, env=None, group=0, host=None):
+        """ Get active and pending pools for this group in this env
+
+        Returns the lists get_active_pools and get_pending_pools
+        would, built with one query per table for all agents instead
+        of several queries per agent. The list of all pools is only
+        needed when the agent removes orphans, so the agent asks for
+        it with get_all_pools then instead of with every sync. The tables
+        have no timestamps, but every change made through the API
+        leaves its row in a PENDING status until the agent reports
+        it done, so only the rows which are not ACTIVE are read to
+        find the pools which changed since the agent last synced.
+        """
+        snapshot = {'active_pools': [],
+                    'pending_pools': []}
+        with context.session.begin(subtransactions=True):
+            if not host:
+                return snapshot
+            agents = self.scheduler.get_agents_in_env(self.plugin,
+                                                      context,
+                                                      env,
+                                                      group)
+            if not agents:
+                return snapshot
+            agent_hosts = {}
+            for agent in agents:
+                agent_hosts[agent['id']] = agent['host']
+
+            # pools bound to these agents with their agent
+            binding = lb_agent_scheduler.PoolLoadbalancerAgentBinding
+            pool_qry = context.session.query(
+                lb_db.Pool.id, lb_db.Pool.tenant_id,
+                lb_db.Pool.status, binding.agent_id
+            ).join(
+                binding, binding.pool_id == lb_db.Pool.id
+            ).filter(binding.agent_id.in_(agent_hosts.keys()))
+            pools = {}
+            pending_pool_ids = set()
+            for (pool_id, tenant_id, status, agent_id) in pool_qry:
+                pool = {'agent_host': agent_hosts[agent_id],
+                        'pool_id': pool_id,
+                        'tenant_id': tenant_id}
+                pools[pool_id] = pool
+                if status == constants.ACTIVE:
+                    snapshot['active_pools'].append(pool)
+                else:
+                    pending_pool_ids.add(pool_id)
+            if not pools:
+                return snapshot
+
+            # pools with a monitor association, vip or member
+            # which is not ACTIVE have pending tasks too
+            for model in (lb_db.PoolMonitorAssociation,
+                          lb_db.Vip,
+                          lb_db.Member):
+                pending_qry = context.session.query(
+                    model.pool_id
+                ).filter(
+                    model.pool_id.in_(pools.keys()),
+                    model.status != constants.ACTIVE
+                ).distinct()
+                for (pool_id,) in pending_qry:
+                    pending_pool_ids.add(pool_id)
+            for pool_id in pending_pool_ids:
+                snapshot['pending_pools'].append(pools[pool_id])
+            return snapshot
+
     @log.log
     def get_service_by_pool_id(
             self, context, pool_id=None, global_routed_mode=False, host=None):
         """ Get full service definition from pool id """
-        # invalidate cache if it is too old
-        if (datetime.datetime.now() - self.last_cache_update).seconds \
-                > NET_CACHE_SECONDS:
-            self.net_cache = {}
-            self.subnet_cache = {}
+        # a batch of one, so the members of the pool are resolved
+        # with the same bulk lookups as a batch of many
+        services = self.get_services_by_pool_ids(
+            context, [pool_id], global_routed_mode, host)
+        return services[pool_id]
 
-        service = {}
+    @log.log
+    def get_services_by_pool_ids(
+            self, context, pool_ids=None, global_routed_mode=False,
+            host=None):
+        """ Get full service definitions for many pools at once
+
+        Returns the services keyed by pool id. Pools, members, health
+        monitors, vips, member ip allocations and member ports are
+        each read with one query for all of the pools, and the neutron
+        subnet list is read at most once.
+        """
+        services = {}
+        if not pool_ids:
+            return services
         with context.session.begin(subtransactions=True):
-            LOG.debug(_('Building service definition entry for %s' % pool_id))
-
-            # populate pool
-            pool = self._get_extended_pool(
-                context, pool_id, global_routed_mode)
-            service['pool'] = pool
-            if not pool:
-                LOG.debug(_('Built pool %s service: %s' % (pool_id, service)))
-                return service
-            # populate pool members
+            pools = self.plugin.get_pools(context,
+                                          filters={'id': pool_ids})
+            members = {}
+            monitors = {}
+            vips = {}
+            if pools:
+                for member in self.plugin.get_members(
+                        context, filters={'pool_id': pool_ids}):
+                    members[member['id']] = member
+                monitor_ids = set()
+                vip_ids = []
+                for pool in pools:
+                    monitor_ids.update(pool['health_monitors'])
+                    if pool.get('vip_id'):
+                        vip_ids.append(pool['vip_id'])
+                if monitor_ids:
+                    for monitor in self.plugin.get_health_monitors(
+                            context, filters={'id': list(monitor_ids)}):
+                        monitors[monitor['id']] = monitor
+                if vip_ids:
+                    for vip in self.plugin.get_vips(
+                            context, filters={'id': vip_ids}):
+                        vips[vip['id']] = vip
+
             adminctx = get_admin_context()
-            if 'members' not in pool or len(pool['members']) == 0:
-                pool['members'] = []
-            service['members'] = []
-            for member_id in pool['members']:
-                try:
-                    member = self.plugin.get_member(context, member_id)
+            lookups = None
+            if not global_routed_mode:
+                lookups = self._get_member_lookups(adminctx,
+                                                   members.values())
+
+            for pool in pools:
+                LOG.debug(_('Building service definition entry for %s'
+                            % pool['id']))
+                service = {}
+                service['pool'] = self._extend_pool(
+                    context, pool, global_routed_mode)
+                if 'members' not in pool or not pool['members']:
+                    pool['members'] = []
+                service['members'] = []
+                for member_id in pool['members']:
+                    if member_id not in members:
+                        LOG.error("get_services_by_pool_ids: "
+                                  "Member not found %s" % member_id)
+                        continue
+                    member = members[member_id]
                     member['network'] = None
                     member['subnet'] = None
                     member['port'] = None
                     if not global_routed_mode:
                         self._extend_member(
-                            adminctx, context, pool, member)
+                            adminctx, context, pool, member, lookups)
                     service['members'].append(member)
-                except MemberNotFound:
-                    LOG.error("get_service_by_pool_id: Member not found %s" %
-                              member_id)
-
-            # populate health monitors
-            service['health_monitors'] = []
-            for health_mon in service['pool']['health_monitors']:
-                service['health_monitors'].append(
-                    self.plugin.get_health_monitor(context, health_mon)
-                )
-
-            # populate vip
-            service['vip'] = self._get_extended_vip(
-                context, pool, global_routed_mode)
-
-        LOG.debug(_('Built pool %s service: %s' % (pool_id, service)))
-        return service
-
-    def _get_extended_pool(self, context, pool_id, global_routed_mode):
-        """ Get Pool from Neutron and add extended data """
-        # Start with neutron pool definition
-        try:
-            pool = self.plugin.get_pool(context, pool_id)
-        except:
-            LOG.error("get_service_by_pool_id: Pool not found %s" %
-                      pool_id)
-            return None
 
+                service['health_monitors'] = []
+                for health_mon in pool['health_monitors']:
+                    if health_mon in monitors:
+                        service['health_monitors'].append(
+                            monitors[health_mon])
+
+                service['vip'] = self._get_extended_vip(
+                    context, pool, global_routed_mode,
+                    vips.get(pool.get('vip_id')))
+                services[pool['id']] = service
+
+        for pool_id in pool_ids:
+            if pool_id not in services:
+                LOG.error("get_services_by_pool_ids: Pool not found %s" %
+                          pool_id)
+                services[pool_id] = {'pool': None}
+        LOG.debug(_('Built %d pool services, network cache %s, '
+                    'subnet cache %s'
+                    % (len(services), self.net_cache.get_statistics(),
+                       self.subnet_cache.get_statistics())))
+        return services
+
+    def _extend_pool(self, context, pool, global_routed_mode):
+        """ Add extended data to Neutron pool """
         # Populate extended pool attributes
         if not global_routed_mode:
             pool['subnet'] = self._get_subnet_cached(
@@ -357,28 +525,41 @@ class LoadBalancerCallbacks(object):
 
     def _get_subnet_cached(self, context, subnet_id):
         """ subnet from cache or get from neutron """
-        if subnet_id not in self.subnet_cache:
+        subnet_dict = self.subnet_cache.get(subnet_id)
+        if not subnet_dict:
             subnet_dict = self._core_plugin().get_subnet(context, subnet_id)
-            self.subnet_cache[subnet_id] = subnet_dict
-        return self.subnet_cache[subnet_id]
+            self._cache_subnet(subnet_dict)
+        return subnet_dict
+
+    def _cache_subnet(self, subnet_dict):
+        """ add subnet to cache and cidr index """
+        self.subnet_cache.set(subnet_dict['id'], subnet_dict)
+        self.subnet_index.add(subnet_dict)
+
+    def _uncache_subnet(self, subnet_id, subnet_dict):
+        """ remove subnet which left the cache from cidr index """
+        self.subnet_index.remove(subnet_id)
 
     def _get_network_cached(self, context, network_id):
         """ network from cache or get from neutron """
-        if network_id not in self.net_cache:
+        net_dict = self.net_cache.get(network_id)
+        if not net_dict:
             net_dict = self._core_plugin().get_network(context, network_id)
             if 'provider:network_type' not in net_dict:
                 net_dict['provider:network_type'] = 'undefined'
             if 'provider:segmentation_id' not in net_dict:
                 net_dict['provider:segmentation_id'] = 0
-            self.net_cache[network_id] = net_dict
-        return self.net_cache[network_id]
+            self.net_cache.set(network_id, net_dict)
+        return net_dict
 
-    def _get_extended_vip(self, context, pool, global_routed_mode):
+    def _get_extended_vip(self, context, pool, global_routed_mode,
+                          vip=None):
         """ add network data to vip """
         if 'vip_id' not in pool or not pool['vip_id']:
             return {'port': {'network': None, 'subnet': None}}
 
-        vip = self.plugin.get_vip(context, pool['vip_id'])
+        if not vip:
+            vip = self.plugin.get_vip(context, pool['vip_id'])
         if global_routed_mode:
             vip['network'] = None
             vip['subnet'] = None
@@ -411,13 +592,7 @@ class LoadBalancerCallbacks(object):
         if nettype not in ['vxlan', 'gre']:
             return
 
-        ports = self.get_ports_on_network(context,
-                                          network_id=vip['network']['id'])
-        vtep_hosts = []
-        for port in ports:
-            if 'binding:host_id' in port and \
-               port['binding:host_id'] not in vtep_hosts:
-                vtep_hosts.append(port['binding:host_id'])
+        vtep_hosts = self._get_network_hosts(context, vip['network']['id'])
         for vtep_host in vtep_hosts:
             if nettype == 'vxlan':
                 endpoints = self._get_vxlan_endpoints(context, vtep_host)
@@ -430,13 +605,87 @@ class LoadBalancerCallbacks(object):
                     if ep not in vip['gre_vteps']:
                         vip['gre_vteps'].append(ep)
 
+    def _port_changed(self, resource, event, trigger, **kwargs):
+        """ Forget the bound hosts of the networks of a changed port """
+        for key in ('port', 'original_port'):
+            port = kwargs.get(key)
+            if port and port.get('network_id'):
+                self.network_hosts_cache.invalidate(port['network_id'])
+
+    def _get_network_hosts(self, context, network_id):
+        """ Distinct binding hosts of the ports on a network """
+        vtep_hosts = self.network_hosts_cache.get(network_id)
+        if vtep_hosts is None:
+            binding_model = self._get_port_binding_model()
+            if binding_model:
+                vtep_hosts = self._query_network_hosts(
+                    context, network_id, binding_model)
+            else:
+                vtep_hosts = []
+                for port in self.get_ports_on_network(
+                        context, network_id=network_id):
+                    if 'binding:host_id' in port and \
+                       port['binding:host_id'] not in vtep_hosts:
+                        vtep_hosts.append(port['binding:host_id'])
+            self.network_hosts_cache.set(network_id, vtep_hosts)
+        return vtep_hosts
+
+    def _get_port_binding_model(self):
+        """ Model holding the port binding hosts of the core plugin """
+        if type(self._core_plugin()).__module__.startswith(
+                'neutron.plugins.ml2'):
+            from neutron.plugins.ml2 import models as ml2_db
+            return ml2_db.PortBinding
+        from neutron.db import portbindings_db
+        if isinstance(self._core_plugin(), portbindings_db.PortBindingMixin):
+            return portbindings_db.PortBindingPort
+        return None
+
+    @staticmethod
+    def _query_network_hosts(context, network_id, binding_model):
+        """ Read only the distinct binding hosts of a network's ports """
+        from neutron.db import models_v2 as core_db
+        hosts_qry = context.session.query(
+            binding_model.host
+        ).join(
+            core_db.Port, core_db.Port.id == binding_model.port_id
+        ).filter(
+            core_db.Port.network_id == network_id
+        ).distinct()
+        return [host for (host,) in hosts_qry]
+
+    def _get_member_lookups(self, adminctx, members):
+        """ Read what is needed to resolve the networks of members.
+
+        The neutron ip allocations of all member addresses and their
+        ports are read with one query each. The neutron subnet list
+        is only read if a member needs it, and then only once.
+        """
+        lookups = {'allocations': {}, 'ports': {}, 'subnets': None}
+        addresses = set()
+        for member in members:
+            addresses.add(member['address'])
+        if not addresses:
+            return lookups
+        lookups['allocations'] = self._get_ip_allocations(adminctx,
+                                                          addresses)
+        port_ids = set()
+        for allocated in lookups['allocations'].values():
+            for alloc in allocated:
+                port_ids.add(alloc['port_id'])
+        if port_ids:
+            for port in self._core_plugin().get_ports(
+                    adminctx, filters={'id': list(port_ids)}):
+                lookups['ports'][port['id']] = port
+        return lookups
+
     def _extend_member(
-            self, adminctx, context, pool, member):
+            self, adminctx, context, pool, member, lookups=None):
         """ Add networking info to member """
 
-        from neutron.db import models_v2 as core_db
-        alloc_qry = adminctx.session.query(core_db.IPAllocation)
-        allocated = alloc_qry.filter_by(ip_address=member['address']).all()
+        if lookups is None:
+            lookups = self._get_member_lookups(adminctx, [member])
+        allocated = lookups['allocations'].get(member['address'], [])
 
         # try populating member from pool subnet
         matching_keys = {'tenant_id': pool['tenant_id'],
@@ -444,24 +693,39 @@ class LoadBalancerCallbacks(object):
                          'shared': None}
 
         if self._found_and_used_matching_addr(
-                adminctx, context, member, allocated, matching_keys):
+                adminctx, context, member, allocated, matching_keys, lookups):
             return
 
         # try populating member from any tenant subnet
         matching_keys['subnet_id'] = None
         if self._found_and_used_matching_addr(
-                adminctx, context, member, allocated, matching_keys):
+                adminctx, context, member, allocated, matching_keys, lookups):
             return
 
         # try populating member net from any shared subnet
         matching_keys['tenant_id'] = None
         matching_keys['shared'] = True
         if self._found_and_used_matching_addr(
-                adminctx, context, member, allocated, matching_keys):
+                adminctx, context, member, allocated, matching_keys, lookups):
             return
 
+    def _get_ip_allocations(self, adminctx, addresses):
+        """ Get neutron ip allocations for addresses, keyed by address """
+        from neutron.db import models_v2 as core_db
+        allocations = {}
+        for address in addresses:
+            allocations[address] = []
+        if allocations:
+            alloc_qry = adminctx.session.query(core_db.IPAllocation)
+            alloc_qry = alloc_qry.filter(
+                core_db.IPAllocation.ip_address.in_(allocations.keys()))
+            for alloc in alloc_qry.all():
+                allocations[alloc['ip_address']].append(alloc)
+        return allocations
+
     def _found_and_used_matching_addr(
-            self, adminctx, context, member, allocated, matching_keys):
+            self, adminctx, context, member, allocated, matching_keys,
+            lookups):
         """ Find a matching address that matches keys """
 
         # first check list of allocated addresses in neutron
@@ -469,7 +733,7 @@ class LoadBalancerCallbacks(object):
         # first because we prefer to use a subnet that actually has
         # a matching ip address on it.
         if self._found_and_used_neutron_addr(
-                adminctx, context, member, allocated, matching_keys):
+                adminctx, context, member, allocated, matching_keys, lookups):
             return True
 
         # Perhaps the neutron network was deleted but the pool member
@@ -484,13 +748,14 @@ class LoadBalancerCallbacks(object):
         # with a different id. If we can find a matching subnet, it
         # might help us tear down our configuration.
         if self._found_and_used_neutron_subnet(
-                adminctx, member, matching_keys):
+                adminctx, member, matching_keys, lookups):
             return True
 
         return False
 
     def _found_and_used_neutron_addr(
-            self, adminctx, context, member, allocated, matching_keys):
+            self, adminctx, context, member, allocated, matching_keys,
+            lookups):
         """ Find a matching address that matches keys """
 
         for alloc in allocated:
@@ -512,60 +777,37 @@ class LoadBalancerCallbacks(object):
             member['subnet'] = self._get_subnet_cached(
                 context, alloc['subnet_id'])
 
-            member['port'] = self._core_plugin().get_port(
-                adminctx, alloc['port_id'])
+            if alloc['port_id'] in lookups['ports']:
+                member['port'] = lookups['ports'][alloc['port_id']]
+            else:
+                member['port'] = self._core_plugin().get_port(
+                    adminctx, alloc['port_id'])
             self._populate_member_network(context, member)
             return True
 
     def _found_and_used_cached_subnet(
             self, adminctx, member, matching_keys):
         """ check our cache for missing network """
-        subnets_matched = []
-        na_add = netaddr.IPAddress(member['address'])
-        for subnet in self.subnet_cache:
-            c_subnet = self.subnet_cache[subnet]
-            na_net = netaddr.IPNetwork(c_subnet['cidr'])
-            if na_add in na_net:
-                if matching_keys['subnet_id'] and \
-                        c_subnet['id'] != matching_keys['subnet_id']:
-                    continue
-                if matching_keys['tenant_id'] and \
-                        c_subnet['tenant_id'] != matching_keys['tenant_id']:
-                    continue
-                if matching_keys['shared'] and not c_subnet['shared']:
-                    continue
-                subnets_matched.append(subnet)
+        # the index only drops a subnet once it leaves the cache, so
+        # only trust the subnets the cache still has unexpired
+        subnets_matched = [
+            subnet for subnet in self._match_subnets(
+                self.subnet_index, member['address'], matching_keys)
+            if self.subnet_cache.get(subnet['id'])]
         if len(subnets_matched) == 1:
-            member['subnet'] = self._get_subnet_cached(
-                adminctx, subnets_matched[0])
+            member['subnet'] = subnets_matched[0]
             member['network'] = self._get_network_cached(
                 adminctx, member['subnet']['network_id'])
             return True
         return False
 
     def _found_and_used_neutron_subnet(
-            self, adminctx, member, matching_keys):
+            self, adminctx, member, matching_keys, lookups):
         """ check neutron for matching network """
 
-        na_add = netaddr.IPAddress(member['address'])
-
-        subnets_matched = []
-        for subnet in self._core_plugin()._get_all_subnets(adminctx):
-            subnet_dict = self._core_plugin()._make_subnet_dict(subnet)
-            self.subnet_cache[subnet_dict['id']] = subnet_dict
-            na_net = netaddr.IPNetwork(subnet_dict['cidr'])
-            if na_add in na_net:
-                if matching_keys['subnet_id'] and \
-                        subnet_dict['id'] != \
-                        matching_keys['subnet_id']:
-                    continue
-                if matching_keys['tenant_id'] and \
-                        subnet_dict['tenant_id'] != \
-                        matching_keys['tenant_id']:
-                    continue
-                if matching_keys['shared'] and not subnet_dict['shared']:
-                    continue
-                subnets_matched.append(subnet_dict)
+        subnets_matched = self._match_subnets(
+            self._get_neutron_subnets(adminctx, lookups),
+            member['address'], matching_keys)
         if len(subnets_matched) == 1:
             LOG.debug(_('%s in subnet %s in cache'
                         % (member['address'],
@@ -573,6 +815,35 @@ class LoadBalancerCallbacks(object):
             member['subnet'] = subnets_matched[0]
             member['network'] = self._get_network_cached(
                 adminctx, member['subnet']['network_id'])
+            return True
+        return False
+
+    @staticmethod
+    def _match_subnets(subnet_index, address, matching_keys):
+        """ subnets in index which contain address and match keys """
+        subnets_matched = []
+        for subnet in subnet_index.lookup(address):
+            if matching_keys['subnet_id'] and \
+                    subnet['id'] != matching_keys['subnet_id']:
+                continue
+            if matching_keys['tenant_id'] and \
+                    subnet['tenant_id'] != matching_keys['tenant_id']:
+                continue
+            if matching_keys['shared'] and not subnet['shared']:
+                continue
+            subnets_matched.append(subnet)
+        return subnets_matched
+
+    def _get_neutron_subnets(self, adminctx, lookups):
+        """ cidr index of all neutron subnets, read at most
+            once for each service build """
+        if lookups['subnets'] is None:
+            lookups['subnets'] = SubnetIndex()
+            for subnet in self._core_plugin()._get_all_subnets(adminctx):
+                subnet_dict = self._core_plugin()._make_subnet_dict(subnet)
+                self._cache_subnet(subnet_dict)
+                lookups['subnets'].add(subnet_dict)
+        return lookups['subnets']
 
     def _populate_member_network(self, context, member):
         """ Add networking info to pool member """
@@ -710,6 +981,7 @@ class LoadBalancerCallbacks(object):
                 port_data['binding:capabilities'] = {'port_filter': False}
             port = self._core_plugin().create_port(
                 context, {'port': port_data})
+            self.network_hosts_cache.invalidate(subnet['network_id'])
             # Because ML2 marks ports DOWN by default on creation
             update_data = {
                 'status': q_const.PORT_STATUS_ACTIVE
@@ -750,6 +1022,7 @@ class LoadBalancerCallbacks(object):
                 port_data['binding:capabilities'] = {'port_filter': False}
             port = self._core_plugin().create_port(
                 context, {'port': port_data})
+            self.network_hosts_cache.invalidate(subnet['network_id'])
             # Because ML2 marks ports DOWN by default on creation
             update_data = {
                 'status': q_const.PORT_STATUS_ACTIVE
@@ -1068,6 +1341,88 @@ class LoadBalancerCallbacks(object):
         except:
             pass
 
+    @log.log
+    def update_service_statuses(self, context, statuses=None, host=None):
+        """Agent confirmation hook to update all statuses of a service.
+
+        Applies the member, pool, health monitor and vip status changes
+        and deletions reported for one service. Each change is applied
+        on its own, so an object deleted or changed meanwhile does not
+        stop the others. Returns the status changes which failed, in
+        the same form as statuses, so the agent only sends those again.
+        A failed delete is only logged.
+        """
+        failed = {}
+        if not statuses:
+            return failed
+        for member_status in statuses.get('members', []):
+            try:
+                self.update_member_status(context, host=host,
+                                          **member_status)
+            except Exception as exc:
+                LOG.error(_("Plugin update member %s error: %s"
+                            % (member_status.get('member_id'), exc)))
+                failed.setdefault('members', []).append(member_status)
+        for member_id in statuses.get('members_destroyed', []):
+            try:
+                self.member_destroyed(context, member_id=member_id,
+                                      host=host)
+            except Exception as exc:
+                LOG.error(_("Plugin delete member %s error: %s"
+                            % (member_id, exc)))
+        if statuses.get('pool'):
+            try:
+                self.update_pool_status(context, host=host,
+                                        **statuses['pool'])
+            except Exception as exc:
+                LOG.error(_("Plugin update pool %s error: %s"
+                            % (statuses['pool'].get('pool_id'), exc)))
+                failed['pool'] = statuses['pool']
+        if statuses.get('pool_destroyed'):
+            try:
+                self.pool_destroyed(context,
+                                    pool_id=statuses['pool_destroyed'],
+                                    host=host)
+            except Exception as exc:
+                LOG.error(_("Plugin destroy pool %s error: %s"
+                            % (statuses['pool_destroyed'], exc)))
+        for monitor in statuses.get('health_monitors_destroyed', []):
+            try:
+                self.health_monitor_destroyed(context, host=host, **monitor)
+            except Exception as exc:
+                LOG.error(_("Plugin destroy monitor %s error: %s"
+                            % (monitor.get('health_monitor_id'), exc)))
+        for monitor_status in statuses.get('health_monitors', []):
+            try:
+                self.update_health_monitor_status(context, host=host,
+                                                  **monitor_status)
+            except Exception as exc:
+                if 'PENDING_DELETE' in str(exc):
+                    LOG.debug("Attempted to update monitor being deleted!")
+                    continue
+                LOG.error(_("Plugin update monitor %s error: %s"
+                            % (monitor_status.get('health_monitor_id'),
+                               exc)))
+                failed.setdefault('health_monitors', []).append(
+                    monitor_status)
+        if statuses.get('vip'):
+            try:
+                self.update_vip_status(context, host=host,
+                                       **statuses['vip'])
+            except Exception as exc:
+                LOG.error(_("Plugin update vip %s error: %s"
+                            % (statuses['vip'].get('vip_id'), exc)))
+                failed['vip'] = statuses['vip']
+        if statuses.get('vip_destroyed'):
+            try:
+                self.vip_destroyed(context,
+                                   vip_id=statuses['vip_destroyed'],
+                                   host=host)
+            except Exception as exc:
+                LOG.error(_("Plugin delete vip %s error: %s"
+                            % (statuses['vip_destroyed'], exc)))
+        return failed
+
     @log.log
     def update_pool_stats(self, context, pool_id=None, stats=None, host=None):
         """ Update pool stats """
@@ -1103,6 +1458,13 @@ class LoadBalancerCallbacks(object):
         except Exception as ex:
             LOG.error(_('error updating pool stats: %s' % ex.message))
 
+    @log.log
+    def update_pools_stats(self, context, pools_stats=None, host=None):
+        """ Update the stats of many pools, keyed by pool id """
+        for pool_id in pools_stats or {}:
+            self.update_pool_stats(context, pool_id=pool_id,
+                                   stats=pools_stats[pool_id], host=host)
+
     def create_rpc_dispatcher(self):
         """ Create rpc dispatcher """
         return q_rpc.PluginRpcDispatcher(  # @UndefinedVariable
@@ -1111,58 +1473,84 @@ class LoadBalancerCallbacks(object):
     @log.log
     def _get_vxlan_endpoints(self, context, host=None):
         """ Get vxlan endpoints """
-        endpoints = []
-        for agent in self._core_plugin().get_agents(context):
-            if 'configurations' in agent:
-                if 'tunnel_types' in agent['configurations']:
-                    if 'vxlan' in agent['configurations']['tunnel_types']:
-                        if 'tunneling_ip' in agent['configurations']:
-                            if not host:
-                                endpoints.append(
-                                    agent['configurations']['tunneling_ip']
-                                )
-                            else:
-                                if str(agent['host']) == str(host):
-                                    endpoints.append(
-                                        agent['configurations']['tunneling_ip']
-                                    )
-                        if 'tunneling_ips' in agent['configurations']:
-                            for ip_addr in \
-                                    agent['configurations']['tunneling_ips']:
-                                if not host:
-                                    endpoints.append(ip_addr)
-                                else:
-                                    if agent['host'] == host:
-                                        endpoints.append(ip_addr)
-        return endpoints
+        return self._get_tunnel_endpoints(context, 'vxlan', host)
 
     def _get_gre_endpoints(self, context, host=None):
         """ Get gre endpoints """
+        return self._get_tunnel_endpoints(context, 'gre', host)
+
+    def _get_tunnel_endpoints(self, context, tunnel_type, host=None,
+                              tunneling_ip_only=False):
+        """ Get endpoints of tunnel type on host, or on all hosts.
+            With tunneling_ip_only, the tunneling_ips list of each
+            agent is left out. """
+        vtep_index = self._get_vtep_index(context)
+        if host:
+            host_vteps_list = [vtep_index.get(str(host), {})]
+        else:
+            host_vteps_list = vtep_index.values()
         endpoints = []
-        for agent in self._core_plugin().get_agents(context):
-            if 'configurations' in agent:
-                if 'tunnel_types' in agent['configurations']:
-                    if 'gre' in agent['configurations']['tunnel_types']:
-                        if 'tunneling_ip' in agent['configurations']:
-                            if not host:
-                                endpoints.append(
-                                    agent['configurations']['tunneling_ip']
-                                )
-                            else:
-                                if str(agent['host']) == str(host):
-                                    endpoints.append(
-                                        agent['configurations']['tunneling_ip']
-                                    )
-                        if 'tunneling_ips' in agent['configurations']:
-                            for ip_addr in \
-                                    agent['configurations']['tunneling_ips']:
-                                if not host:
-                                    endpoints.append(ip_addr)
-                                else:
-                                    if agent['host'] == host:
-                                        endpoints.append(ip_addr)
+        for host_vteps in host_vteps_list:
+            type_vteps = host_vteps.get(tunnel_type, {})
+            endpoints.extend(type_vteps.get('tunneling_ip', []))
+            if not tunneling_ip_only:
+                endpoints.extend(type_vteps.get('tunneling_ips', []))
         return endpoints
 
+    def _get_vtep_index(self, context):
+        """ Tunnel endpoints of all agents by host and tunnel type.
+
+        The index is built from one read of the agents table and is
+        shared by all service builds. It is rebuilt when an agent is
+        added, removed or restarted, which is when its tunneling ip
+        can change, or when it is VTEP_INDEX_SECONDS old. Agents are
+        checked for changes at most every VTEP_CHECK_SECONDS.
+        """
+        now = time()
+        if self.vtep_index is not None and \
+                now - self.vtep_index_time < VTEP_INDEX_SECONDS:
+            if now - self.vtep_index_checked < VTEP_CHECK_SECONDS:
+                return self.vtep_index
+            signature = self._get_agents_signature(context)
+            self.vtep_index_checked = now
+            if signature == self.vtep_index_signature:
+                return self.vtep_index
+        else:
+            signature = self._get_agents_signature(context)
+
+        # host -> tunnel type -> tunneling_ip and tunneling_ips lists
+        vtep_index = {}
+        for agent in self._core_plugin().get_agents(context):
+            config = agent.get('configurations') or {}
+            if 'tunnel_types' not in config:
+                continue
+            host_vteps = vtep_index.setdefault(str(agent['host']), {})
+            for tunnel_type in config['tunnel_types']:
+                type_vteps = host_vteps.setdefault(
+                    tunnel_type, {'tunneling_ip': [], 'tunneling_ips': []})
+                if 'tunneling_ip' in config:
+                    type_vteps['tunneling_ip'].append(
+                        config['tunneling_ip'])
+                if 'tunneling_ips' in config:
+                    type_vteps['tunneling_ips'].extend(
+                        config['tunneling_ips'])
+        LOG.debug(_('Built tunnel endpoint index for %d hosts'
+                    % len(vtep_index)))
+        self.vtep_index = vtep_index
+        self.vtep_index_signature = signature
+        self.vtep_index_time = now
+        self.vtep_index_checked = now
+        return vtep_index
+
+    @staticmethod
+    def _get_agents_signature(context):
+        """ Changes when an agent is added, removed or restarted """
+        return context.session.query(
+            func.count(agents_db.Agent.id),
+            func.max(agents_db.Agent.created_at),
+            func.max(agents_db.Agent.started_at)
+        ).one()
+
 
 class LoadBalancerAgentApi(proxy.RpcProxy):  # @UndefinedVariable
     """Plugin side of plugin to agent RPC API.
@@ -1450,11 +1838,12 @@ class F5PluginDriver(LoadBalancerAbstractDriver):
             'status': q_const.PORT_STATUS_ACTIVE
         }
         port_data[portbindings.HOST_ID] = agent['host']
-        self._core_plugin().update_port(
+        port = self._core_plugin().update_port(
             context,
             vip['port_id'],
             {'port': port_data}
         )
+        self.callbacks.network_hosts_cache.invalidate(port['network_id'])
         # call the RPC proxy with the constructed message
         self.agent_rpc.create_vip(context, vip, service, agent['host'])
 
@@ -1821,30 +2210,16 @@ class F5PluginDriver(LoadBalancerAbstractDriver):
         """ Get vxlan tunneling endpoints from all agents """
         endpoints = []
         if hasattr(self._core_plugin(), 'get_agents'):
-            agents = self._core_plugin().get_agents(context)
-            for agent in agents:
-                if 'configurations' in agent:
-                    if 'tunnel_types' in agent['configurations']:
-                        if 'vxlan' in agent['configurations']['tunnel_types']:
-                            if 'tunneling_ip' in agent['configurations']:
-                                endpoints.append(
-                                    agent['configurations']['tunneling_ip']
-                                )
+            endpoints = self.callbacks._get_tunnel_endpoints(
+                context, 'vxlan', tunneling_ip_only=True)
         return endpoints
 
     def _get_gre_endpoints(self, context):
         """ Get gre tunneling endpoints from all agents """
         endpoints = []
         if hasattr(self._core_plugin(), 'get_agents'):
-            agents = self._core_plugin().get_agents(context)
-            for agent in agents:
-                if 'configurations' in agent:
-                    if 'tunnel_types' in agent['configurations']:
-                        if 'gre' in agent['configurations']['tunnel_types']:
-                            if 'tunneling_ip' in agent['configurations']:
-                                endpoints.append(
-                                    agent['configurations']['tunneling_ip']
-                                )
+            endpoints = self.callbacks._get_tunnel_endpoints(
+                context, 'gre', tunneling_ip_only=True)
         return endpoints
 
 
@@ -0,0 +1,106 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import netaddr
+
+# trie node slots
+ZERO = 0
+ONE = 1
+SUBNETS = 2
+
+
+class SubnetIndex(object):
+    """ Longest prefix match index of neutron subnets by cidr.
+
+        Subnets are kept in a binary radix tree for each ip version,
+        walked one address bit at a time from the most significant
+        bit. Each node holds the subnets whose cidr ends at that
+        node, so finding every subnet that contains an address only
+        visits as many nodes as the longest prefix in the tree. """
+
+    def __init__(self):
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        # subnet id -> (ip version, network value, prefix length)
+        self.prefixes = {}
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def __contains__(self, subnet_id):
+        return subnet_id in self.prefixes
+
+    def clear(self):
+        """ Remove all subnets """
+        self.__init__()
+
+    def add(self, subnet):
+        """ Add or replace a subnet dict with id and cidr """
+        subnet_id = subnet['id']
+        if subnet_id in self.prefixes:
+            self.remove(subnet_id)
+        net = netaddr.IPNetwork(subnet['cidr'])
+        prefix = (net.version, int(net.network), net.prefixlen)
+        node = self.roots[net.version]
+        for bit in self._bits(prefix[0], prefix[1], prefix[2]):
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[SUBNETS] is None:
+            node[SUBNETS] = {}
+        node[SUBNETS][subnet_id] = subnet
+        self.prefixes[subnet_id] = prefix
+
+    def remove(self, subnet_id):
+        """ Remove a subnet by id """
+        prefix = self.prefixes.pop(subnet_id, None)
+        if not prefix:
+            return
+        path = [self.roots[prefix[0]]]
+        for bit in self._bits(prefix[0], prefix[1], prefix[2]):
+            path.append(path[-1][bit])
+        node = path[-1]
+        del node[SUBNETS][subnet_id]
+        if not node[SUBNETS]:
+            node[SUBNETS] = None
+        # prune the branches which no longer lead to a subnet
+        bits = list(self._bits(prefix[0], prefix[1], prefix[2]))
+        while len(path) > 1:
+            node = path.pop()
+            if node[ZERO] or node[ONE] or node[SUBNETS]:
+                break
+            path[-1][bits[len(path) - 1]] = None
+
+    def lookup(self, address):
+        """ Subnets containing address, most specific first """
+        ip_address = netaddr.IPAddress(address)
+        node = self.roots[ip_address.version]
+        matched = []
+        for bit in self._bits(ip_address.version, int(ip_address)):
+            if node[SUBNETS]:
+                matched[0:0] = node[SUBNETS].values()
+            node = node[bit]
+            if node is None:
+                return matched
+        if node[SUBNETS]:
+            matched[0:0] = node[SUBNETS].values()
+        return matched
+
+    @staticmethod
+    def _bits(version, value, length=None):
+        """ Most significant length bits of an address value """
+        width = 32 if version == 4 else 128
+        if length is None:
+            length = width
+        for shift in range(width - 1, width - 1 - length, -1):
+            yield (value >> shift) & 1
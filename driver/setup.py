@@ -54,8 +54,10 @@ setup(
     author_email='devcentral@f5.com',
     url='http://devcentral.f5.com/openstack',
     py_modules=['f5.oslbaasv1driver.drivers.agent_scheduler',
+                'f5.oslbaasv1driver.drivers.net_cache',
                 'f5.oslbaasv1driver.drivers.plugin_driver',
                 'f5.oslbaasv1driver.drivers.rpc',
+                'f5.oslbaasv1driver.drivers.subnet_index',
                 'f5.oslbaasv1driver.drivers.constants'],
     packages=['f5.oslbaasv1driver',
               'f5.oslbaasv1driver.drivers',
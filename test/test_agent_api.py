@@ -0,0 +1,191 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+from f5.oslbaasv1agent.drivers.bigip import agent_api
+
+
+class UnsupportedVersion(Exception):
+    """ What an older plugin answers a bulk call with """
+
+
+class RecordingAgentApi(agent_api.LbaasAgentApi):
+    """ Plugin API which records calls instead of sending them """
+
+    def __init__(self, bulk_result):
+        # no RPC client
+        self.context = None
+        self.env = None
+        self.group = 0
+        self.host = 'host1'
+        self.topic = 'topic'
+        self.unsupported_methods = set()
+        self.bulk_result = bulk_result
+        self.bulk_calls = []
+        self.sent = []
+        # method -> result, or function of the call arguments, of
+        # the calls for one object at a time
+        self.results = {}
+
+    def make_msg(self, method, **kwargs):
+        return (method, kwargs)
+
+    def call(self, context, msg, topic=None, version=None):
+        if version != agent_api.BULK_API_VERSION:
+            self.sent.append(msg[0])
+            result = self.results.get(msg[0])
+            if callable(result):
+                result = result(**msg[1])
+            return result
+        self.bulk_calls.append(msg[0])
+        if isinstance(self.bulk_result, Exception):
+            raise self.bulk_result
+        return self.bulk_result
+
+    def update_member_status(self, **kwargs):
+        self.sent.append(('member', kwargs['member_id']))
+
+    def member_destroyed(self, member_id):
+        self.sent.append(('member_destroyed', member_id))
+
+    def update_pool_status(self, **kwargs):
+        self.sent.append(('pool', kwargs['pool_id']))
+
+    def pool_destroyed(self, pool_id):
+        self.sent.append(('pool_destroyed', pool_id))
+
+    def update_health_monitor_status(self, **kwargs):
+        self.sent.append(('monitor', kwargs['health_monitor_id']))
+
+    def health_monitor_destroyed(self, **kwargs):
+        self.sent.append(('monitor_destroyed', kwargs['health_monitor_id']))
+
+    def update_vip_status(self, **kwargs):
+        self.sent.append(('vip', kwargs['vip_id']))
+
+    def vip_destroyed(self, vip_id):
+        self.sent.append(('vip_destroyed', vip_id))
+
+
+def statuses():
+    return {'members': [{'member_id': 'member1', 'status': 'ACTIVE'},
+                        {'member_id': 'member2', 'status': 'ACTIVE'}],
+            'members_destroyed': ['member3'],
+            'pool': {'pool_id': 'pool1', 'status': 'ACTIVE'},
+            'pool_destroyed': None,
+            'health_monitors': [{'pool_id': 'pool1',
+                                 'health_monitor_id': 'monitor1',
+                                 'status': 'ACTIVE'}],
+            'health_monitors_destroyed': [],
+            'vip': {'vip_id': 'vip1', 'status': 'ACTIVE'},
+            'vip_destroyed': None}
+
+
+class TestUpdateServiceStatuses(unittest.TestCase):
+
+    def test_all_applied(self):
+        api = RecordingAgentApi({})
+        api.update_service_statuses(statuses())
+        self.assertEqual(api.bulk_calls, ['update_service_statuses'])
+        self.assertEqual(api.sent, [])
+
+    def test_only_failed_sent_again(self):
+        failed = {'members': [{'member_id': 'member2', 'status': 'ACTIVE'}],
+                  'vip': {'vip_id': 'vip1', 'status': 'ACTIVE'}}
+        api = RecordingAgentApi(failed)
+        api.update_service_statuses(statuses())
+        self.assertEqual(api.sent, [('member', 'member2'), ('vip', 'vip1')])
+
+    def test_older_plugin_one_by_one(self):
+        api = RecordingAgentApi(UnsupportedVersion('1.1'))
+        api.update_service_statuses(statuses())
+        self.assertEqual(api.sent, [('member', 'member1'),
+                                    ('member', 'member2'),
+                                    ('member_destroyed', 'member3'),
+                                    ('pool', 'pool1'),
+                                    ('monitor', 'monitor1'),
+                                    ('vip', 'vip1')])
+        # the bulk call is not tried again
+        api.update_service_statuses(statuses())
+        self.assertEqual(api.bulk_calls, ['update_service_statuses'])
+
+    def test_other_errors_raised(self):
+        api = RecordingAgentApi(ValueError('db down'))
+        self.assertRaises(ValueError, api.update_service_statuses,
+                          statuses())
+        self.assertEqual(api.sent, [])
+
+
+class TestGetPoolSyncSnapshot(unittest.TestCase):
+
+    def test_snapshot_from_plugin(self):
+        snapshot = {'active_pools': [{'pool_id': 'pool1'}],
+                    'pending_pools': [{'pool_id': 'pool2'}]}
+        api = RecordingAgentApi(snapshot)
+        self.assertEqual(api.get_pool_sync_snapshot(), snapshot)
+        self.assertEqual(api.bulk_calls, ['get_pool_sync_snapshot'])
+        self.assertEqual(api.sent, [])
+
+    def test_older_plugin_pool_lists(self):
+        api = RecordingAgentApi(UnsupportedVersion('1.1'))
+        api.results = {'get_active_pools': [{'pool_id': 'pool1'}],
+                       'get_pending_pools': [{'pool_id': 'pool2'}]}
+        self.assertEqual(api.get_pool_sync_snapshot(),
+                         {'active_pools': [{'pool_id': 'pool1'}],
+                          'pending_pools': [{'pool_id': 'pool2'}]})
+        self.assertEqual(api.sent, ['get_active_pools',
+                                    'get_pending_pools'])
+        # the bulk call is not tried again
+        api.get_pool_sync_snapshot()
+        self.assertEqual(api.bulk_calls, ['get_pool_sync_snapshot'])
+
+
+def get_service(pool_id=None, **kwargs):
+    if pool_id == 'pool2':
+        raise ValueError('pool2 is gone')
+    return {'pool': {'id': pool_id}}
+
+
+class TestGetServicesByPoolIds(unittest.TestCase):
+
+    def test_services_from_plugin(self):
+        services = {'pool1': {'pool': {'id': 'pool1'}}}
+        api = RecordingAgentApi(services)
+        self.assertEqual(api.get_services_by_pool_ids(['pool1']), services)
+        self.assertEqual(api.sent, [])
+
+    def test_older_plugin_one_by_one(self):
+        api = RecordingAgentApi(UnsupportedVersion('1.1'))
+        api.results = {'get_service_by_pool_id': get_service}
+        services = api.get_services_by_pool_ids(['pool1', 'pool2',
+                                                 'pool3'])
+        # the pool whose service could not be read is left out
+        self.assertEqual(services, {'pool1': {'pool': {'id': 'pool1'}},
+                                    'pool3': {'pool': {'id': 'pool3'}}})
+        self.assertEqual(api.sent, ['get_service_by_pool_id'] * 3)
+
+    def test_other_errors_raised(self):
+        api = RecordingAgentApi(ValueError('db down'))
+        self.assertRaises(ValueError, api.get_services_by_pool_ids,
+                          ['pool1'])
+        self.assertEqual(api.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import gettext
+import os
+import sys
+import threading
+import unittest
+
+gettext.install('test')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+from f5.oslbaasv1agent.drivers.bigip import audit
+from f5.oslbaasv1agent.drivers.bigip.audit import DeviceRequestBudget
+from f5.oslbaasv1agent.drivers.bigip.audit import OrphanAudit
+from f5.oslbaasv1agent.drivers.bigip.utils import ServiceScheduler
+
+PREFIX = 'uuid_'
+
+
+class Conf(object):
+    f5_audit_shards = 4
+    f5_audit_requests_per_second = 0
+    f5_global_routed_mode = False
+
+
+class PluginRPC(object):
+
+    def __init__(self):
+        self.all_pools = []
+        self.services = {}
+
+    def get_all_pools(self):
+        return self.all_pools
+
+    def get_service_by_pool_id(self, pool_id, global_routed_mode=False):
+        return self.services.get(pool_id, {})
+
+
+class Driver(object):
+
+    def __init__(self):
+        self.service_queue = ServiceScheduler(max_concurrent=4)
+        self.shared_config_lock = threading.RLock()
+        self.plugin_rpc = PluginRPC()
+
+    def reconcile_object_counts(self, bigip):
+        return {}
+
+
+class Adapter(object):
+    requests_sent = 0
+
+
+class Session(object):
+
+    def __init__(self):
+        self.adapter = Adapter()
+
+
+class Pool(object):
+    OBJ_PREFIX = PREFIX
+
+    def __init__(self, pool_folders):
+        self.pool_folders = pool_folders
+        self.purged = []
+
+    def get_all_pool_folders(self):
+        return self.pool_folders
+
+    def purge_orphaned_pool(self, pool_name, folder):
+        self.purged.append(pool_name)
+
+
+class System(object):
+
+    def __init__(self, folders):
+        self.folders = folders
+        self.purged = []
+
+    def get_managed_folders(self, bigip):
+        return self.folders
+
+    def purge_folder_contents(self, folder, bigip):
+        pass
+
+    def force_root_folder(self):
+        pass
+
+    def purge_folder(self, folder, bigip):
+        self.purged.append(folder)
+
+
+class BigIP(object):
+    device_name = 'bigip1'
+
+    def __init__(self, pool_folders=None, folders=None):
+        self.icr_session = Session()
+        self.folder_lock = threading.RLock()
+        self.pool = Pool(pool_folders or {})
+        self.system = System(folders or [])
+
+
+class TestOrphanAuditShards(unittest.TestCase):
+
+    def setUp(self):
+        self.audit = OrphanAudit(Conf(), Driver())
+        self.purged_pools = []
+        self.purged_folders = []
+        # record the purges rather than queue them
+        self.audit._purge_orphaned_pool = \
+            lambda bigip, pool_name, folder, drift, service: \
+            self.purged_pools.append(pool_name)
+        self.audit._purge_orphaned_folder = \
+            lambda bigip, folder, drift, service: \
+            self.purged_folders.append(folder)
+
+    def test_every_name_in_one_shard(self):
+        for index in range(100):
+            name = PREFIX + 'pool%d' % index
+            shards = [shard for shard in range(self.audit.shards)
+                      if self.audit.in_shard(name, shard)]
+            self.assertEqual(len(shards), 1)
+
+    def test_purges_only_unknown(self):
+        self.audit.start([{'pool_id': 'pool1', 'tenant_id': 'tenant1'}])
+        pool_folders = {PREFIX + 'pool1': PREFIX + 'tenant1',
+                        PREFIX + 'pool2': PREFIX + 'tenant2',
+                        'other_pool': PREFIX + 'tenant1'}
+        folders = [PREFIX + 'tenant1', PREFIX + 'tenant2']
+        bigip = BigIP(pool_folders, folders)
+        for shard in range(self.audit.shards):
+            self.audit._audit_bigip_shard(bigip, shard)
+        self.assertEqual(self.purged_pools, [PREFIX + 'pool2'])
+        self.assertEqual(self.purged_folders, [PREFIX + 'tenant2'])
+        self.assertEqual(self.audit.drift['pools'], 2)
+        self.assertEqual(self.audit.drift['folders'], 2)
+        self.assertEqual(self.audit.drift['orphaned_pools'], 1)
+        self.assertEqual(self.audit.drift['orphaned_folders'], 1)
+
+
+class TestOrphanPurge(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = Driver()
+        self.audit = OrphanAudit(Conf(), self.driver)
+        self.audit.start([])
+        self.bigip = BigIP()
+
+    def _purge_pool(self, pool_id, drift=None):
+        self.audit._purge_orphaned_pool(
+            self.bigip, PREFIX + pool_id, PREFIX + 'tenant1',
+            drift or self.audit.drift,
+            self.audit._orphan_service(pool_id, PREFIX + 'tenant1',
+                                       PREFIX))
+
+    def test_purges_pool_still_unknown(self):
+        self._purge_pool('pool1')
+        self.assertEqual(self.bigip.pool.purged, [PREFIX + 'pool1'])
+        self.assertEqual(self.audit.drift['purged_pools'], 1)
+
+    def test_keeps_pool_known_since(self):
+        self.audit.know_service({'pool': {'id': 'pool1',
+                                          'tenant_id': 'tenant1'}})
+        self._purge_pool('pool1')
+        self.assertEqual(self.bigip.pool.purged, [])
+
+    def test_keeps_pool_neutron_has_now(self):
+        self.driver.plugin_rpc.services['pool1'] = {'pool': {'id': 'pool1'}}
+        self._purge_pool('pool1')
+        self.assertEqual(self.bigip.pool.purged, [])
+        self.assertEqual(self.audit.drift['purged_pools'], 0)
+
+    def test_keeps_folder_of_tenant_created_since(self):
+        self.driver.plugin_rpc.all_pools = [{'pool_id': 'pool1',
+                                             'tenant_id': 'tenant1'}]
+        self.audit._purge_orphaned_folder(
+            self.bigip, PREFIX + 'tenant1', self.audit.drift,
+            self.audit._orphan_service(None, PREFIX + 'tenant1', PREFIX))
+        self.assertEqual(self.bigip.system.purged, [])
+
+    def test_purges_folder_still_unknown(self):
+        self.audit._purge_orphaned_folder(
+            self.bigip, PREFIX + 'tenant2', self.audit.drift,
+            self.audit._orphan_service(None, PREFIX + 'tenant2', PREFIX))
+        self.assertEqual(self.bigip.system.purged, [PREFIX + 'tenant2'])
+        self.assertEqual(self.audit.drift['purged_folders'], 1)
+
+    def test_purge_counted_in_audit_which_found_it(self):
+        drift = self.audit.drift
+        self.audit.start([])
+        self._purge_pool('pool1', drift)
+        self.assertEqual(drift['purged_pools'], 1)
+        self.assertEqual(self.audit.drift['purged_pools'], 0)
+
+    def test_purge_queued_by_tenant(self):
+        service = self.audit._orphan_service(None, PREFIX + 'tenant1',
+                                             PREFIX)
+        self.assertEqual(service['pool']['tenant_id'], 'tenant1')
+        service = self.audit._orphan_service('pool1', 'Common', PREFIX)
+        self.assertEqual(service['pool']['id'], 'pool1')
+        self.assertEqual(service['pool']['tenant_id'], None)
+
+
+class TestDeviceRequestBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.real_greenthread = audit.greenthread
+        audit.greenthread = self
+
+    def tearDown(self):
+        audit.greenthread = self.real_greenthread
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    def test_sleeps_when_over_budget(self):
+        bigip = BigIP()
+        budget = DeviceRequestBudget(bigip, 10)
+        bigip.icr_session.adapter.requests_sent = 20
+        budget.throttle()
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertTrue(1.5 < self.sleeps[0] <= 2.0)
+
+    def test_no_sleep_within_budget(self):
+        bigip = BigIP()
+        budget = DeviceRequestBudget(bigip, 10)
+        budget.start_time -= 1
+        bigip.icr_session.adapter.requests_sent = 5
+        budget.throttle()
+        self.assertEqual(self.sleeps, [])
+
+    def test_no_limit(self):
+        bigip = BigIP()
+        budget = DeviceRequestBudget(bigip, 0)
+        bigip.icr_session.adapter.requests_sent = 1000
+        budget.throttle()
+        self.assertEqual(self.sleeps, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+from f5.oslbaasv1agent.drivers.bigip.utils import DeviceFanout
+from f5.oslbaasv1agent.drivers.bigip.utils import DeviceFanoutException
+
+
+class BigIP(object):
+
+    def __init__(self, device_name):
+        self.device_name = device_name
+
+
+class TestDeviceFanout(unittest.TestCase):
+
+    def setUp(self):
+        self.bigips = [BigIP('bigip1'), BigIP('bigip2'), BigIP('bigip3')]
+        self.called = []
+
+    def _configure(self, bigip, value):
+        self.called.append(bigip.device_name)
+        if bigip.device_name == 'bigip2':
+            raise ValueError('bad value %s' % value)
+        return value + 1
+
+    def _check_partial_failure(self, parallel):
+        fanout = DeviceFanout(parallel=parallel)
+        try:
+            fanout.run(self.bigips, self._configure, 1)
+        except DeviceFanoutException as exc:
+            self.assertEqual(exc.get_failed(), ['bigip2'])
+            self.assertTrue(isinstance(exc.errors['bigip2'][1], ValueError))
+            self.assertEqual(exc.results, {'bigip1': 2, 'bigip3': 2})
+            self.assertTrue('bigip2: bad value 1' in str(exc))
+        else:
+            self.fail('DeviceFanoutException not raised')
+        # a failure does not stop the other big-ips
+        self.assertEqual(sorted(self.called), ['bigip1', 'bigip2', 'bigip3'])
+
+    def test_partial_failure_parallel(self):
+        self._check_partial_failure(True)
+
+    def test_partial_failure_serial(self):
+        self._check_partial_failure(False)
+
+    def test_results_by_name(self):
+        fanout = DeviceFanout()
+        self.assertEqual(fanout.run(self.bigips[:1], self._configure, 1),
+                         {'bigip1': 2})
+        self.assertEqual(
+            fanout.run_on_hostnames(['host1', 'host2'],
+                                    lambda hostname: hostname.upper()),
+            {'host1': 'HOST1', 'host2': 'HOST2'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import os
+import sys
+import unittest
+
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+from f5.bigip import exceptions
+from f5.bigip.icr_session import IcrSession
+from f5.bigip.icr_session import TRANSACTION_HEADER
+
+ICR_URL = 'https://192.0.2.1/mgmt/tm'
+
+
+class DeviceAdapter(BaseAdapter):
+    """ Answer requests the way a BIG-IP would and record them """
+
+    def __init__(self, commit_state='COMPLETED'):
+        super(DeviceAdapter, self).__init__()
+        self.commit_state = commit_state
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.method, request.url,
+                          request.headers.get(TRANSACTION_HEADER)))
+        body = {}
+        if request.url == ICR_URL + '/transaction':
+            body = {'transId': 1234}
+        elif request.url.startswith(ICR_URL + '/transaction/') and \
+                request.method == 'PATCH':
+            body = {'state': self.commit_state}
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode('utf-8')
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class TestIcrTransaction(unittest.TestCase):
+
+    def _session(self, commit_state='COMPLETED'):
+        session = IcrSession('admin', 'admin', icr_url=ICR_URL)
+        adapter = DeviceAdapter(commit_state)
+        session.mount('https://', adapter)
+        return (session, adapter)
+
+    def test_writes_committed_together(self):
+        (session, adapter) = self._session()
+        with session.transaction():
+            session.get(ICR_URL + '/ltm/pool')
+            session.post(ICR_URL + '/ltm/pool', data='{}')
+            session.put(ICR_URL + '/ltm/pool/~Common~pool1', data='{}')
+        self.assertEqual(adapter.sent, [
+            ('GET', ICR_URL + '/ltm/pool', None),
+            ('POST', ICR_URL + '/transaction', None),
+            ('POST', ICR_URL + '/ltm/pool', '1234'),
+            ('PUT', ICR_URL + '/ltm/pool/~Common~pool1', '1234'),
+            ('PATCH', ICR_URL + '/transaction/1234', None)])
+        self.assertEqual(session.transactions_committed, 1)
+        self.assertFalse(session.in_transaction())
+
+    def test_reads_only_create_no_transaction(self):
+        (session, adapter) = self._session()
+        with session.transaction():
+            session.get(ICR_URL + '/ltm/pool')
+        self.assertEqual(adapter.sent,
+                         [('GET', ICR_URL + '/ltm/pool', None)])
+
+    def test_nested_blocks_join_outer(self):
+        (session, adapter) = self._session()
+        with session.transaction():
+            session.post(ICR_URL + '/ltm/pool', data='{}')
+            with session.transaction():
+                session.delete(ICR_URL + '/ltm/pool/~Common~pool1')
+            self.assertTrue(session.in_transaction())
+        methods = [sent[0] for sent in adapter.sent]
+        self.assertEqual(methods, ['POST', 'POST', 'DELETE', 'PATCH'])
+        self.assertEqual(session.transactions_committed, 1)
+
+    def test_exception_discards_writes(self):
+        (session, adapter) = self._session()
+        try:
+            with session.transaction():
+                session.post(ICR_URL + '/ltm/pool', data='{}')
+                raise ValueError('assure failed')
+        except ValueError:
+            pass
+        self.assertEqual(adapter.sent[-1],
+                         ('DELETE', ICR_URL + '/transaction/1234', None))
+        self.assertEqual(session.transactions_committed, 0)
+        # writes after the block are not part of a transaction
+        session.post(ICR_URL + '/ltm/pool', data='{}')
+        self.assertEqual(adapter.sent[-1][2], None)
+
+    def test_failed_commit_raises(self):
+        (session, adapter) = self._session(commit_state='FAILED')
+        try:
+            with session.transaction():
+                session.post(ICR_URL + '/ltm/pool', data='{}')
+            self.fail('commit did not raise')
+        except exceptions.TransactionCommitException:
+            pass
+        self.assertEqual(adapter.sent[-1],
+                         ('DELETE', ICR_URL + '/transaction/1234', None))
+        self.assertFalse(session.in_transaction())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'driver'))
+
+from f5.oslbaasv1driver.drivers import net_cache
+from f5.oslbaasv1driver.drivers.net_cache import NetCache
+
+
+class TestNetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.real_time = net_cache.time
+        net_cache.time = lambda: self.now
+        self.removed = []
+        self.cache = NetCache(2, 100, on_remove=self._on_remove)
+
+    def tearDown(self):
+        net_cache.time = self.real_time
+
+    def _on_remove(self, key, value):
+        self.removed.append((key, value))
+
+    def test_hit_and_miss(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIn('a', self.cache)
+        stats = self.cache.get_statistics()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_expiry(self):
+        self.cache.set('a', 1)
+        # entries never outlive the ttl, but may expire early by the
+        # jitter
+        self.now += 100 * (1 - net_cache.EXPIRY_JITTER) - 1
+        self.assertEqual(self.cache.get('a'), 1)
+        self.now += net_cache.EXPIRY_JITTER * 100 + 1
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.removed, [('a', 1)])
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_sweep_drops_unread_entries(self):
+        self.cache.set('a', 1)
+        self.now += 100
+        self.cache.set('b', 2)
+        # 'a' was never read again, but is gone all the same
+        self.assertEqual(self.removed, [('a', 1)])
+        self.assertEqual(list(self.cache.entries.keys()), ['b'])
+        self.assertEqual(self.cache.expirations, 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.removed, [('b', 2)])
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(sorted(self.cache.entries.keys()), ['a', 'c'])
+
+    def test_invalidate_and_clear(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.invalidate('a')
+        self.cache.invalidate('missing')
+        self.assertEqual(self.cache.invalidations, 1)
+        self.cache.clear()
+        self.assertEqual(self.removed, [('a', 1), ('b', 2)])
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
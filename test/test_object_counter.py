@@ -0,0 +1,49 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+from f5.bigip.object_counter import ObjectCounter, FOLDERS, VLANS
+
+
+class TestObjectCounter(unittest.TestCase):
+
+    def test_unknown_until_reconciled(self):
+        counter = ObjectCounter()
+        counter.created(FOLDERS)
+        counter.deleted(FOLDERS)
+        self.assertIsNone(counter.get(FOLDERS))
+        counter.reconcile(FOLDERS, 3)
+        self.assertEqual(counter.get(FOLDERS), 3)
+        self.assertEqual(counter.get_statistics()['drift'], {})
+
+    def test_follows_changes_and_drift(self):
+        counter = ObjectCounter()
+        counter.reconcile(VLANS, 2)
+        counter.created(VLANS, 3)
+        counter.deleted(VLANS)
+        self.assertEqual(counter.get(VLANS), 4)
+        counter.deleted(VLANS, 10)
+        self.assertEqual(counter.get(VLANS), 0)
+        counter.reconcile(VLANS, 1)
+        self.assertEqual(counter.get_statistics(),
+                         {'counts': {VLANS: 1}, 'drift': {VLANS: 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
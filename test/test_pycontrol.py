@@ -0,0 +1,124 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+from f5.bigip.pycontrol import pycontrol
+
+VERSION = 'BIG-IP_v11.6.0'
+
+# smallest rpc/encoded WSDL with the shape of an iControl interface
+POOL_WSDL = b"""<?xml version="1.0" encoding="UTF-8"?>
+<definitions name="LocalLB.Pool"
+    targetNamespace="urn:iControl:LocalLB/Pool"
+    xmlns:tns="urn:iControl:LocalLB/Pool"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+    xmlns="http://schemas.xmlsoap.org/wsdl/">
+  <message name="LocalLB.Pool.get_listRequest"/>
+  <message name="LocalLB.Pool.get_listResponse">
+    <part name="return" type="xsd:string"/>
+  </message>
+  <portType name="LocalLB.PoolPortType">
+    <operation name="get_list">
+      <input message="tns:LocalLB.Pool.get_listRequest"/>
+      <output message="tns:LocalLB.Pool.get_listResponse"/>
+    </operation>
+  </portType>
+  <binding name="LocalLB.PoolBinding" type="tns:LocalLB.PoolPortType">
+    <soap:binding style="rpc"
+        transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="get_list">
+      <soap:operation soapAction="urn:iControl:LocalLB/Pool"/>
+      <input><soap:body use="encoded" namespace="urn:iControl:LocalLB/Pool"
+          encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"/></input>
+      <output><soap:body use="encoded" namespace="urn:iControl:LocalLB/Pool"
+          encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"/></output>
+    </operation>
+  </binding>
+  <service name="LocalLB.Pool">
+    <port name="LocalLB.PoolPort" binding="tns:LocalLB.PoolBinding">
+      <soap:address location="https://url_to_service"/>
+    </port>
+  </service>
+</definitions>
+"""
+
+
+class TestWsdlCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'wsdl')
+        self.fetched = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _fetch(self, wsdl):
+        self.fetched.append(wsdl)
+        return POOL_WSDL
+
+    def _bigip(self):
+        bigip = pycontrol.BIGIP(hostname='192.0.2.1', username='admin',
+                                password='admin', fromurl=True, lazy=True,
+                                wsdls=['LocalLB.Pool'],
+                                wsdl_cache_dir=self.cache_dir,
+                                version=VERSION)
+        # never read WSDLs from the device in a test
+        bigip._fetch_wsdl = self._fetch
+        return bigip
+
+    def test_fetched_once_per_version(self):
+        cache = pycontrol.WsdlFileCache(self.cache_dir, VERSION)
+        url = cache.get_url('LocalLB.Pool', self._fetch)
+        self.assertEqual(cache.get_url('LocalLB.Pool.wsdl', self._fetch),
+                         url)
+        self.assertEqual(self.fetched, ['LocalLB.Pool'])
+        self.assertTrue(url.startswith('file:'))
+        mode = os.stat(cache.directory).st_mode & 0o777
+        self.assertEqual(mode, 0o700)
+
+    def test_rejects_shared_directory(self):
+        os.makedirs(self.cache_dir)
+        os.chmod(self.cache_dir, 0o777)
+        cache = pycontrol.WsdlFileCache(self.cache_dir, VERSION)
+        self.assertRaises(OSError, cache.get_url, 'LocalLB.Pool',
+                          self._fetch)
+        self.assertEqual(self.fetched, [])
+
+    def test_client_from_cache(self):
+        self._bigip().LocalLB.Pool.get_list
+        self.assertEqual(self.fetched, ['LocalLB.Pool'])
+        # a new client, as after a restart, reads the cached WSDL
+        bigip = self._bigip()
+        client = bigip.LocalLB.Pool.suds
+        self.assertEqual(self.fetched, ['LocalLB.Pool'])
+        self.assertTrue(hasattr(bigip.LocalLB.Pool, 'get_list'))
+        # SOAP calls go to the device over https, so certificates
+        # must not be verified even though the WSDL came from a file
+        self.assertTrue(isinstance(client.options.transport,
+                                   pycontrol.HTTPSUnVerifiedCertTransport))
+        self.assertEqual(client.options.location,
+                         'https://192.0.2.1' + pycontrol.ICONTROL_URI)
+
+
+if __name__ == '__main__':
+    unittest.main()
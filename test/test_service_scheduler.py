@@ -0,0 +1,172 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import eventlet
+from eventlet import event
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+from f5.oslbaasv1agent.drivers.bigip.utils import ServiceScheduler
+from f5.oslbaasv1agent.drivers.bigip.utils import serialized
+
+
+def service(tenant_id, pool_id):
+    return {'pool': {'id': pool_id, 'tenant_id': tenant_id}}
+
+
+class TestServiceScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = ServiceScheduler(max_concurrent=2)
+
+    def _enqueue(self, key, method_name='delete_pool'):
+        return self.queue.enqueue(method_name, key,
+                                  service(key, key + '_pool'))
+
+    def test_same_tenant_in_order(self):
+        first = self._enqueue('tenant1')
+        second = self._enqueue('tenant1')
+        self.assertTrue(first.ready.ready())
+        self.assertFalse(second.ready.ready())
+        self.queue.finish(first)
+        self.assertTrue(second.ready.ready())
+        self.queue.finish(second)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_tenants_concurrent_up_to_limit(self):
+        requests = [self._enqueue('tenant%d' % index) for index in range(3)]
+        self.assertEqual([request.ready.ready() for request in requests],
+                         [True, True, False])
+        self.assertEqual(self.queue.get_statistics()['running'], 2)
+        self.queue.finish(requests[1])
+        self.assertTrue(requests[2].ready.ready())
+
+    def test_busy_tenant_does_not_block_others(self):
+        first = self._enqueue('tenant1')
+        second = self._enqueue('tenant1')
+        other = self._enqueue('tenant2')
+        self.assertFalse(second.ready.ready())
+        self.assertTrue(other.ready.ready())
+        self.queue.finish(first)
+        self.assertTrue(second.ready.ready())
+
+    def test_global_request_runs_alone(self):
+        first = self._enqueue('tenant1')
+        everything = self.queue.enqueue('sync_state', None)
+        after = self._enqueue('tenant2')
+        # nothing passes a request which affects every tenant
+        self.assertFalse(everything.ready.ready())
+        self.assertFalse(after.ready.ready())
+        self.queue.finish(first)
+        self.assertTrue(everything.ready.ready())
+        self.assertFalse(after.ready.ready())
+        self.queue.finish(everything)
+        self.assertTrue(after.ready.ready())
+
+    def test_statistics(self):
+        first = self._enqueue('tenant1')
+        self._enqueue('tenant1')
+        stats = self.queue.get_statistics()
+        self.assertEqual(stats['queue_depth'], 2)
+        self.assertEqual(stats['waiting'], 1)
+        self.assertEqual(stats['requests'], 1)
+        self.queue.finish(first)
+        self.assertEqual(self.queue.get_statistics()['requests'], 2)
+
+
+class Driver(object):
+    """ Records the services it is asked to assure """
+
+    def __init__(self):
+        self.service_queue = ServiceScheduler()
+        self.assured = []
+        self.release = event.Event()
+
+    @serialized('create_member')
+    def create_member(self, member, service):
+        self.assured.append(service)
+        return len(self.assured)
+
+    @serialized('sync_state')
+    def sync_state(self):
+        # holds the queue until released
+        self.release.wait()
+
+
+class TestCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = ServiceScheduler()
+        self.blocker = self.queue.enqueue('sync_state', None)
+
+    def _enqueue(self, method_name, version, pool_id='pool1'):
+        return self.queue.enqueue(method_name, 'tenant1',
+                                  {'pool': {'id': pool_id,
+                                            'tenant_id': 'tenant1'},
+                                   'version': version})
+
+    def test_newer_request_takes_over_waiting_one(self):
+        first = self._enqueue('create_member', 1)
+        second = self._enqueue('update_member', 2)
+        third = self._enqueue('create_vip', 3)
+        self.assertIs(second.leader, first)
+        self.assertIs(third.leader, first)
+        self.assertEqual(first.service['version'], 3)
+        self.assertEqual(first.coalesced, 2)
+        self.assertEqual(len(self.queue.waiting), 1)
+
+    def test_other_pools_and_kinds_not_coalesced(self):
+        first = self._enqueue('create_member', 1)
+        other_pool = self._enqueue('create_member', 2, pool_id='pool2')
+        self.assertIsNone(other_pool.leader)
+        delete = self._enqueue('delete_pool', 3)
+        self.assertIsNone(delete.leader)
+        # never overtake the delete
+        after_delete = self._enqueue('create_member', 4)
+        self.assertIsNone(after_delete.leader)
+        self.assertEqual(first.service['version'], 1)
+
+    def test_running_request_not_coalesced_into(self):
+        self.queue.finish(self.blocker)
+        running = self._enqueue('create_member', 1)
+        self.assertTrue(running.ready.ready())
+        later = self._enqueue('create_member', 2)
+        self.assertIsNone(later.leader)
+        self.assertEqual(running.service['version'], 1)
+
+    def test_every_caller_gets_the_result(self):
+        driver = Driver()
+        holder = eventlet.spawn(driver.sync_state)
+        eventlet.sleep(0)
+        callers = [eventlet.spawn(driver.create_member, {'id': index},
+                                  {'pool': {'id': 'pool1',
+                                            'tenant_id': 'tenant1'},
+                                   'version': index})
+                   for index in range(5)]
+        eventlet.sleep(0)
+        driver.release.send(True)
+        holder.wait()
+        results = [caller.wait() for caller in callers]
+        # one reconciliation with the newest service for all callers
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual([service['version'] for service in driver.assured],
+                         [4])
+        self.assertEqual(driver.service_queue.coalesced, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+from f5.oslbaasv1agent.drivers.bigip import stats
+from f5.oslbaasv1agent.drivers.bigip.stats import StatsScheduler
+
+
+class TestStatsScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.real_time = stats.time
+        stats.time = lambda: self.now
+        self.scheduler = StatsScheduler(10, 5, 40)
+
+    def tearDown(self):
+        stats.time = self.real_time
+
+    def _interval(self, pool_id):
+        return self.scheduler.pools[pool_id][stats.INTERVAL]
+
+    def test_first_poll_within_interval(self):
+        self.assertEqual(self.scheduler.get_due_pool_ids(['a']), [])
+        self.now += 10
+        self.assertEqual(self.scheduler.get_due_pool_ids(['a']), ['a'])
+
+    def test_backoff(self):
+        self.scheduler.get_due_pool_ids(['a'])
+        self.assertTrue(self.scheduler.polled('a', {'bytes': 1}))
+        self.assertEqual(self._interval('a'), 5)
+        # unchanged stats double the interval up to max_interval
+        for interval in (10, 20, 40, 40):
+            self.assertFalse(self.scheduler.polled('a', {'bytes': 1}))
+            self.assertEqual(self._interval('a'), interval)
+        # changed stats halve it down to min_interval
+        for (count, interval) in ((2, 20), (3, 10), (4, 5), (5, 5)):
+            self.assertTrue(self.scheduler.polled('a', {'bytes': count}))
+            self.assertEqual(self._interval('a'), interval)
+        due = self.scheduler.pools['a'][stats.DUE]
+        self.assertTrue(self.now + 5 * (1 - stats.STATS_JITTER) <= due)
+        self.assertTrue(due <= self.now + 5 * (1 + stats.STATS_JITTER))
+
+    def test_most_overdue_first_and_forget(self):
+        self.scheduler.get_due_pool_ids(['a', 'b', 'c'])
+        self.scheduler.pools['a'][stats.DUE] = self.now - 1
+        self.scheduler.pools['b'][stats.DUE] = self.now - 2
+        self.scheduler.pools['c'][stats.DUE] = self.now + 1
+        self.assertEqual(self.scheduler.get_due_pool_ids(['a', 'b', 'c']),
+                         ['b', 'a'])
+        self.assertEqual(
+            self.scheduler.get_due_pool_ids(['a', 'b', 'c'], limit=1),
+            ['b'])
+        self.assertEqual(self.scheduler.get_due_pool_ids(['a']), ['a'])
+        self.assertEqual(len(self.scheduler), 1)
+
+    def test_unscheduled_pool_counts_as_changed(self):
+        self.assertTrue(self.scheduler.polled('missing', {}))
+        self.assertEqual(self.scheduler.polls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
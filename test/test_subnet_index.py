@@ -0,0 +1,67 @@
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'driver'))
+
+from f5.oslbaasv1driver.drivers.subnet_index import SubnetIndex
+
+
+class TestSubnetIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SubnetIndex()
+        self.index.add({'id': 'wide', 'cidr': '10.0.0.0/8'})
+        self.index.add({'id': 'narrow', 'cidr': '10.1.2.0/24'})
+        self.index.add({'id': 'other', 'cidr': '192.168.0.0/16'})
+        self.index.add({'id': 'v6', 'cidr': 'fd00::/64'})
+
+    def _ids(self, address):
+        return [subnet['id'] for subnet in self.index.lookup(address)]
+
+    def test_most_specific_first(self):
+        self.assertEqual(self._ids('10.1.2.3'), ['narrow', 'wide'])
+        self.assertEqual(self._ids('10.9.9.9'), ['wide'])
+        self.assertEqual(self._ids('192.168.4.5'), ['other'])
+        self.assertEqual(self._ids('172.16.0.1'), [])
+
+    def test_ip_versions_apart(self):
+        self.assertEqual(self._ids('fd00::1'), ['v6'])
+        self.assertEqual(self._ids('fd01::1'), [])
+
+    def test_replace(self):
+        self.index.add({'id': 'narrow', 'cidr': '10.2.0.0/16'})
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self._ids('10.1.2.3'), ['wide'])
+        self.assertEqual(self._ids('10.2.0.1'), ['narrow', 'wide'])
+
+    def test_remove_prunes(self):
+        self.index.remove('narrow')
+        self.index.remove('wide')
+        self.index.remove('missing')
+        self.assertNotIn('wide', self.index)
+        self.assertEqual(self._ids('10.1.2.3'), [])
+        # only the branch to 192.168.0.0/16 is left in the v4 tree
+        root = self.index.roots[4]
+        self.assertIsNone(root[0])
+        self.assertIsNotNone(root[1])
+        self.index.remove('other')
+        self.assertEqual(root, [None, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()